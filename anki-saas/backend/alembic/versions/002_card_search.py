@@ -0,0 +1,53 @@
+"""card search
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '002'
+down_revision: Union[str, None] = '001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+
+    # 日本語は分かち書きされないので、かな・漢字の連続を2文字ずつ（bigram）の語彙にする
+    op.execute(r"""
+        CREATE FUNCTION card_search_ja_tsvector(body text) RETURNS tsvector
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT to_tsvector('simple', body) || array_to_tsvector(ARRAY(
+                SELECT DISTINCT substr(m[1], i, 2)
+                FROM regexp_matches(body, '[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff]+', 'g') AS m,
+                     generate_series(1, greatest(char_length(m[1]) - 1, 1)) AS i
+            ))
+        $$
+    """)
+
+    # 生成列なので INSERT/UPDATE のたびに自動で再計算される
+    op.execute("""
+        ALTER TABLE cards
+            ADD COLUMN front_tsv tsvector
+                GENERATED ALWAYS AS (to_tsvector('english', front)) STORED,
+            ADD COLUMN back_tsv tsvector
+                GENERATED ALWAYS AS (card_search_ja_tsvector(back)) STORED
+    """)
+
+    op.execute("CREATE INDEX ix_cards_user_front_tsv ON cards USING gin (user_id, front_tsv)")
+    op.execute("CREATE INDEX ix_cards_user_back_tsv ON cards USING gin (user_id, back_tsv)")
+    op.execute("CREATE INDEX ix_cards_user_front_trgm ON cards USING gin (user_id, front gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_cards_user_front_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_cards_user_back_tsv")
+    op.execute("DROP INDEX IF EXISTS ix_cards_user_front_tsv")
+    op.execute("ALTER TABLE cards DROP COLUMN back_tsv, DROP COLUMN front_tsv")
+    op.execute("DROP FUNCTION IF EXISTS card_search_ja_tsvector(text)")
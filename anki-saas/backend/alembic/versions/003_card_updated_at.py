@@ -0,0 +1,31 @@
+"""card updated_at
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '003'
+down_revision: Union[str, None] = '002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('cards', sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now()))
+    op.execute("UPDATE cards SET updated_at = created_at")
+
+    # 増分エクスポート（since=）用
+    op.create_index('ix_cards_user_id_updated_at', 'cards', ['user_id', 'updated_at'])
+    op.create_index('ix_review_logs_card_id_reviewed_at', 'review_logs', ['card_id', 'reviewed_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_review_logs_card_id_reviewed_at', table_name='review_logs')
+    op.drop_index('ix_cards_user_id_updated_at', table_name='cards')
+    op.drop_column('cards', 'updated_at')
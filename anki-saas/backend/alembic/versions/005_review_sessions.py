@@ -0,0 +1,35 @@
+"""review sessions
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = '005'
+down_revision: Union[str, None] = '004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 復習キューはカード ID の配列と読み出し位置だけで持つ
+    op.create_table(
+        'review_sessions',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('card_ids', postgresql.ARRAY(postgresql.UUID(as_uuid=True)), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_index('ix_review_sessions_user_id_created_at', 'review_sessions', ['user_id', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_review_sessions_user_id_created_at', table_name='review_sessions')
+    op.drop_table('review_sessions')
@@ -0,0 +1,24 @@
+"""card next_review index
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '007'
+down_revision: Union[str, None] = '006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # /review/due・復習セッション・リスケジュールの範囲検索用
+    op.create_index('ix_cards_user_id_next_review', 'cards', ['user_id', 'next_review'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cards_user_id_next_review', table_name='cards')
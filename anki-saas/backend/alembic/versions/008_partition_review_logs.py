@@ -0,0 +1,83 @@
+"""partition review_logs by month
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '008'
+down_revision: Union[str, None] = '007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE review_logs RENAME TO review_logs_old")
+    op.execute("ALTER INDEX review_logs_pkey RENAME TO review_logs_old_pkey")
+    op.execute("DROP INDEX IF EXISTS ix_review_logs_card_id_reviewed_at")
+
+    # パーティションキーは主キーに含める必要がある。user_id は cards との JOIN を避けるための非正規化
+    op.execute("""
+        CREATE TABLE review_logs (
+            id uuid NOT NULL,
+            user_id uuid NOT NULL,
+            card_id uuid NOT NULL REFERENCES cards (id),
+            rating smallint NOT NULL,
+            reviewed_at timestamp NOT NULL DEFAULT now(),
+            CONSTRAINT review_logs_pkey PRIMARY KEY (id, reviewed_at)
+        ) PARTITION BY RANGE (reviewed_at)
+    """)
+
+    # 既存データの最初の月から3か月先まで月ごとのパーティションを作る（以降は scripts/manage_review_log_partitions.py）
+    op.execute("""
+        DO $$
+        DECLARE
+            m date := date_trunc('month', coalesce((SELECT min(reviewed_at) FROM review_logs_old), now()))::date;
+            last_month date := (date_trunc('month', now()) + interval '3 months')::date;
+        BEGIN
+            WHILE m <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF review_logs FOR VALUES FROM (%L) TO (%L)',
+                    'review_logs_' || to_char(m, 'YYYY_MM'), m, (m + interval '1 month')::date
+                );
+                m := (m + interval '1 month')::date;
+            END LOOP;
+        END $$
+    """)
+    op.execute("CREATE TABLE review_logs_default PARTITION OF review_logs DEFAULT")
+
+    op.execute("""
+        INSERT INTO review_logs (id, user_id, card_id, rating, reviewed_at)
+        SELECT l.id, c.user_id, l.card_id, l.rating, coalesce(l.reviewed_at, now())
+        FROM review_logs_old l
+        JOIN cards c ON c.id = l.card_id
+    """)
+    op.execute("DROP TABLE review_logs_old")
+
+    # インデックスは投入後に作る（親に作ると各パーティションにも作られる）
+    op.execute("CREATE INDEX ix_review_logs_reviewed_at_brin ON review_logs USING brin (reviewed_at)")
+    op.execute("CREATE INDEX ix_review_logs_user_id_reviewed_at ON review_logs (user_id, reviewed_at)")
+    op.execute("CREATE INDEX ix_review_logs_card_id ON review_logs (card_id)")
+
+
+def downgrade() -> None:
+    op.execute("""
+        CREATE TABLE review_logs_flat (
+            id uuid PRIMARY KEY,
+            card_id uuid NOT NULL REFERENCES cards (id),
+            rating integer NOT NULL,
+            reviewed_at timestamp DEFAULT now()
+        )
+    """)
+    op.execute("""
+        INSERT INTO review_logs_flat (id, card_id, rating, reviewed_at)
+        SELECT id, card_id, rating, reviewed_at FROM review_logs
+    """)
+    op.execute("DROP TABLE review_logs")
+    op.execute("ALTER TABLE review_logs_flat RENAME TO review_logs")
+    op.execute("ALTER INDEX review_logs_flat_pkey RENAME TO review_logs_pkey")
+    op.execute("CREATE INDEX ix_review_logs_card_id_reviewed_at ON review_logs (card_id, reviewed_at)")
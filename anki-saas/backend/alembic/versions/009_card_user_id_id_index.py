@@ -0,0 +1,24 @@
+"""card (user_id, id) index
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '009'
+down_revision: Union[str, None] = '008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # GET /cards?limit=&before= のキーセットページング用（id は UUIDv7 で時刻順）
+    op.create_index('ix_cards_user_id_id', 'cards', ['user_id', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cards_user_id_id', table_name='cards')
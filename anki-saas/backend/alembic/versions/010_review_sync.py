@@ -0,0 +1,41 @@
+"""review sync
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = '010'
+down_revision: Union[str, None] = '009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # オフライン同期で適用済みの操作（クライアントが付ける冪等キー）
+    op.create_table(
+        'applied_ops',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('op_id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('applied_at', sa.DateTime(), nullable=False, server_default=sa.text("timezone('utc', now())")),
+    )
+    # 削除したカード（同期の差分で端末側からも消すため）
+    op.create_table(
+        'card_tombstones',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('card_id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False, server_default=sa.text("timezone('utc', now())")),
+    )
+    op.create_index('ix_card_tombstones_user_id_deleted_at', 'card_tombstones', ['user_id', 'deleted_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_card_tombstones_user_id_deleted_at', table_name='card_tombstones')
+    op.drop_table('card_tombstones')
+    op.drop_table('applied_ops')
@@ -0,0 +1,36 @@
+"""revoked access tokens
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = '011'
+down_revision: Union[str, None] = '010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 失効させたアクセストークン。token_id が NULL ならそのユーザーの revoked_at 以前の発行分すべて
+    # トークンの有効期限を過ぎた行は不要なので、各ワーカーが読むのは数行で済む
+    op.create_table(
+        'revoked_tokens',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('token_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('revoked_at', sa.DateTime(), nullable=False, server_default=sa.text("timezone('utc', now())")),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_revoked_tokens_expires_at', 'revoked_tokens', ['expires_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_revoked_tokens_expires_at', table_name='revoked_tokens')
+    op.drop_table('revoked_tokens')
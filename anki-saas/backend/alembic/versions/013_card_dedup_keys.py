@@ -0,0 +1,34 @@
+"""card dedup keys
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = '013'
+down_revision: Union[str, None] = '012'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 重複検出のキー（値は Python の dedup.card_keys で計算する。既存行は scripts/backfill_dedup_keys.py）
+    op.add_column('cards', sa.Column('front_fingerprint', sa.String(16), nullable=True))
+    op.add_column('cards', sa.Column('front_bands', postgresql.ARRAY(sa.BigInteger()), nullable=True))
+
+    op.create_index('ix_cards_user_fingerprint', 'cards', ['user_id', 'front_fingerprint'])
+    # btree_gin（migration 002）で user_id とバンドの && を1つの GIN インデックスで引く
+    op.execute("CREATE INDEX ix_cards_user_front_bands ON cards USING gin (user_id, front_bands)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_cards_user_front_bands")
+    op.drop_index('ix_cards_user_fingerprint', table_name='cards')
+    op.drop_column('cards', 'front_bands')
+    op.drop_column('cards', 'front_fingerprint')
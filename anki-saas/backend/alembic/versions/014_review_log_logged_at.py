@@ -0,0 +1,31 @@
+"""review log logged_at
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '014'
+down_revision: Union[str, None] = '013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 挿入した時刻（Parquet エクスポートのウォーターマーク用）。同期で遡った reviewed_at とは別に持つ
+    op.execute("ALTER TABLE review_logs ADD COLUMN logged_at timestamp")
+    # 既存行は reviewed_at で埋める（reviewed_at 基準のウォーターマークより前の行は書き出し済みのまま）
+    op.execute("UPDATE review_logs SET logged_at = reviewed_at")
+    op.execute("ALTER TABLE review_logs ALTER COLUMN logged_at SET DEFAULT timezone('utc', clock_timestamp())")
+    op.execute("ALTER TABLE review_logs ALTER COLUMN logged_at SET NOT NULL")
+    # 挿入順に並ぶ列なので BRIN で足りる
+    op.execute("CREATE INDEX ix_review_logs_logged_at_brin ON review_logs USING brin (logged_at)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_review_logs_logged_at_brin")
+    op.execute("ALTER TABLE review_logs DROP COLUMN logged_at")
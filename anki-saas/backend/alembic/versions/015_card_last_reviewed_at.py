@@ -0,0 +1,31 @@
+"""card last reviewed at
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '015'
+down_revision: Union[str, None] = '014'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 最後に復習した時刻。オフライン同期で、これより前の操作を今の状態に重ねないために使う
+    # （review_logs は write-behind バッファで遅れて入ることがあるのでカード側に持つ）
+    op.add_column('cards', sa.Column('last_reviewed_at', sa.DateTime(), nullable=True))
+    op.execute("""
+        UPDATE cards AS c SET last_reviewed_at = l.last_reviewed_at
+        FROM (SELECT card_id, max(reviewed_at) AS last_reviewed_at FROM review_logs GROUP BY card_id) AS l
+        WHERE c.id = l.card_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('cards', 'last_reviewed_at')
@@ -0,0 +1,32 @@
+"""daily study counts
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = '016'
+down_revision: Union[str, None] = '015'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # ユーザーごと・日ごとに学習した新規カードと復習カードの枚数（セッションの1日の上限に使う）
+    op.create_table(
+        'daily_study_counts',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.id'), primary_key=True),
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('new_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('review_count', sa.Integer(), nullable=False, server_default='0'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('daily_study_counts')
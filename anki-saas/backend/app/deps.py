@@ -1,23 +1,101 @@
 import hashlib
+import hmac
+from typing import Iterator, Optional
 from uuid import UUID
 
 from fastapi import Header, HTTPException, Depends
+from fastapi.exceptions import RequestValidationError
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.database import get_db
 from app.models import ApiKey, User
+from app import replicas, shared_cache
+from app.services import access_tokens
 
 
 def hash_api_key(key: str) -> str:
     return hashlib.sha256(key.encode()).hexdigest()
 
 
+def user_for_api_key(db: Session, api_key: str) -> User:
+    key_hash = hash_api_key(api_key)
+    # ワーカー間の共有キャッシュにあれば DB を引かない（アクセストークンと同じく id だけの User）
+    cache = shared_cache.get_cache()
+    if cache is not None:
+        user_id = cache.get(f"auth:{key_hash}")
+        if user_id is not None:
+            return User(id=UUID(user_id))
+    # api_key.user の遅延ロードで2回目のクエリが走らないよう JOIN で1回にまとめる
+    user = db.query(User).join(ApiKey, ApiKey.user_id == User.id).filter(
+        ApiKey.key_hash == key_hash
+    ).first()
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid API Key")
+    if cache is not None:
+        cache.set(f"auth:{key_hash}", str(user.id), settings.auth_cache_ttl_s)
+    return user
+
+
+def bearer_token(authorization: Optional[str]) -> Optional[str]:
+    if authorization is None:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    return token.strip() if scheme.lower() == "bearer" else None
+
+
 def get_current_user(
-    x_api_key: str = Header(...),
+    x_api_key: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ) -> User:
-    key_hash = hash_api_key(x_api_key)
-    api_key = db.query(ApiKey).filter(ApiKey.key_hash == key_hash).first()
-    if not api_key:
-        raise HTTPException(status_code=401, detail="Invalid API Key")
-    return api_key.user
+    """
+    Authorization: Bearer <アクセストークン> か X-API-Key で認証する
+    トークンは CPU だけで検証し DB を引かない（返す User は id だけのセッション外のもの）
+    """
+    token = bearer_token(authorization)
+    if token is not None:
+        access_token = access_tokens.verify(token)
+        if access_token is None:
+            raise HTTPException(
+                status_code=401, detail="Invalid or expired token", headers={"WWW-Authenticate": "Bearer"}
+            )
+        user = User(id=access_token.user_id)
+    elif x_api_key is None:
+        # どちらも無いときは従来どおり X-API-Key の欠落として 422 を返す
+        raise RequestValidationError([
+            {"type": "missing", "loc": ("header", "x-api-key"), "msg": "Field required", "input": None}
+        ])
+    else:
+        user = user_for_api_key(db, x_api_key)
+    # コミットしたらこのユーザーの読み込みをしばらくプライマリに寄せる（app.replicas）
+    db.info["user_id"] = user.id
+    return user
+
+
+def get_read_db(
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user)
+) -> Iterator[Session]:
+    """
+    書き込まない GET 用のセッション。レプリカがあり、このユーザーの直近の書き込みが
+    届いていればレプリカ、そうでなければリクエストのプライマリのセッションを返す
+    """
+    session_factory = replicas.read_session_factory(user.id)
+    if session_factory is None:
+        yield db
+        return
+    replica = session_factory()
+    try:
+        yield replica
+    finally:
+        replica.close()
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    return bool(settings.admin_token) and bool(token) and hmac.compare_digest(token, settings.admin_token)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin only")
@@ -0,0 +1,45 @@
+"""
+時刻順に並ぶ UUID（UUIDv7, RFC 9562）
+
+先頭 48 ビットが Unix ミリ秒なので、新しい行の主キーは B-tree の右端に追加され、
+ランダムな v4 のようにインデックスのページが散らばらない。
+同じミリ秒内では 12 ビットのカウンタを進め、同一プロセス内では生成順に必ず大きくなる
+（時計が戻った場合も前回の時刻のまま進める）。プロセスをまたぐとミリ秒単位の順序になる。
+"""
+import os
+import threading
+import time
+import uuid
+
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+_COUNTER_MAX = 0xFFF
+_RAND_B_MASK = (1 << 62) - 1
+
+
+def uuid7() -> uuid.UUID:
+    global _last_ms, _counter
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms = ms
+            # 上位ビットを 0 にしておき、同じミリ秒で続けて生成する余地を残す
+            _counter = int.from_bytes(os.urandom(2), "big") & 0x3FF
+        else:
+            _counter += 1
+            if _counter > _COUNTER_MAX:
+                # 1ミリ秒で使い切ったら時刻を1つ進める
+                _last_ms += 1
+                _counter = 0
+        ms, counter = _last_ms, _counter
+
+    rand_b = int.from_bytes(os.urandom(8), "big") & _RAND_B_MASK
+    return uuid.UUID(int=(ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | rand_b)
+
+
+def uuid7_timestamp_ms(value: uuid.UUID) -> int:
+    """UUIDv7 に埋め込まれた Unix ミリ秒"""
+    return value.int >> 80
@@ -1,14 +1,38 @@
 import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+
+from app.config import settings
+from app.database import engine
+from app.metrics import MetricsMiddleware, instrument_engine
+from app.profiling import ProfilingMiddleware
+from app import realtime, replicas
+from app.routers import health, auth, chat, cards, review, anki, metrics, admin, ws
+from app.services import access_tokens, review_log_buffer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 前回の spill ファイルを再生してからリクエストを受け付ける
+    review_log_buffer.start()
+    realtime.start()
+    access_tokens.start()
+    replicas.start()
+    yield
+    replicas.stop()
+    access_tokens.stop()
+    realtime.stop()
+    review_log_buffer.stop()
 
-from app.routers import health, chat, cards, review, anki
 
 app = FastAPI(
     title="Anki SaaS API",
     description="AIチャットからフラッシュカードを生成し、SM-2で復習管理",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan,
 )
 
 # CORS設定（環境変数で制御、デフォルトはローカル開発用）
@@ -22,8 +46,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 大きなレスポンス（カード一覧・NDJSON エクスポート）を gzip 圧縮
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+# X-Profile ヘッダー（管理者トークン）でリクエスト単位のプロファイル
+if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware)
+
+# ルートごとのレイテンシ・SQL・外部API時間（一番外側で圧縮後のサイズまで計測）
+instrument_engine(engine)
+for replica in replicas.replicas:
+    instrument_engine(replica.engine)
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(health.router, tags=["Health"])
+app.include_router(auth.router, tags=["Auth"])
 app.include_router(chat.router, tags=["Chat"])
 app.include_router(cards.router, tags=["Cards"])
 app.include_router(review.router, tags=["Review"])
 app.include_router(anki.router, tags=["Anki"])
+app.include_router(metrics.router, tags=["Metrics"])
+app.include_router(admin.router, tags=["Admin"])
+app.include_router(ws.router, tags=["Realtime"])
@@ -0,0 +1,214 @@
+"""
+リクエスト単位のメトリクス
+
+ルートごとに以下を記録し、/metrics から Prometheus 形式で公開する。
+  - レイテンシ・レスポンスサイズのヒストグラム
+  - SQL の発行回数と合計時間（SQLAlchemy のエンジンイベントから計測）
+  - 外部呼び出し（Claude / AnkiConnect）の合計時間
+
+複数ワーカーで動かす場合は PROMETHEUS_MULTIPROC_DIR を設定すると、
+各ワーカーの値がそのディレクトリ経由で集計される。
+"""
+import logging
+import os
+import time
+from collections import Counter as StatementCounter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.query_counter import repeated_statements
+
+
+logger = logging.getLogger("app.metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+REQUEST_SQL_STATEMENTS = Histogram(
+    "http_request_sql_statements", "SQL statements per request",
+    ["method", "route"], buckets=COUNT_BUCKETS
+)
+REQUEST_SQL_DURATION = Histogram(
+    "http_request_sql_duration_seconds", "Total SQL time per request",
+    ["method", "route"], buckets=LATENCY_BUCKETS
+)
+REQUEST_EXTERNAL_DURATION = Histogram(
+    "http_request_external_duration_seconds", "Total external call time per request",
+    ["method", "route", "service"], buckets=LATENCY_BUCKETS
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Response body size (after compression)",
+    ["method", "route"], buckets=SIZE_BUCKETS
+)
+SLOW_REQUESTS = Counter(
+    "http_slow_requests", "Requests slower than SLOW_REQUEST_MS",
+    ["method", "route"]
+)
+WORD_LOOKUPS = Counter(
+    "word_lookups", "Word lookups by source (dictionary, shared cache or Claude)",
+    ["source"]
+)
+WEBSOCKET_CONNECTIONS = Gauge(
+    "websocket_connections", "Open /ws connections", multiprocess_mode="livesum"
+)
+DB_READ_ROUTING = Counter(
+    "db_read_routing", "Read-only sessions by target database and reason",
+    ["target", "reason"]
+)
+DB_REPLICA_LAG = Gauge(
+    "db_replica_lag_seconds", "Replication lag measured by the last check (-1 if unreachable)",
+    ["replica"], multiprocess_mode="mostrecent"
+)
+
+
+@dataclass
+class RequestStats:
+    sql_count: int = 0
+    sql_time: float = 0.0
+    external: dict[str, float] = field(default_factory=dict)
+    # detect_n_plus_one が有効なときだけ SQL 文ごとの回数を記録する
+    statements: Optional[StatementCounter] = None
+
+
+# スレッドプールで動く同期エンドポイントにもコンテキストごと引き継がれる
+_current_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _current_stats.get()
+
+
+@contextmanager
+def request_stats() -> Iterator[RequestStats]:
+    stats = RequestStats(statements=StatementCounter() if settings.detect_n_plus_one else None)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@contextmanager
+def track_external(service: str) -> Iterator[None]:
+    """外部 API 呼び出しの時間を記録（service: "claude", "anki_connect"）"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.external[service] = stats.external.get(service, 0.0) + time.perf_counter() - start
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info["query_start"].pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.sql_count += 1
+        stats.sql_time += time.perf_counter() - start
+        if stats.statements is not None:
+            stats.statements[statement] += 1
+
+
+def _handle_error(context):
+    # 失敗したクエリは after_cursor_execute が呼ばれないので開始時刻を捨てる
+    starts = context.connection.info.get("query_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def instrument_engine(engine: Engine) -> None:
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    # 未定義のパスはラベルが増えすぎないようにまとめる
+    return getattr(route, "path", "unmatched")
+
+
+class MetricsMiddleware:
+    """
+    ASGI ミドルウェア（StreamingResponse の最後までを1リクエストとして計測）
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        start = time.perf_counter()
+        with request_stats() as stats:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                self._observe(scope, status, size, time.perf_counter() - start, stats)
+
+    def _observe(self, scope, status: int, size: int, duration: float, stats: RequestStats) -> None:
+        method = scope["method"]
+        route = _route_label(scope)
+
+        REQUEST_LATENCY.labels(method, route, str(status)).observe(duration)
+        REQUEST_SQL_STATEMENTS.labels(method, route).observe(stats.sql_count)
+        REQUEST_SQL_DURATION.labels(method, route).observe(stats.sql_time)
+        RESPONSE_SIZE.labels(method, route).observe(size)
+        for service, seconds in stats.external.items():
+            REQUEST_EXTERNAL_DURATION.labels(method, route, service).observe(seconds)
+
+        if duration * 1000 >= settings.slow_request_ms:
+            SLOW_REQUESTS.labels(method, route).inc()
+            external = " ".join(f"{k}={v * 1000:.0f}ms" for k, v in stats.external.items())
+            logger.warning(
+                "slow request %s %s status=%d total=%.0fms sql=%d/%.0fms %s size=%d",
+                method, route, status, duration * 1000,
+                stats.sql_count, stats.sql_time * 1000, external, size
+            )
+
+        if stats.statements:
+            for sql, n in repeated_statements(stats.statements, settings.n_plus_one_threshold):
+                logger.warning("possible N+1 in %s %s: %d x %s", method, route, n, " ".join(sql.split()))
+
+
+def render_metrics() -> tuple[bytes, str]:
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,18 +1,19 @@
-import uuid
 from datetime import datetime, date
 
-from sqlalchemy import Column, String, Text, Float, Integer, Date, DateTime, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Text, Float, Integer, SmallInteger, BigInteger, Date, DateTime, ForeignKey, Computed, text
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 
 from app.database import Base
+from app.ids import uuid7
 
 
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     created_at = Column(DateTime, default=datetime.utcnow)
+    card_version = Column(BigInteger, nullable=False, default=0)  # カード変更のたびに +1
 
     api_keys = relationship("ApiKey", back_populates="user")
     conversations = relationship("Conversation", back_populates="user")
@@ -22,7 +23,7 @@ class User(Base):
 class ApiKey(Base):
     __tablename__ = "api_keys"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     key_hash = Column(String(64), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -33,7 +34,7 @@ class ApiKey(Base):
 class Conversation(Base):
     __tablename__ = "conversations"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     title = Column(String(255))
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -46,7 +47,7 @@ class Conversation(Base):
 class Message(Base):
     __tablename__ = "messages"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     conversation_id = Column(UUID(as_uuid=True), ForeignKey("conversations.id"), nullable=False)
     role = Column(String(20), nullable=False)  # 'user' or 'assistant'
     content = Column(Text, nullable=False)
@@ -58,7 +59,7 @@ class Message(Base):
 class Card(Base):
     __tablename__ = "cards"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     conversation_id = Column(UUID(as_uuid=True), ForeignKey("conversations.id"), nullable=True)
     card_type = Column(String(20), nullable=False)  # 'vocab', 'cloze', 'rewrite'
@@ -69,7 +70,15 @@ class Card(Base):
     interval = Column(Integer, default=0)
     repetitions = Column(Integer, default=0)
     next_review = Column(Date, default=date.today)
+    last_reviewed_at = Column(DateTime)  # オンライン・同期を問わず最後に復習した時刻（migration 015）
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Search fields (generated columns, see migration 002)
+    front_tsv = deferred(Column(TSVECTOR, Computed("to_tsvector('english', front)", persisted=True)))
+    back_tsv = deferred(Column(TSVECTOR, Computed("card_search_ja_tsvector(back)", persisted=True)))
+    # 重複検出のキー（dedup.card_keys、front を書くたびに更新。migration 013）
+    front_fingerprint = deferred(Column(String(16)))
+    front_bands = deferred(Column(ARRAY(BigInteger)))
 
     user = relationship("User", back_populates="cards")
     conversation = relationship("Conversation", back_populates="cards")
@@ -77,11 +86,93 @@ class Card(Base):
 
 
 class ReviewLog(Base):
-    __tablename__ = "review_logs"
+    __tablename__ = "review_logs"  # reviewed_at の月ごとに範囲パーティション（migration 008）
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    user_id = Column(UUID(as_uuid=True), nullable=False)  # cards.user_id の非正規化
     card_id = Column(UUID(as_uuid=True), ForeignKey("cards.id"), nullable=False)
-    rating = Column(Integer, nullable=False)  # 0=Again, 1=Hard, 2=Good, 3=Easy
-    reviewed_at = Column(DateTime, default=datetime.utcnow)
+    rating = Column(SmallInteger, nullable=False)  # 0=Again, 1=Hard, 2=Good, 3=Easy
+    reviewed_at = Column(DateTime, primary_key=True, default=datetime.utcnow)  # パーティションキー
+    # 挿入した時刻（同期で遡った reviewed_at でも挿入順に並ぶ。migration 014）
+    logged_at = Column(DateTime, nullable=False, server_default=text("timezone('utc', clock_timestamp())"))
 
     card = relationship("Card", back_populates="review_logs")
+
+
+class ReviewSession(Base):
+    __tablename__ = "review_sessions"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    card_ids = Column(ARRAY(UUID(as_uuid=True)), nullable=False)  # 出題順のカード ID
+    position = Column(Integer, nullable=False, default=0)  # 次に出す card_ids の添字 (0 始まり)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class DueCount(Base):
+    __tablename__ = "due_counts"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)  # next_review の日付（期限切れは rebuild 時の今日にまとめる）
+    count = Column(Integer, nullable=False, default=0)
+
+
+class DailyStudyCount(Base):
+    __tablename__ = "daily_study_counts"  # 1日の新規・復習の上限をセッションをまたいで守るための集計
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    new_count = Column(Integer, nullable=False, default=0)  # その日に初めて復習したカード
+    review_count = Column(Integer, nullable=False, default=0)  # その日に復習した復習カード（学習中は含まない）
+
+
+class ImportJob(Base):
+    __tablename__ = "import_jobs"  # POST /cards/import の進捗（どのワーカーからも照会できるよう DB に置く）
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    filename = Column(String(255), nullable=False)
+    format = Column(String(10), nullable=False)
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, completed, failed
+    bytes_total = Column(BigInteger, nullable=False, default=0)
+    bytes_read = Column(BigInteger, nullable=False, default=0)
+    rows_parsed = Column(Integer, nullable=False, default=0)
+    imported = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+    @property
+    def progress(self) -> float:
+        if self.status == "completed":
+            return 1.0
+        if not self.bytes_total:
+            return 0.0
+        return min(self.bytes_read / self.bytes_total, 1.0)
+
+
+class AppliedOp(Base):
+    __tablename__ = "applied_ops"  # POST /review/sync の冪等キー（OP_RETENTION_DAYS で削除）
+
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    op_id = Column(UUID(as_uuid=True), primary_key=True)  # クライアントが生成
+    applied_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class CardTombstone(Base):
+    __tablename__ = "card_tombstones"  # 同期の差分で削除を伝える（TOMBSTONE_RETENTION_DAYS で削除）
+
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    card_id = Column(UUID(as_uuid=True), primary_key=True)
+    deleted_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"  # アクセストークンの失効リスト（expires_at を過ぎたら不要）
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    token_id = Column(UUID(as_uuid=True), nullable=True)  # NULL ならユーザーの revoked_at 以前の発行分すべて
+    revoked_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
@@ -0,0 +1,168 @@
+"""
+リクエスト単位のオンデマンド・プロファイリング
+
+管理者トークン付きの X-Profile ヘッダー、または PROFILE_SAMPLE_RATE の確率で選ばれた
+リクエストだけ、別スレッドから一定間隔で全スレッドのスタックを採取する（wall-clock）。
+同期エンドポイントはスレッドプール上で動くため、app パッケージのフレームを含む
+スタックだけを残す。同時に処理中の他リクエストのスタックも混ざりうるので、
+先頭にスレッド名を付けて区別できるようにしている。
+
+結果は collapsed stack 形式（flamegraph.pl / speedscope でそのまま開ける）で
+PROFILE_DIR に保存し、PROFILE_MAX_FILES を超えた古いものから削除する。
+PROFILING_ENABLED=false のときはミドルウェアを組み込まないのでオーバーヘッドはない。
+"""
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.deps import is_admin_token
+
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_SUFFIX = ".collapsed"
+PROFILE_HEADER = b"x-profile"
+
+
+class WallClockSampler(threading.Thread):
+    def __init__(self, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = _app_stack(frame)
+                if stack is None:
+                    continue
+                name = names.get(thread_id)
+                if name is None:
+                    name = names[thread_id] = _thread_name(thread_id)
+                self.samples[";".join([name, *stack])] += 1
+
+    def stop(self) -> Counter:
+        self._stop_event.set()
+        self.join()
+        return self.samples
+
+
+def _thread_name(thread_id: int) -> str:
+    for thread in threading.enumerate():
+        if thread.ident == thread_id:
+            return thread.name
+    return f"thread-{thread_id}"
+
+
+def _app_stack(frame) -> Optional[list[str]]:
+    """ルート→末端の順のフレーム一覧。app のコードを含まないスタックは None"""
+    stack = []
+    in_app = False
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename.startswith(APP_DIR):
+            in_app = True
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    if not in_app:
+        return None
+    stack.reverse()
+    return stack
+
+
+def _safe_name(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", value).strip("_") or "root"
+
+
+def save_profile(samples: Counter, method: str, route: str, duration: float) -> str:
+    os.makedirs(settings.profile_dir, exist_ok=True)
+    name = (
+        f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{method}-{_safe_name(route)}"
+        f"-{duration * 1000:.0f}ms{PROFILE_SUFFIX}"
+    )
+    path = os.path.join(settings.profile_dir, name)
+    with open(path, "w") as f:
+        for stack, count in samples.most_common():
+            f.write(f"{stack} {count}\n")
+
+    enforce_retention()
+    return name
+
+
+def list_profiles() -> list[dict]:
+    if not os.path.isdir(settings.profile_dir):
+        return []
+    profiles = []
+    for entry in os.scandir(settings.profile_dir):
+        if entry.is_file() and entry.name.endswith(PROFILE_SUFFIX):
+            stat = entry.stat()
+            profiles.append({
+                "name": entry.name,
+                "size": stat.st_size,
+                "created_at": datetime.utcfromtimestamp(stat.st_mtime),
+            })
+    profiles.sort(key=lambda p: p["name"], reverse=True)
+    return profiles
+
+
+def profile_path(name: str) -> Optional[str]:
+    """一覧に存在するファイル名だけを受け付ける（パストラバーサル対策）"""
+    if os.path.basename(name) != name or not name.endswith(PROFILE_SUFFIX):
+        return None
+    path = os.path.join(settings.profile_dir, name)
+    return path if os.path.isfile(path) else None
+
+
+def enforce_retention() -> None:
+    profiles = list_profiles()
+    for old in profiles[settings.profile_max_files:]:
+        try:
+            os.remove(os.path.join(settings.profile_dir, old["name"]))
+        except OSError:
+            pass
+
+
+def _should_profile(scope) -> bool:
+    for key, value in scope.get("headers", ()):
+        if key == PROFILE_HEADER:
+            return is_admin_token(value.decode("latin-1"))
+    return settings.profile_sample_rate > 0 and random.random() < settings.profile_sample_rate
+
+
+def _finish(sampler: WallClockSampler, method: str, route: str, duration: float) -> str:
+    samples = sampler.stop()
+    return save_profile(samples, method, route, duration)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        sampler = WallClockSampler(settings.profile_interval_ms / 1000)
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            duration = time.perf_counter() - start
+            route = getattr(scope.get("route"), "path", scope.get("path", ""))
+            # スレッドの join とファイルの書き込み・古いファイルの削除でイベントループを止めない
+            await run_in_threadpool(_finish, sampler, scope["method"], route, duration)
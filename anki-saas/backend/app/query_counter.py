@@ -0,0 +1,53 @@
+"""
+クエリ数の計測と N+1 検出
+
+QueryCounter はエンジンに対して発行された SQL をスレッドを問わずすべて数える（テスト用）。
+開発時は DETECT_N_PLUS_ONE=true にすると、メトリクスミドルウェアが
+1リクエスト内で同じ SQL が何度も発行されたときに警告を出す。
+"""
+import threading
+from collections import Counter
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def repeated_statements(statements: Counter, threshold: int) -> list[tuple[str, int]]:
+    """threshold 回以上発行された同一 SQL（パラメータ違いは同一とみなす）"""
+    return [(sql, n) for sql, n in statements.most_common() if n >= threshold]
+
+
+class QueryCounter:
+    """
+    with QueryCounter(engine) as counter:
+        ...
+    counter.count / counter.statements
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.statements: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        return sum(self.statements.values())
+
+    def repeated(self, threshold: int = 2) -> list[tuple[str, int]]:
+        return repeated_statements(self.statements, threshold)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            self.statements[statement] += 1
+
+    def __enter__(self) -> "QueryCounter":
+        event.listen(self.engine, "after_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc) -> Optional[bool]:
+        event.remove(self.engine, "after_cursor_execute", self._on_execute)
+        return None
+
+    def report(self) -> str:
+        return "\n".join(f"{n:4d}x {sql}" for sql, n in self.statements.most_common())
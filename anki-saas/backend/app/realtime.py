@@ -0,0 +1,217 @@
+"""
+カード・復習予定の変更を WebSocket (/ws) でリアルタイムに配信する
+
+変更する処理は publish でセッションにイベントを積むだけにしておき、コミット直前に
+ユーザーごと1回の pg_notify にまとめて送る。NOTIFY はコミットされたときだけ届くので、
+ロールバックした変更が配信されることはない。
+
+各ワーカーは NotifyListener スレッドで LISTEN し、受け取ったペイロードを
+そのワーカーに接続しているユーザーの WebSocket にそのまま（再エンコードせず）流す。
+これで複数の uvicorn ワーカーにまたがって同じユーザーの全端末に届く。
+
+イベント（JSON、ids はカード ID）:
+  {"type": "card.created" | "card.updated" | "card.deleted" | "card.reviewed", "ids": [...]}
+  {"type": "cards.changed", "count": n}     インポートなど件数が多い変更（一覧を取り直す）
+  {"type": "due", "deltas": {"YYYY-MM-DD": 増減}}   due_counts と同じ日ごとの増減
+  {"type": "resync"}   取りこぼしの可能性あり（LISTEN の再接続・送信キューのあふれ・大きすぎる変更）
+1回の通知は {"events": [...]} にまとめて送る。
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+from collections import defaultdict
+from datetime import date
+from typing import Optional
+from uuid import UUID
+
+import psycopg2
+import psycopg2.extensions
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal, engine
+
+
+logger = logging.getLogger("app.realtime")
+
+CHANNEL = "card_events"
+MAX_PAYLOAD_BYTES = 7900  # pg_notify の上限は 8000 バイト
+MAX_EVENT_IDS = 200  # これより多い変更は件数だけ送る
+QUEUE_SIZE = 64  # 接続ごとの未送信イベント数。あふれたら resync を1つだけ送る
+
+RESYNC = json.dumps({"events": [{"type": "resync"}]})
+
+
+def publish(db: Session, user_id: UUID, type_: str, ids=None, count: Optional[int] = None) -> None:
+    """コミット時に配信するカードの変更イベントを積む（ids か count のどちらか）"""
+    if not settings.realtime_enabled:
+        return
+    events = db.info.setdefault("realtime_events", {}).setdefault(user_id, {})
+    if ids is not None:
+        events.setdefault(type_, []).extend(ids)
+    else:
+        events.setdefault(type_, []).append(count)
+
+
+def publish_due(db: Session, user_id: UUID, deltas: dict[date, int]) -> None:
+    if not settings.realtime_enabled:
+        return
+    events = db.info.setdefault("realtime_events", {}).setdefault(user_id, {})
+    events.setdefault("due", []).append(deltas)
+
+
+def encode(user_id: UUID, events: dict) -> Optional[str]:
+    """通知ペイロード: '<user_id>:<クライアントに送る JSON>'。送るものが無ければ None"""
+    out = []
+    for type_, values in events.items():
+        if type_ == "due":
+            total: dict[date, int] = {}
+            for deltas in values:
+                for day, n in deltas.items():
+                    total[day] = total.get(day, 0) + n
+            deltas = {day.isoformat(): n for day, n in sorted(total.items()) if n}
+            if deltas:
+                out.append({"type": "due", "deltas": deltas})
+        elif type_ == "cards.changed":
+            out.append({"type": type_, "count": sum(values)})
+        elif len(values) > MAX_EVENT_IDS:
+            out.append({"type": "cards.changed", "count": len(values)})
+        else:
+            out.append({"type": type_, "ids": [str(i) for i in values]})
+    if not out:
+        return None
+    body = json.dumps({"events": out}, separators=(",", ":"))
+    if len(body.encode()) > MAX_PAYLOAD_BYTES - 40:
+        body = RESYNC
+    return f"{user_id}:{body}"
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _notify_before_commit(session: Session) -> None:
+    pending = session.info.pop("realtime_events", None)
+    if not pending:
+        return
+    for user_id, events in pending.items():
+        payload = encode(user_id, events)
+        if payload is not None:
+            session.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop("realtime_events", None)
+
+
+class Hub:
+    """このワーカーに接続している WebSocket の送信キュー（イベントループ上でだけ触る）"""
+
+    def __init__(self):
+        self._queues: dict[str, set[asyncio.Queue]] = defaultdict(set)
+
+    def subscribe(self, user_id: UUID) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(QUEUE_SIZE)
+        self._queues[str(user_id)].add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: UUID, queue: asyncio.Queue) -> None:
+        key = str(user_id)
+        queues = self._queues.get(key)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._queues[key]
+
+    def __len__(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def dispatch(self, payload: str) -> None:
+        user_id, _, body = payload.partition(":")
+        for queue in self._queues.get(user_id, ()):
+            self._put(queue, body)
+
+    def resync_all(self) -> None:
+        for queues in self._queues.values():
+            for queue in queues:
+                self._put(queue, RESYNC)
+
+    @staticmethod
+    def _put(queue: asyncio.Queue, body: str) -> None:
+        try:
+            queue.put_nowait(body)
+        except asyncio.QueueFull:
+            # 読まない端末のためにイベントを溜め続けない。残りは捨てて取り直してもらう
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESYNC)
+
+
+hub = Hub()
+
+
+class NotifyListener(threading.Thread):
+    """LISTEN 専用のコネクションで通知を待ち、イベントループの hub に渡す"""
+
+    def __init__(self, dsn: str, loop: asyncio.AbstractEventLoop, hub: Hub):
+        super().__init__(name="realtime-listener", daemon=True)
+        self.dsn = dsn
+        self.loop = loop
+        self.hub = hub
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        backoff = 1.0
+        first = True
+        while not self._stop_event.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                conn.cursor().execute(f"LISTEN {CHANNEL}")
+                if not first:
+                    # 切断中の通知は届かないので、接続中の端末に取り直してもらう
+                    self.loop.call_soon_threadsafe(self.hub.resync_all)
+                first = False
+                backoff = 1.0
+                self._listen(conn)
+            except (psycopg2.Error, OSError):
+                logger.warning("LISTEN connection failed; retrying in %.0fs", backoff, exc_info=True)
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _listen(self, conn) -> None:
+        while not self._stop_event.is_set():
+            if select.select([conn], [], [], 1.0) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                payload = conn.notifies.pop(0).payload
+                self.loop.call_soon_threadsafe(self.hub.dispatch, payload)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+_listener: Optional[NotifyListener] = None
+
+
+def start() -> None:
+    global _listener
+    if not settings.realtime_enabled or _listener is not None:
+        return
+    dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+    _listener = NotifyListener(dsn, asyncio.get_running_loop(), hub)
+    _listener.start()
+
+
+def stop() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,256 @@
+"""
+読み取り専用レプリカへの振り分け
+
+DATABASE_REPLICA_URLS を設定すると、get_read_db を使う GET（一覧・復習予定・検索・エクスポート）の
+セッションをレプリカに向け、復習の書き込みとプライマリを取り合わないようにする。
+
+位置はすべて WAL の LSN で比べる（レプリカの時計や「受信済みを再生し終えた」かどうかに頼らない）。
+  - 各ワーカーのバックグラウンドのスレッド（start で起動）が REPLICA_CHECK_INTERVAL_S ごとに
+    プライマリの pg_current_wal_lsn() を記録し、各レプリカの pg_last_wal_replay_lsn() と比べて遅延を出す
+    （遅延 = 今 − レプリカが再生済みの LSN に達していた最後の記録の時刻）。
+    遅延が REPLICA_MAX_LAG_S を超える・接続できないレプリカには振らない。
+    リクエストは測った結果を見るだけで、レプリカへの接続を待たない
+  - 書き込んだトランザクションはコミットの直前に同じ接続で WAL の位置を読んでおき、
+    レプリカの再生位置がその先に達するまでそのユーザーの読み込みをプライマリで行う
+    （書き込みの無いトランザクションとリクエスト以外のセッションでは読まない）
+どのレプリカにも振れないときはプライマリで読む。振り分け結果は db_read_routing で数える。
+
+ユーザーごとの LSN はワーカー間の共有キャッシュに置き、別のワーカーで書いた直後の読み込みもプライマリに行く。
+共有キャッシュが無ければワーカー内だけで覚える。
+"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import shared_cache
+from app.config import settings
+from app.database import SessionLocal, engine
+from app.metrics import DB_READ_ROUTING, DB_REPLICA_LAG
+
+
+logger = logging.getLogger("app.replicas")
+
+PRIMARY_LSN_SQL = text("SELECT pg_current_wal_lsn()::text")
+# 書き込んだトランザクションだけ位置を返す（読むだけのトランザクションは NULL）
+WRITE_LSN_SQL = text("""
+    SELECT CASE WHEN pg_current_xact_id_if_assigned() IS NOT NULL THEN pg_current_wal_insert_lsn() END::text
+""")
+# プライマリを指定された場合（テスト用の構成など）は現在位置をそのまま使う
+REPLAY_LSN_SQL = text("""
+    SELECT CASE WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn() ELSE pg_current_wal_lsn() END::text
+""")
+
+# LSN が取れなかったコミットはこの値で記録し、記録が消えるまでプライマリで読ませる
+UNKNOWN_LSN = 2 ** 64 - 1
+
+
+def parse_lsn(value: Optional[str]) -> int:
+    """'16/B374D848' → 整数。NULL（まだ何も再生していない standby）は 0"""
+    if not value:
+        return 0
+    high, _, low = value.partition("/")
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+@dataclass
+class Replica:
+    name: str
+    engine: Engine
+    session_factory: sessionmaker
+    replay_lsn: int = 0
+    lag: Optional[float] = None  # None: まだ測れていない・接続できない
+
+
+def _make_replica(url: str) -> Replica:
+    # 落ちているレプリカの接続待ちでリクエストを止めない
+    engine = create_engine(url, connect_args={"connect_timeout": 2})
+    parsed = make_url(url)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine, info={"replica": True})
+    return Replica(f"{parsed.host}:{parsed.port or 5432}", engine, session_factory)
+
+
+replicas: list[Replica] = [
+    _make_replica(url.strip()) for url in settings.database_replica_urls.split(",") if url.strip()
+]
+
+# プライマリの (時刻, LSN) の記録。遅延の上限より少し長い期間だけ持つ
+_primary_samples: deque[tuple[float, int]] = deque()
+_checked_at = 0.0
+_check_lock = threading.Lock()
+
+
+def primary_lsn() -> int:
+    with engine.connect() as conn:
+        return parse_lsn(conn.execute(PRIMARY_LSN_SQL).scalar())
+
+
+def lag_from_samples(replay_lsn: int, now: float) -> Optional[float]:
+    """再生位置がプライマリのどの記録まで追いついているかで遅延を出す。どの記録にも届いていなければ None"""
+    for sampled_at, lsn in reversed(_primary_samples):
+        if lsn <= replay_lsn:
+            return max(now - sampled_at, 0.0)
+    if _primary_samples and now - _primary_samples[0][0] > settings.replica_max_lag_s:
+        # 保持している一番古い記録にも届いていない = 遅延の上限を超えている
+        return now - _primary_samples[0][0]
+    return None
+
+
+def check_lag(now: Optional[float] = None) -> None:
+    """前回から REPLICA_CHECK_INTERVAL_S 経っていれば測り直す（同時に測るのは1スレッドだけ）"""
+    global _checked_at
+    now = now if now is not None else time.time()
+    if now - _checked_at < settings.replica_check_interval_s:
+        return
+    if not _check_lock.acquire(blocking=False):
+        return  # 他のスレッドが測っている間は前回の値を使う
+    try:
+        # 先にプライマリを見る（レプリカの再生位置はこれ以降なので、この記録と比べても遅延を小さく見積もらない）
+        try:
+            _primary_samples.append((now, primary_lsn()))
+        except Exception:
+            logger.warning("could not read the primary WAL position", exc_info=True)
+        horizon = now - settings.replica_max_lag_s - 2 * settings.replica_check_interval_s
+        while len(_primary_samples) > 1 and _primary_samples[1][0] < horizon:
+            _primary_samples.popleft()
+
+        for replica in replicas:
+            try:
+                with replica.engine.connect() as conn:
+                    replica.replay_lsn = parse_lsn(conn.execute(REPLAY_LSN_SQL).scalar())
+                replica.lag = lag_from_samples(replica.replay_lsn, now)
+            except Exception:
+                logger.warning("replica %s is unreachable", replica.name, exc_info=True)
+                replica.lag = None
+            DB_REPLICA_LAG.labels(replica.name).set(replica.lag if replica.lag is not None else -1)
+        _checked_at = now
+    finally:
+        _check_lock.release()
+
+
+class LagMonitor(threading.Thread):
+    """REPLICA_CHECK_INTERVAL_S ごとに check_lag を呼ぶ"""
+
+    def __init__(self, interval: float):
+        super().__init__(name="replica-lag", daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while True:
+            check_lag()
+            if self._stop_event.wait(self.interval):
+                return
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+_monitor: Optional[LagMonitor] = None
+
+
+def start() -> None:
+    global _monitor
+    if not replicas or _monitor is not None:
+        return
+    _monitor = LagMonitor(settings.replica_check_interval_s)
+    _monitor.start()
+
+
+def stop() -> None:
+    global _monitor
+    if _monitor is not None:
+        _monitor.stop()
+        _monitor = None
+
+
+# 共有キャッシュが無いとき用（ワーカー内だけ）。user_id → (コミット時刻, LSN)
+_last_writes: dict[UUID, tuple[float, int]] = {}
+
+
+def _write_ttl() -> float:
+    # これより古い書き込みは、遅延の上限内のレプリカなら必ず再生済み
+    return settings.replica_max_lag_s + settings.replica_check_interval_s + 1.0
+
+
+def mark_write(user_id: UUID, lsn: int, now: Optional[float] = None) -> None:
+    now = now if now is not None else time.time()
+    _last_writes[user_id] = (now, lsn)
+    if len(_last_writes) > 10000:
+        cutoff = now - _write_ttl()
+        for key in [k for k, (t, _) in _last_writes.items() if t < cutoff]:
+            _last_writes.pop(key, None)
+    cache = shared_cache.get_cache()
+    if cache is not None:
+        cache.set(f"wrote:{user_id}", lsn, _write_ttl())
+
+
+def last_write_lsn(user_id: UUID, now: Optional[float] = None) -> int:
+    """このユーザーの直近のコミットの LSN（TTL 内に無ければ 0）"""
+    now = now if now is not None else time.time()
+    written_at, lsn = _last_writes.get(user_id, (0.0, 0))
+    if now - written_at > _write_ttl():
+        lsn = 0
+    cache = shared_cache.get_cache()
+    if cache is not None:
+        lsn = max(lsn, cache.get(f"wrote:{user_id}") or 0)
+    return lsn
+
+
+def read_session_factory(user_id: UUID) -> Optional[sessionmaker]:
+    """user_id の読み込みに使うレプリカ。None ならプライマリで読む"""
+    if not replicas:
+        return None
+    healthy = [r for r in replicas if r.lag is not None and r.lag <= settings.replica_max_lag_s]
+    if not healthy:
+        DB_READ_ROUTING.labels("primary", "lagging").inc()
+        return None
+
+    written = last_write_lsn(user_id)
+    candidates = [r for r in healthy if r.replay_lsn >= written]
+    if not candidates:
+        DB_READ_ROUTING.labels("primary", "recent_write").inc()
+        return None
+    replica = random.choice(candidates)
+    DB_READ_ROUTING.labels(replica.name, "replica").inc()
+    return replica.session_factory
+
+
+def transaction_lsn(session: Session) -> Optional[int]:
+    """このトランザクションが書いた WAL の末尾。何も書いていなければ None"""
+    session.flush()  # before_commit はフラッシュより前に呼ばれるので、先に書かせてから位置を読む
+    value = session.execute(WRITE_LSN_SQL).scalar()
+    if value is None:
+        return None
+    # コミットのレコードはこの位置の後ろに書かれるので、レプリカにはこれより先まで再生していることを求める
+    return parse_lsn(value) + 1
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _read_write_lsn(session: Session) -> None:
+    # get_current_user（とバックグラウンドのインポート）がセッションに書き込み主を入れておく
+    if session.info.get("user_id") is None or not replicas:
+        return
+    try:
+        session.info["write_lsn"] = transaction_lsn(session)
+    except Exception:
+        logger.warning("could not read the WAL position before commit", exc_info=True)
+        session.info["write_lsn"] = UNKNOWN_LSN
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _mark_write_after_commit(session: Session) -> None:
+    lsn = session.info.pop("write_lsn", None)
+    user_id = session.info.get("user_id")
+    if lsn is None or user_id is None:
+        return
+    mark_write(user_id, lsn)
@@ -0,0 +1,68 @@
+"""
+一覧系・エクスポート系エンドポイント用の高速 JSON レスポンス
+
+ORM オブジェクト → Pydantic モデル → response_model の再検証、という二重の変換を避け、
+Core の select で取った行をそのまま orjson で1回だけシリアライズする。
+Response を直接返すので FastAPI による response_model の検証は行われない
+（response_model は OpenAPI のスキーマとしてだけ使われる）。
+"""
+from typing import Any, Iterator, Optional, Sequence
+
+import orjson
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.engine import Result
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql import Select
+
+from app.database import SessionLocal
+
+
+STREAM_BATCH_SIZE = 1000
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        # UUID / date / datetime は orjson がネイティブに扱い、Pydantic と同じ ISO 形式になる
+        return orjson.dumps(content)
+
+
+def rows_as_dicts(result: Result) -> list[dict]:
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
+
+def _ndjson_lines(
+    stmt: Select, batch_size: int, session_factory: Optional[sessionmaker] = None, followed_by: Sequence[Select] = ()
+) -> Iterator[bytes]:
+    # レスポンスを返し終わるまで使うので、リクエストのセッションとは別に開く
+    db = (session_factory or SessionLocal)()
+    try:
+        for query in (stmt, *followed_by):
+            result = db.execute(query.execution_options(yield_per=batch_size))
+            keys = list(result.keys())
+            for rows in result.partitions():
+                yield b"".join(orjson.dumps(dict(zip(keys, row))) + b"\n" for row in rows)
+    finally:
+        db.close()
+
+
+def ndjson_response(
+    stmt: Select,
+    filename: str,
+    batch_size: int = STREAM_BATCH_SIZE,
+    session_factory: Optional[sessionmaker] = None,
+    followed_by: Sequence[Select] = ()
+) -> StreamingResponse:
+    """
+    サーバーサイドカーソル（yield_per）で読みながら1行1JSONで流す
+    メモリ使用量は batch_size 行分で一定
+    session_factory: レプリカから読むとき（None ならプライマリ）
+    followed_by: stmt の後に続けて流す select（列の異なる行を同じファイルに入れるとき）
+    """
+    return StreamingResponse(
+        _ndjson_lines(stmt, batch_size, session_factory, followed_by),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,35 @@
+"""
+Admin-only endpoints
+"""
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+
+from app.deps import require_admin
+from app import profiling
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+class ProfileInfo(BaseModel):
+    name: str
+    size: int
+    created_at: datetime
+
+
+@router.get("/admin/profiles", response_model=list[ProfileInfo])
+def list_profiles():
+    """保存済みのプロファイル一覧（新しい順）"""
+    return profiling.list_profiles()
+
+
+@router.get("/admin/profiles/{name}")
+def get_profile(name: str):
+    """プロファイル（collapsed stack 形式）をダウンロード"""
+    path = profiling.profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=name)
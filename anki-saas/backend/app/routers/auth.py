@@ -0,0 +1,58 @@
+"""
+アクセストークンの発行・失効
+"""
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import get_db
+from app.deps import bearer_token, get_current_user, user_for_api_key
+from app.models import User
+from app.services import access_tokens
+
+
+router = APIRouter()
+
+
+class TokenResponse(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int
+
+
+class RevokeRequest(BaseModel):
+    all_tokens: bool = False  # true ならこのユーザーがこれまでに発行した全トークン
+
+
+@router.post("/auth/token", response_model=TokenResponse)
+def create_token(
+    x_api_key: str = Header(...),
+    db: Session = Depends(get_db)
+):
+    """API キーを短命のアクセストークン（Authorization: Bearer で使う）に交換する"""
+    if not access_tokens.enabled():
+        raise HTTPException(status_code=503, detail="Access tokens are not configured")
+    user = user_for_api_key(db, x_api_key)
+    token, _ = access_tokens.issue(user.id)
+    return TokenResponse(access_token=token, expires_in=settings.token_ttl_s)
+
+
+@router.post("/auth/revoke", status_code=204)
+def revoke_token(
+    req: RevokeRequest,
+    authorization: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    """使っているトークン、または all_tokens で発行済みの全トークンを失効させる"""
+    token = None
+    if not req.all_tokens:
+        value = bearer_token(authorization)
+        token = access_tokens.verify(value) if value is not None else None
+        if token is None:
+            raise HTTPException(status_code=400, detail="No access token to revoke")
+    access_tokens.revoke(db, user.id, token, datetime.utcnow())
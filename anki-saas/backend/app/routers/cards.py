@@ -1,16 +1,29 @@
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Query, UploadFile
+from sqlalchemy import literal, select
 from sqlalchemy.orm import Session
 
+from app import realtime, replicas
 from app.database import get_db
-from app.deps import get_current_user
-from app.models import User, Conversation, Message, Card
+from app.deps import get_current_user, get_read_db
+from app.models import User, Conversation, Message, Card, CardTombstone
+from app.responses import ndjson_response
 from app.schemas import (
     GenerateRequest, GenerateResponse, CardCandidate,
-    ApproveRequest, ApproveResponse, CardOut,
-    LookupRequest, LookupResponse, QuickCardRequest, CardUpdate
+    ApproveRequest, ApproveResponse, CardOut, BulkCardRequest,
+    LookupRequest, LookupResponse, QuickCardRequest, QuickBatchRequest,
+    CardUpdate, ImportJobOut, CardSearchResponse
 )
+from app.services import card_import, dedup, due_counts
+from app.services.card_store import create_cards, quick_card_fields, to_duplicate_out
+from app.services.card_version import bump_card_version
+from app.services.card_search import search_cards
 from app.services.card_generator import generate_cards_from_conversation
 from app.services.word_lookup import lookup_word
 
@@ -55,7 +68,14 @@ def generate_cards(
         if c.get("front") and c.get("back")
     ]
 
-    return GenerateResponse(candidates=candidates)
+    # 既に持っているカードと重複する候補は除外
+    index = dedup.candidate_index(db, user.id, (c.front for c in candidates))
+    candidates, matches = dedup.split_duplicates(index, candidates)
+
+    return GenerateResponse(
+        candidates=candidates,
+        duplicates=[to_duplicate_out(c.front, m) for c, m in matches]
+    )
 
 
 @router.post("/approve", response_model=ApproveResponse)
@@ -73,24 +93,41 @@ def approve_cards(
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    created_cards = []
-    for card_data in req.cards:
-        card = Card(
-            user_id=user.id,
-            conversation_id=conversation.id,
-            card_type=card_data.card_type,
-            front=card_data.front,
-            back=card_data.back
-        )
-        db.add(card)
-        db.flush()
-        created_cards.append(card)
-
+    response = create_cards(
+        db, user.id,
+        [c.model_dump() for c in req.cards],
+        conversation_id=conversation.id,
+        allow_duplicates=req.allow_duplicates
+    )
     db.commit()
 
-    return ApproveResponse(
-        created=[CardOut.model_validate(c) for c in created_cards]
+    return response
+
+
+@router.post("/cards/bulk", response_model=ApproveResponse)
+def bulk_create_cards(
+    req: BulkCardRequest,
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    """カード候補をまとめて作成（数百件単位の承認向け）"""
+    if req.conversation_id:
+        conversation = db.query(Conversation.id).filter(
+            Conversation.id == req.conversation_id,
+            Conversation.user_id == user.id
+        ).first()
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+
+    response = create_cards(
+        db, user.id,
+        [c.model_dump() for c in req.cards],
+        conversation_id=req.conversation_id,
+        allow_duplicates=req.allow_duplicates
     )
+    db.commit()
+
+    return response
 
 
 @router.post("/lookup", response_model=LookupResponse)
@@ -98,8 +135,8 @@ def lookup_word_endpoint(
     req: LookupRequest,
     user: User = Depends(get_current_user)
 ):
-    """単語の意味を取得（Claude API）"""
-    result = lookup_word(req.word, req.context)
+    """単語の意味を取得（ローカル辞書 → なければ Claude API）"""
+    result = lookup_word(req.word, req.context, contextual=req.contextual)
     return LookupResponse(**result)
 
 
@@ -110,27 +147,127 @@ def quick_create_card(
     user: User = Depends(get_current_user)
 ):
     """単語から直接カードを作成"""
-    # Determine front/back based on card_type
-    if req.card_type == "cloze" and req.context:
-        # Cloze: 文脈で単語を___に置換
-        front = req.context.replace(req.word, "___")
-        back = req.word
-    else:
-        # Vocab: 単語 → 意味
-        front = req.word
-        back = req.meaning
-
-    card = Card(
-        user_id=user.id,
-        card_type=req.card_type,
-        front=front,
-        back=back
+    fields = quick_card_fields(req)
+    if not req.allow_duplicates:
+        match = dedup.candidate_index(db, user.id, [fields["front"]]).find(fields["front"])
+        if match:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Card already exists: {match.front}"
+            )
+
+    response = create_cards(db, user.id, [fields], allow_duplicates=True)
+    db.commit()
+
+    return response.created[0]
+
+
+@router.post("/quick/batch", response_model=ApproveResponse)
+def quick_create_cards_batch(
+    req: QuickBatchRequest,
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    """複数の単語からまとめてカードを作成"""
+    response = create_cards(
+        db, user.id,
+        [quick_card_fields(c) for c in req.cards],
+        allow_duplicates=req.allow_duplicates
     )
-    db.add(card)
     db.commit()
-    db.refresh(card)
 
-    return CardOut.model_validate(card)
+    return response
+
+
+@router.get("/cards/search", response_model=CardSearchResponse)
+def search_cards_endpoint(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db),
+    user: User = Depends(get_current_user)
+):
+    """カードを全文検索・あいまい検索（スコア順）"""
+    results, has_more = search_cards(db, user.id, q, limit, offset)
+    return CardSearchResponse(results=results, limit=limit, offset=offset, has_more=has_more)
+
+
+@router.get("/cards/export.ndjson")
+def export_cards(
+    since: Optional[datetime] = Query(None, description="この日時以降に作成・更新・削除されたカードのみ"),
+    user: User = Depends(get_current_user)
+):
+    """
+    全カードを NDJSON でストリーミング出力（バックアップ・分析用）
+
+    since を付けると差分になり、カードの行の後に期間内に削除されたカードを
+    {"id": ..., "deleted": true, "deleted_at": ...} の行で続ける。
+    削除の記録（card_tombstones）は review_sync.RETENTION_DAYS 日で消えるので、
+    それより前の since では削除の一部が漏れる。その場合は since なしの全件で取り直す
+    """
+    stmt = select(
+        Card.id, Card.conversation_id, Card.card_type, Card.front, Card.back,
+        Card.ease_factor, Card.interval, Card.repetitions, Card.next_review,
+        Card.created_at, Card.updated_at
+    ).where(Card.user_id == user.id)
+    if since is not None:
+        stmt = stmt.where(Card.updated_at >= since)
+    stmt = stmt.order_by(Card.updated_at, Card.id)
+
+    deletions = []
+    if since is not None:
+        deletions.append(
+            select(CardTombstone.card_id.label("id"), literal(True).label("deleted"), CardTombstone.deleted_at)
+            .where(CardTombstone.user_id == user.id, CardTombstone.deleted_at >= since)
+            .order_by(CardTombstone.deleted_at, CardTombstone.card_id)
+        )
+
+    return ndjson_response(
+        stmt, "cards.ndjson", session_factory=replicas.read_session_factory(user.id), followed_by=deletions
+    )
+
+
+@router.post("/cards/import", response_model=ImportJobOut, status_code=202)
+def import_cards(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, description="csv, tsv, apkg（省略時は拡張子から判定）"),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    """CSV/TSV/.apkg からカードを一括インポート（バックグラウンドジョブ）"""
+    fmt = card_import.detect_format(file.filename, format)
+    if fmt is None:
+        raise HTTPException(status_code=400, detail="Unsupported file format (csv, tsv, apkg)")
+
+    # アップロードをチャンク単位でディスクに退避（メモリに全体を載せない）
+    fd, path = tempfile.mkstemp(prefix="card-import-", suffix=f".{fmt}")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            shutil.copyfileobj(file.file, out, 1024 * 1024)
+            size = out.tell()
+        job = card_import.create_job(db, user.id, file.filename or "", fmt, size)
+    except Exception:
+        # ジョブを作れなければ run_import が消すこともないので、ここで消す
+        os.unlink(path)
+        raise
+    background_tasks.add_task(card_import.run_import, job.id, path)
+
+    return ImportJobOut.model_validate(job)
+
+
+@router.get("/cards/import/{job_id}", response_model=ImportJobOut)
+def get_import_job(
+    job_id: UUID,
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    """インポートジョブの進捗を取得（進捗は COPY のバッチごとに更新される）"""
+    job = card_import.get_job(db, job_id)
+    if not job or job.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Import job not found")
+
+    return ImportJobOut.model_validate(job)
 
 
 @router.put("/cards/{card_id}", response_model=CardOut)
@@ -141,6 +278,7 @@ def update_card(
     user: User = Depends(get_current_user)
 ):
     """カードを編集"""
+    bump_card_version(db, user.id)
     card = db.query(Card).filter(
         Card.id == card_id,
         Card.user_id == user.id
@@ -151,11 +289,14 @@ def update_card(
 
     if req.front is not None:
         card.front = req.front
+        for column, value in dedup.card_keys(req.front).items():
+            setattr(card, column, value)
     if req.back is not None:
         card.back = req.back
     if req.card_type is not None:
         card.card_type = req.card_type
 
+    realtime.publish(db, user.id, "card.updated", [card.id])
     db.commit()
     db.refresh(card)
 
@@ -169,6 +310,8 @@ def delete_card(
     user: User = Depends(get_current_user)
 ):
     """カードを削除"""
+    # 先に users の行をロックし、読んだ next_review を due_counts から引くまでに復習で変わらないようにする
+    bump_card_version(db, user.id)
     card = db.query(Card).filter(
         Card.id == card_id,
         Card.user_id == user.id
@@ -178,6 +321,9 @@ def delete_card(
         raise HTTPException(status_code=404, detail="Card not found")
 
     db.delete(card)
+    db.add(CardTombstone(user_id=user.id, card_id=card_id))  # 同期中の端末にも削除を伝える
+    realtime.publish(db, user.id, "card.deleted", [card_id])
+    due_counts.adjust(db, user.id, {card.next_review: -1})
     db.commit()
 
     return {"status": "deleted"}
@@ -1,21 +1,33 @@
-from datetime import date
+from datetime import date, datetime, timedelta
+from typing import Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from pydantic import BaseModel, Field
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from app import realtime, replicas
 from app.database import get_db
-from app.deps import get_current_user
+from app.deps import get_current_user, get_read_db
 from app.models import User, Card, ReviewLog
+from app.responses import FastJSONResponse, ndjson_response, rows_as_dicts
 from app.schemas import CardOut
+from app.services.card_store import CARD_OUT_COLUMNS
+from app.services import due_counts, rescheduler, review_log_buffer, review_session, review_sync
+from app.services.card_version import (
+    bump_card_version, cache_headers, card_etag, etag_matches, not_modified
+)
 from app.services.sm2 import calculate_sm2
 
 router = APIRouter()
 
+MAX_PAGE_SIZE = 500
+
 
 class ReviewRequest(BaseModel):
     rating: int  # 0=Again, 1=Hard, 2=Good, 3=Easy
+    session_id: Optional[UUID] = None  # 指定すると Again のカードをセッションに再出題する
 
 
 class ReviewResponse(BaseModel):
@@ -31,34 +43,280 @@ class DueCardsResponse(BaseModel):
     count: int
 
 
+class ForecastDay(BaseModel):
+    date: date
+    count: int
+
+
+class ForecastResponse(BaseModel):
+    due_today: int  # 期限切れを含む
+    forecast: list[ForecastDay]
+
+
+class DueCountResponse(BaseModel):
+    count: int
+
+
+class RescheduleRequest(BaseModel):
+    window_days: int = Field(14, ge=1, le=90)  # 今日から何日に振り分けるか
+    daily_cap: Optional[int] = Field(None, ge=1)  # 省略時は均等になる最小値
+    dry_run: bool = True
+
+
+class RescheduleResponse(BaseModel):
+    dry_run: bool
+    daily_cap: int
+    moved: int
+    before: list[ForecastDay]
+    after: list[ForecastDay]
+
+
+class SyncOpIn(BaseModel):
+    op_id: UUID  # 端末が生成する冪等キー（再送しても1回だけ適用）
+    card_id: UUID
+    rating: int = Field(ge=0, le=3)
+    reviewed_at: datetime  # 端末で復習した時刻（タイムゾーンなしは UTC とみなす）
+
+
+class SyncRequest(BaseModel):
+    ops: list[SyncOpIn] = Field(default_factory=list, max_length=review_sync.MAX_SYNC_OPS)
+    since: Optional[str] = None  # 前回の sync_token。省略時は全カードを返す
+
+
+class SyncCard(CardOut):
+    repetitions: int
+    ease_factor: float
+    interval: int
+
+
+class SyncResponse(BaseModel):
+    applied: list[UUID]
+    duplicate: list[UUID]
+    rejected: list[UUID]
+    cards: list[SyncCard]  # since 以降にサーバー側で変わったカード（適用した復習の結果を含む）
+    deleted: list[UUID]
+    full: bool  # true なら cards が全件なので端末側のカードを置き換える
+    sync_token: str
+
+
+class ReviewSessionRequest(BaseModel):
+    # 1日あたりの上限（今日すでに学習した枚数を差し引いて出題する）
+    new_limit: int = Field(20, ge=0, le=review_session.MAX_SESSION_CARDS)
+    review_limit: int = Field(200, ge=0, le=review_session.MAX_SESSION_CARDS)
+
+
+class ReviewSessionOut(BaseModel):
+    id: UUID
+    total: int
+    learning: int
+    review: int
+    new: int
+
+
+class ReviewSessionNext(BaseModel):
+    cards: list[CardOut]
+    remaining: int
+
+
 @router.get("/cards", response_model=list[CardOut])
 def list_cards(
-    db: Session = Depends(get_db),
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="指定するとページ単位で返す"),
+    before: Optional[UUID] = Query(None, description="前のページの最後のカード ID"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db),
     user: User = Depends(get_current_user)
 ):
-    """全カード一覧を取得"""
-    cards = db.query(Card).filter(Card.user_id == user.id).order_by(Card.created_at.desc()).all()
-    return [CardOut.model_validate(c) for c in cards]
+    """
+    全カード一覧を取得（新しい順）
+    limit を指定すると id のキーセットでページングし、続きがあれば Link: rel="next" を返す
+    """
+    etag = card_etag(user, f"cards-{limit}-{before}" if limit else "cards", db)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    if limit is None:
+        result = db.execute(
+            select(*CARD_OUT_COLUMNS)
+            .where(Card.user_id == user.id)
+            .order_by(Card.created_at.desc())
+        )
+        return FastJSONResponse(rows_as_dicts(result), headers=cache_headers(etag))
+
+    # id は UUIDv7 なので id の降順 ≒ 作成の新しい順（v4 時代のカードも重複・漏れなく一巡する）
+    stmt = select(*CARD_OUT_COLUMNS).where(Card.user_id == user.id)
+    if before is not None:
+        stmt = stmt.where(Card.id < before)
+    cards = rows_as_dicts(db.execute(stmt.order_by(Card.id.desc()).limit(limit + 1)))
+
+    headers = cache_headers(etag)
+    if len(cards) > limit:
+        cards = cards[:limit]
+        next_url = request.url.include_query_params(before=str(cards[-1]["id"]), limit=limit)
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    return FastJSONResponse(cards, headers=headers)
 
 
 @router.get("/review/due", response_model=DueCardsResponse)
 def get_due_cards(
-    db: Session = Depends(get_db),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db),
     user: User = Depends(get_current_user)
 ):
     """今日復習すべきカードを取得"""
     today = date.today()
-    cards = db.query(Card).filter(
-        Card.user_id == user.id,
-        Card.next_review <= today
-    ).order_by(Card.next_review).all()
-
-    return DueCardsResponse(
-        cards=[CardOut.model_validate(c) for c in cards],
-        count=len(cards)
+    # 日付が変わると対象カードも変わるので ETag に含める
+    etag = card_etag(user, f"due-{today.isoformat()}", db)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    result = db.execute(
+        select(*CARD_OUT_COLUMNS)
+        .where(Card.user_id == user.id, Card.next_review <= today)
+        .order_by(Card.next_review)
+    )
+    cards = rows_as_dicts(result)
+
+    return FastJSONResponse({"cards": cards, "count": len(cards)}, headers=cache_headers(etag))
+
+
+@router.get("/review/due/count", response_model=DueCountResponse)
+def get_due_count(
+    db: Session = Depends(get_read_db),
+    user: User = Depends(get_current_user)
+):
+    """今日復習すべきカードの枚数（due_counts から取得し cards は読まない）"""
+    return DueCountResponse(count=due_counts.due_today(db, user.id, date.today()))
+
+
+@router.get("/review/forecast", response_model=ForecastResponse)
+def get_forecast(
+    days: int = Query(30, ge=1, le=365),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db),
+    user: User = Depends(get_current_user)
+):
+    """今日から days 日分の復習予定枚数"""
+    today = date.today()
+    etag = card_etag(user, f"forecast-{today.isoformat()}-{days}", db)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    forecast = due_counts.forecast(db, user.id, today, days)
+    return FastJSONResponse(
+        {"due_today": forecast[0]["count"], "forecast": forecast},
+        headers=cache_headers(etag)
     )
 
 
+@router.get("/review/logs/export.ndjson")
+def export_review_logs(
+    since: Optional[datetime] = Query(None, description="この日時以降の復習ログのみ"),
+    user: User = Depends(get_current_user)
+):
+    """復習履歴を NDJSON でストリーミング出力（バックアップ・分析用）"""
+    stmt = (
+        select(ReviewLog.id, ReviewLog.card_id, ReviewLog.rating, ReviewLog.reviewed_at)
+        .where(ReviewLog.user_id == user.id)
+    )
+    # reviewed_at で絞ると該当する月のパーティションだけを読む
+    if since is not None:
+        stmt = stmt.where(ReviewLog.reviewed_at >= since)
+    stmt = stmt.order_by(ReviewLog.reviewed_at, ReviewLog.id)
+
+    return ndjson_response(stmt, "review_logs.ndjson", session_factory=replicas.read_session_factory(user.id))
+
+
+@router.post("/review/session", response_model=ReviewSessionOut)
+def create_review_session(
+    req: ReviewSessionRequest,
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    """学習中・復習・新規カードを混ぜた出題順を作ってセッションを開始"""
+    session = review_session.create_session(db, user.id, req.new_limit, req.review_limit)
+    db.commit()
+    return session
+
+
+@router.get("/review/session/{session_id}/next", response_model=ReviewSessionNext)
+def next_review_cards(
+    session_id: UUID,
+    n: int = Query(10, ge=1, le=100, description="取得する枚数"),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    """セッションの次の n 枚を取得（取得した分だけキューが進む）"""
+    result = review_session.next_cards(db, user.id, session_id, n)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    db.commit()
+
+    cards, remaining = result
+    return FastJSONResponse({"cards": cards, "remaining": remaining})
+
+
+@router.post("/review/reschedule", response_model=RescheduleResponse)
+def reschedule_reviews(
+    req: RescheduleRequest,
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    """期限切れ・集中日のカードを window_days 日に振り分け直す（dry_run なら結果の予測のみ）"""
+    today = date.today()
+    cards = rescheduler.load_cards(db, user.id, today, req.window_days)
+    plan = rescheduler.plan(cards, today, req.window_days, req.daily_cap)
+
+    moved = len(plan.moves)
+    if not req.dry_run:
+        moved = rescheduler.apply(db, user.id, plan)
+        db.commit()
+
+    def daily(counts: list[int]) -> list[dict]:
+        return [{"date": today + timedelta(days=i), "count": c} for i, c in enumerate(counts)]
+
+    return RescheduleResponse(
+        dry_run=req.dry_run,
+        daily_cap=plan.daily_cap,
+        moved=moved,
+        before=daily(plan.before),
+        after=daily(plan.after)
+    )
+
+
+@router.post("/review/sync", response_model=SyncResponse)
+def sync_reviews(
+    req: SyncRequest,
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    """オフライン中の復習をまとめて適用し、前回の同期以降のカードの変更を返す"""
+    try:
+        since = review_sync.decode_token(req.since) if req.since else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+    now = datetime.utcnow()
+    ops = [
+        review_sync.SyncOp(op.op_id, op.card_id, op.rating, review_sync.to_utc(op.reviewed_at, now))
+        for op in req.ops
+    ]
+    result = review_sync.apply_ops(db, user.id, ops, now)
+    review_sync.purge(db, user.id, now)
+    db.commit()
+
+    cards, deleted, full = review_sync.changes(db, user.id, since, now)
+    return FastJSONResponse({
+        "applied": result.applied,
+        "duplicate": result.duplicate,
+        "rejected": result.rejected,
+        "cards": cards,
+        "deleted": deleted,
+        "full": full,
+        "sync_token": review_sync.encode_token(now),
+    })
+
+
 @router.post("/review/{card_id}", response_model=ReviewResponse)
 def submit_review(
     card_id: UUID,
@@ -70,14 +328,18 @@ def submit_review(
     if req.rating < 0 or req.rating > 3:
         raise HTTPException(status_code=400, detail="Rating must be 0-3")
 
+    # 先に users の行をロックし、SM-2 の読み込みから更新までの間にカードを他で書き換えさせない
+    bump_card_version(db, user.id)
     card = db.query(Card).filter(
         Card.id == card_id,
         Card.user_id == user.id
-    ).first()
+    ).with_for_update().first()
 
     if not card:
         raise HTTPException(status_code=404, detail="Card not found")
 
+    reviewed_at = datetime.utcnow()
+
     # SM-2計算
     result = calculate_sm2(
         rating=req.rating,
@@ -86,16 +348,28 @@ def submit_review(
         interval=card.interval
     )
 
+    # 1日の上限のために、更新前の状態で新規・復習を数える
+    kind = review_session.study_kind(card.interval, card.repetitions)
+    review_session.record_studied(db, user.id, review_session.count_kinds([(date.today(), kind)]))
+
     # カード更新
+    due_counts.adjust(db, user.id, due_counts.moved(card.next_review, result.next_review))
     card.repetitions = result.repetitions
     card.ease_factor = result.ease_factor
     card.interval = result.interval
     card.next_review = result.next_review
+    card.last_reviewed_at = reviewed_at
 
-    # 復習ログ記録
-    log = ReviewLog(card_id=card.id, rating=req.rating)
-    db.add(log)
+    # 復習ログ記録（バッファ有効時はカード更新のコミット後にまとめて書く）
+    buffer = review_log_buffer.get_buffer()
+    if buffer is None:
+        db.add(ReviewLog(user_id=user.id, card_id=card.id, rating=req.rating, reviewed_at=reviewed_at))
+    realtime.publish(db, user.id, "card.reviewed", [card.id])
+    if req.session_id and req.rating == 0:
+        review_session.requeue(db, user.id, req.session_id, card.id)
     db.commit()
+    if buffer is not None:
+        buffer.append(user.id, card.id, req.rating, reviewed_at)
 
     return ReviewResponse(
         card_id=card.id,
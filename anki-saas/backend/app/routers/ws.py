@@ -0,0 +1,83 @@
+import asyncio
+from typing import Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+
+from app import realtime
+from app.config import settings
+from app.database import SessionLocal
+from app.deps import hash_api_key
+from app.metrics import WEBSOCKET_CONNECTIONS
+from app.models import ApiKey
+from app.services import access_tokens
+
+router = APIRouter()
+
+HELLO = '{"events":[{"type":"hello"}]}'
+
+
+def authenticate(query_token: Optional[str], header_key: Optional[str]) -> Optional[UUID]:
+    """
+    接続中ずっと DB コネクションを握らないよう、ユーザー ID だけ引いてすぐ返す
+    URL はアクセスログやプロキシに残るので、クエリ文字列では短命のアクセストークンだけを受け付ける
+    （API キーは X-API-Key ヘッダーでのみ）
+    """
+    if query_token:
+        token = access_tokens.verify(query_token)
+        return token.user_id if token is not None else None
+    if not header_key:
+        return None
+    # アクセストークンなら DB を引かずに済む
+    token = access_tokens.verify(header_key)
+    if token is not None:
+        return token.user_id
+    api_key = header_key
+    with SessionLocal() as db:
+        return db.query(ApiKey.user_id).filter(ApiKey.key_hash == hash_api_key(api_key)).scalar()
+
+
+async def _wait_disconnect(websocket: WebSocket) -> None:
+    # クライアントからのメッセージは使わない（切断の検知だけ）
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+
+@router.websocket("/ws")
+async def card_events(websocket: WebSocket, token: Optional[str] = Query(None)):
+    """
+    カード・復習予定の変更をプッシュで受け取る
+
+    ブラウザの WebSocket はヘッダーを付けられないので、POST /auth/token で得たアクセストークンを ?token= で渡す。
+    接続直後に hello を送り、以降は app.realtime のイベントを届ける。
+    """
+    if not settings.realtime_enabled:
+        await websocket.close(code=1013)
+        return
+    user_id = await run_in_threadpool(authenticate, token, websocket.headers.get("x-api-key"))
+    if user_id is None:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    queue = realtime.hub.subscribe(user_id)
+    WEBSOCKET_CONNECTIONS.inc()
+    disconnected = asyncio.ensure_future(_wait_disconnect(websocket))
+    try:
+        await websocket.send_text(HELLO)
+        while True:
+            message = asyncio.ensure_future(queue.get())
+            await asyncio.wait({message, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                message.cancel()
+                break
+            await websocket.send_text(message.result())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        disconnected.cancel()
+        realtime.hub.unsubscribe(user_id, queue)
+        WEBSOCKET_CONNECTIONS.dec()
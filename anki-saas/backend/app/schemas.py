@@ -2,7 +2,7 @@ from datetime import datetime, date
 from typing import Optional
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 # Chat
@@ -27,14 +27,23 @@ class CardCandidate(BaseModel):
     back: str
 
 
+class DuplicateCard(BaseModel):
+    front: str
+    existing_id: Optional[UUID] = None  # 同じリクエスト内の重複なら None
+    existing_front: str
+    similarity: float
+
+
 class GenerateResponse(BaseModel):
     candidates: list[CardCandidate]
+    duplicates: list[DuplicateCard] = []
 
 
 # Card Approval
 class ApproveRequest(BaseModel):
     conversation_id: UUID
     cards: list[CardCandidate]
+    allow_duplicates: bool = False
 
 
 class CardOut(BaseModel):
@@ -49,8 +58,30 @@ class CardOut(BaseModel):
         from_attributes = True
 
 
+class CardSearchHit(CardOut):
+    score: float
+
+
+class CardSearchResponse(BaseModel):
+    results: list[CardSearchHit]
+    limit: int
+    offset: int
+    has_more: bool
+
+
 class ApproveResponse(BaseModel):
     created: list[CardOut]
+    duplicates: list[DuplicateCard] = []
+
+
+# Bulk Card Creation
+MAX_BULK_CARDS = 1000
+
+
+class BulkCardRequest(BaseModel):
+    conversation_id: Optional[UUID] = None
+    cards: list[CardCandidate] = Field(..., max_length=MAX_BULK_CARDS)
+    allow_duplicates: bool = False
 
 
 # Health
@@ -63,6 +94,7 @@ class HealthResponse(BaseModel):
 class LookupRequest(BaseModel):
     word: str
     context: Optional[str] = None  # 元の文（文脈）
+    contextual: bool = False  # true なら辞書を使わず、文脈に合った意味を Claude に聞く
 
 
 class LookupResponse(BaseModel):
@@ -70,6 +102,7 @@ class LookupResponse(BaseModel):
     meaning: str
     example: Optional[str] = None
     pronunciation: Optional[str] = None
+    source: str = "claude"  # "dictionary" | "claude"
 
 
 # Quick Card Creation (単語から直接カード作成)
@@ -78,9 +111,33 @@ class QuickCardRequest(BaseModel):
     meaning: str
     context: Optional[str] = None
     card_type: str = "vocab"  # vocab, cloze
+    allow_duplicates: bool = False
+
+
+class QuickBatchRequest(BaseModel):
+    cards: list[QuickCardRequest] = Field(..., max_length=MAX_BULK_CARDS)
+    allow_duplicates: bool = False
 
 
 class CardUpdate(BaseModel):
     front: Optional[str] = None
     back: Optional[str] = None
     card_type: Optional[str] = None
+
+
+# Bulk Import
+class ImportJobOut(BaseModel):
+    id: UUID
+    filename: str
+    format: str
+    status: str  # queued, running, completed, failed
+    progress: float
+    rows_parsed: int
+    imported: int
+    skipped: int
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
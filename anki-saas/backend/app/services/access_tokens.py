@@ -0,0 +1,223 @@
+"""
+API キーと交換する短命のアクセストークン（HMAC-SHA256 署名）
+
+POST /auth/token で API キーをトークンに換えると、以降のリクエストは
+Authorization: Bearer <token> だけで認証でき、api_keys を引きに DB へ行かない。
+検証は署名と有効期限の確認だけなので数マイクロ秒で終わる。
+
+トークン: "<kid>.<payload>.<署名>"（payload と署名は base64url、パディングなし）
+  payload 36 バイト: user_id (16) / token_id = UUIDv7 (16) / 有効期限の Unix 秒 (uint32)
+  発行時刻は token_id の UUIDv7 から取る。
+
+鍵のローテーション: TOKEN_SIGNING_KEYS="new:secret2,old:secret1" のように先頭に新しい鍵を足す。
+署名は先頭の鍵だけで行い、残りは検証にだけ使う。古い鍵は TOKEN_TTL_S 経てば外してよい。
+
+失効: revoked_tokens のうち期限内の行（トークン単位、またはユーザーの発行済み全件）を
+各ワーカーがメモリに持ち、TOKEN_REVOCATION_REFRESH_S ごとに読み直す。
+失効させたワーカーでは即時、他のワーカーでも最大でその秒数後に効く。
+"""
+import base64
+import functools
+import hmac
+import logging
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.ids import uuid7, uuid7_timestamp_ms
+from app.models import RevokedToken
+
+
+logger = logging.getLogger("app.access_tokens")
+
+PAYLOAD = struct.Struct("<16s16sI")
+
+
+@dataclass(frozen=True)
+class AccessToken:
+    user_id: UUID
+    token_id: UUID
+    expires_at: int  # Unix 秒
+
+    @property
+    def issued_at_ms(self) -> int:
+        return uuid7_timestamp_ms(self.token_id)
+
+
+@functools.lru_cache(maxsize=4)
+def parse_keys(spec: str) -> tuple[tuple[str, bytes], ...]:
+    """ "kid:secret,kid:secret" → ((kid, secret), ...)。先頭が署名用"""
+    keys = []
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        kid, sep, secret = item.strip().partition(":")
+        if not sep or not kid or not secret or "." in kid:
+            raise ValueError("TOKEN_SIGNING_KEYS must look like 'kid:secret,kid:secret' (kid without '.')")
+        keys.append((kid, secret.encode()))
+    return tuple(keys)
+
+
+def enabled() -> bool:
+    return bool(parse_keys(settings.token_signing_keys))
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(secret: bytes, message: str) -> bytes:
+    return hmac.digest(secret, message.encode(), "sha256")
+
+
+def issue(user_id: UUID, now: Optional[float] = None) -> tuple[str, AccessToken]:
+    keys = parse_keys(settings.token_signing_keys)
+    if not keys:
+        raise RuntimeError("TOKEN_SIGNING_KEYS is not configured")
+    kid, secret = keys[0]
+    token = AccessToken(user_id, uuid7(), int(now if now is not None else time.time()) + settings.token_ttl_s)
+    message = f"{kid}.{_b64encode(PAYLOAD.pack(user_id.bytes, token.token_id.bytes, token.expires_at))}"
+    return f"{message}.{_b64encode(_sign(secret, message))}", token
+
+
+def verify(value: str, now: Optional[float] = None) -> Optional[AccessToken]:
+    """署名・有効期限・失効を確認する（I/O なし）。無効なら None"""
+    message, _, signature = value.rpartition(".")
+    kid, _, payload = message.partition(".")
+    secret = dict(parse_keys(settings.token_signing_keys)).get(kid)
+    if secret is None or not payload:
+        return None
+    try:
+        if not hmac.compare_digest(_b64decode(signature), _sign(secret, message)):
+            return None
+        user_id, token_id, expires_at = PAYLOAD.unpack(_b64decode(payload))
+    except (ValueError, struct.error):
+        return None
+    if expires_at <= (now if now is not None else time.time()):
+        return None
+    token = AccessToken(UUID(bytes=user_id), UUID(bytes=token_id), expires_at)
+    if revocations.is_revoked(token):
+        return None
+    return token
+
+
+class RevocationList:
+    """期限内の失効エントリ（数が少ないのでワーカーごとに全件持つ）"""
+
+    def __init__(self):
+        self._token_ids: frozenset[UUID] = frozenset()
+        self._cutoffs: dict[UUID, int] = {}  # user_id → この Unix ミリ秒以前に発行したものは無効
+
+    def is_revoked(self, token: AccessToken) -> bool:
+        if token.token_id in self._token_ids:
+            return True
+        cutoff = self._cutoffs.get(token.user_id)
+        return cutoff is not None and token.issued_at_ms <= cutoff
+
+    def replace(self, rows) -> None:
+        """rows: (user_id, token_id, revoked_at)。参照の差し替えだけなので検証側はロック不要"""
+        token_ids = set()
+        cutoffs: dict[UUID, int] = {}
+        for user_id, token_id, revoked_at in rows:
+            if token_id is not None:
+                token_ids.add(token_id)
+            else:
+                ms = _to_ms(revoked_at)
+                cutoffs[user_id] = max(ms, cutoffs.get(user_id, ms))
+        self._token_ids, self._cutoffs = frozenset(token_ids), cutoffs
+
+    def add(self, user_id: UUID, token_id: Optional[UUID], revoked_at: datetime) -> None:
+        if token_id is not None:
+            self._token_ids = self._token_ids | {token_id}
+        else:
+            ms = _to_ms(revoked_at)
+            self._cutoffs = {**self._cutoffs, user_id: max(ms, self._cutoffs.get(user_id, ms))}
+
+    def __len__(self) -> int:
+        return len(self._token_ids) + len(self._cutoffs)
+
+
+def _to_ms(value: datetime) -> int:
+    # revoked_tokens の時刻は naive UTC
+    return int((value - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+
+revocations = RevocationList()
+
+
+def load_revocations(db: Session, now: datetime) -> None:
+    rows = db.execute(
+        select(RevokedToken.user_id, RevokedToken.token_id, RevokedToken.revoked_at)
+        .where(RevokedToken.expires_at > now)
+    ).all()
+    revocations.replace(rows)
+
+
+def revoke(db: Session, user_id: UUID, token: Optional[AccessToken], now: datetime) -> None:
+    """token を失効させる。None ならユーザーが now までに発行した全トークン"""
+    if token is not None:
+        expires_at = datetime.utcfromtimestamp(token.expires_at)
+    else:
+        # now 以前に発行されたトークンはどれも TTL 以内に切れる
+        expires_at = now + timedelta(seconds=settings.token_ttl_s)
+    token_id = token.token_id if token is not None else None
+    db.add(RevokedToken(user_id=user_id, token_id=token_id, revoked_at=now, expires_at=expires_at))
+    # 期限切れのエントリはもう意味がないので、ついでに消して表を小さく保つ
+    db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+    db.commit()
+    revocations.add(user_id, token_id, now)
+
+
+class RevocationRefresher(threading.Thread):
+    """revoked_tokens を定期的に読み直す"""
+
+    def __init__(self, interval: float):
+        super().__init__(name="token-revocations", daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while True:
+            try:
+                with SessionLocal() as db:
+                    load_revocations(db, datetime.utcnow())
+            except Exception:
+                # 読めない間は前回の一覧で検証を続ける
+                logger.warning("Failed to refresh revoked tokens", exc_info=True)
+            if self._stop_event.wait(self.interval):
+                return
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+_refresher: Optional[RevocationRefresher] = None
+
+
+def start() -> None:
+    global _refresher
+    if not enabled() or _refresher is not None:
+        return
+    _refresher = RevocationRefresher(settings.token_revocation_refresh_s)
+    _refresher.start()
+
+
+def stop() -> None:
+    global _refresher
+    if _refresher is not None:
+        _refresher.stop()
+        _refresher = None
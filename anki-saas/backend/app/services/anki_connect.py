@@ -5,8 +5,11 @@ AnkiConnect runs on localhost:8765 when Anki is open
 import httpx
 from typing import Optional
 
+from app.config import settings
+from app.metrics import track_external
 
-ANKI_CONNECT_URL = "http://localhost:8765"
+
+ANKI_CONNECT_URL = settings.anki_connect_url
 
 
 async def invoke(action: str, **params) -> dict:
@@ -19,9 +22,10 @@ async def invoke(action: str, **params) -> dict:
         "params": params
     }
 
-    async with httpx.AsyncClient(timeout=5.0) as client:
-        response = await client.post(ANKI_CONNECT_URL, json=request_body)
-        result = response.json()
+    with track_external("anki_connect"):
+        async with httpx.AsyncClient(timeout=5.0) as client:
+            response = await client.post(ANKI_CONNECT_URL, json=request_body)
+            result = response.json()
 
         if result.get("error"):
             raise Exception(result["error"])
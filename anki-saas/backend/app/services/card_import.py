@@ -0,0 +1,273 @@
+"""
+CSV / TSV / .apkg からのカード一括インポート
+
+アップロードはディスクに退避してからバックグラウンドで処理する。
+行はストリームで読み込み、一定件数ごとに COPY でステージングテーブルへ流し込み、
+最後に既存カードとの重複を除外して cards へマージする。
+"""
+import csv
+import io
+import os
+import re
+import sqlite3
+import tempfile
+import zipfile
+from datetime import date, datetime, timedelta
+from typing import Iterator, Optional
+from uuid import UUID
+
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from app import realtime
+from app.database import SessionLocal
+from app.ids import uuid7
+from app.models import ImportJob
+from app.services import dedup, due_counts
+from app.services.card_version import bump_card_version
+
+
+BATCH_SIZE = 5000
+JOB_RETENTION_DAYS = 30  # これより古いジョブの記録は次のインポート時に消す
+SUPPORTED_FORMATS = ("csv", "tsv", "apkg")
+CARD_TYPES = ("vocab", "cloze", "rewrite")
+
+_HTML_TAG = re.compile(r"<[^>]+>")
+_ANKI_FIELD_SEP = "\x1f"
+
+
+def create_job(db: Session, user_id: UUID, filename: str, fmt: str, bytes_total: int) -> ImportJob:
+    """ジョブを記録してコミットする（run_import は別のワーカーのスレッドで動いてもよい）"""
+    db.execute(delete(ImportJob).where(
+        ImportJob.user_id == user_id,
+        ImportJob.created_at < datetime.utcnow() - timedelta(days=JOB_RETENTION_DAYS),
+    ))
+    job = ImportJob(
+        user_id=user_id,
+        filename=filename[:255],
+        format=fmt,
+        status="queued",
+        bytes_total=bytes_total,
+        bytes_read=0,
+        rows_parsed=0,
+        imported=0,
+        skipped=0,
+        created_at=datetime.utcnow(),
+    )
+    db.add(job)
+    db.commit()
+    return job
+
+
+def get_job(db: Session, job_id: UUID) -> Optional[ImportJob]:
+    return db.get(ImportJob, job_id)
+
+
+def detect_format(filename: str, declared: Optional[str] = None) -> Optional[str]:
+    """ファイル名（または明示指定）から形式を判定"""
+    if declared:
+        declared = declared.lower()
+        return declared if declared in SUPPORTED_FORMATS else None
+    ext = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    if ext == "txt":
+        ext = "tsv"
+    return ext if ext in SUPPORTED_FORMATS else None
+
+
+class _CountingReader(io.RawIOBase):
+    """読み込んだバイト数をジョブに反映するラッパー"""
+
+    def __init__(self, raw, job: ImportJob):
+        self._raw = raw
+        self._job = job
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = self._raw.readinto(b)
+        if n:
+            self._job.bytes_read += n
+        return n
+
+
+def _clean(value: str) -> str:
+    return value.strip()
+
+
+def _normalize_card_type(value: Optional[str]) -> str:
+    value = (value or "").strip().lower()
+    return value if value in CARD_TYPES else "vocab"
+
+
+def iter_delimited_rows(text_stream, delimiter: str) -> Iterator[tuple[str, str, str]]:
+    """
+    CSV/TSV を1行ずつ (card_type, front, back) に変換
+    列: front, back[, card_type]。先頭行が front/back のヘッダなら読み飛ばす
+    """
+    reader = csv.reader(text_stream, delimiter=delimiter)
+    first = True
+    for row in reader:
+        if not row or row[0].startswith("#"):
+            # Anki のテキスト書き出しはコメント行（#separator:tab など）を含む
+            continue
+        if len(row) < 2:
+            continue
+        if first:
+            first = False
+            if row[0].strip().lower() == "front" and row[1].strip().lower() == "back":
+                continue
+        front, back = _clean(row[0]), _clean(row[1])
+        if not front or not back:
+            continue
+        card_type = _normalize_card_type(row[2] if len(row) > 2 else None)
+        yield card_type, front, back
+
+
+def _strip_html(value: str) -> str:
+    return _HTML_TAG.sub("", value.replace("<br>", "\n").replace("&nbsp;", " ")).strip()
+
+
+def iter_apkg_rows(path: str, job: Optional[ImportJob] = None) -> Iterator[tuple[str, str, str]]:
+    """
+    .apkg（zip 内の SQLite コレクション）からノートを読み出す
+    各ノートの先頭2フィールドを front/back とする
+    """
+    with zipfile.ZipFile(path) as archive:
+        names = archive.namelist()
+        collection = next((n for n in ("collection.anki21", "collection.anki2") if n in names), None)
+        if collection is None:
+            raise ValueError("Unsupported .apkg: collection database not found")
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = archive.extract(collection, tmpdir)
+            conn = sqlite3.connect(db_path)
+            try:
+                total = conn.execute("SELECT count(*) FROM notes").fetchone()[0]
+                cursor = conn.execute("SELECT flds FROM notes ORDER BY id")
+                for i, (flds,) in enumerate(cursor, start=1):
+                    if job is not None and total:
+                        job.bytes_read = job.bytes_total * i // total
+                    fields = flds.split(_ANKI_FIELD_SEP)
+                    if len(fields) < 2:
+                        continue
+                    front, back = _strip_html(fields[0]), _strip_html(fields[1])
+                    if front and back:
+                        yield "vocab", front, back
+            finally:
+                conn.close()
+
+
+def iter_rows(path: str, fmt: str, job: Optional[ImportJob] = None) -> Iterator[tuple[str, str, str]]:
+    if fmt == "apkg":
+        yield from iter_apkg_rows(path, job)
+        return
+
+    delimiter = "\t" if fmt == "tsv" else ","
+    with open(path, "rb", buffering=0) as raw:
+        source = _CountingReader(raw, job) if job is not None else raw
+        text_stream = io.TextIOWrapper(io.BufferedReader(source), encoding="utf-8-sig", newline="")
+        yield from iter_delimited_rows(text_stream, delimiter)
+
+
+STAGING_DDL = """
+CREATE TEMP TABLE card_import_staging (
+    seq bigint NOT NULL,
+    id uuid NOT NULL,
+    card_type varchar(20) NOT NULL,
+    front text NOT NULL,
+    back text NOT NULL,
+    front_fingerprint varchar(16) NOT NULL,
+    front_bands bigint[] NOT NULL
+) ON COMMIT DROP
+"""
+
+MERGE_SQL = """
+INSERT INTO cards (
+    id, user_id, card_type, front, back, front_fingerprint, front_bands, next_review, created_at, updated_at
+)
+SELECT DISTINCT ON (s.front, s.back)
+    s.id, %(user_id)s::uuid, s.card_type, s.front, s.back, s.front_fingerprint, s.front_bands, %(today)s,
+    timezone('utc', clock_timestamp()), timezone('utc', clock_timestamp())
+FROM card_import_staging s
+WHERE NOT EXISTS (
+    SELECT 1 FROM cards c
+    WHERE c.user_id = %(user_id)s::uuid AND c.front = s.front AND c.back = s.back
+)
+ORDER BY s.front, s.back, s.seq
+"""
+
+
+def _copy_batch(cursor, batch: list[tuple]) -> None:
+    buf = io.StringIO()
+    csv.writer(buf).writerows(batch)
+    buf.seek(0)
+    cursor.copy_expert(
+        "COPY card_import_staging (seq, id, card_type, front, back, front_fingerprint, front_bands)"
+        " FROM STDIN WITH (FORMAT csv)",
+        buf
+    )
+
+
+def run_import(job_id: UUID, path: str) -> None:
+    """
+    バックグラウンドで実行されるインポート本体
+    1トランザクションで staging への COPY → cards へのマージを行う
+    進捗は別のセッションで COPY のバッチごとに import_jobs へコミットする
+    """
+    jobs_db = SessionLocal(expire_on_commit=False)
+    job = get_job(jobs_db, job_id)
+    if job is None:
+        jobs_db.close()
+        return
+
+    job.status = "running"
+    jobs_db.commit()
+    db = SessionLocal()
+    db.info["user_id"] = job.user_id  # コミット後しばらくこのユーザーの読み込みをプライマリに寄せる
+    try:
+        # psycopg2 の COPY を使うため生のDBAPIコネクションを取り出す
+        cursor = db.connection().connection.cursor()
+        cursor.execute(STAGING_DDL)
+
+        batch: list[tuple] = []
+        for card_type, front, back in iter_rows(path, job.format, job):
+            job.rows_parsed += 1
+            keys = dedup.card_keys(front)
+            bands = "{" + ",".join(map(str, keys["front_bands"])) + "}"
+            batch.append((job.rows_parsed, uuid7(), card_type, front, back, keys["front_fingerprint"], bands))
+            if len(batch) >= BATCH_SIZE:
+                _copy_batch(cursor, batch)
+                batch.clear()
+                jobs_db.commit()
+        if batch:
+            _copy_batch(cursor, batch)
+        jobs_db.commit()
+
+        today = date.today()
+        # users の行ロックは COPY の間は取らず、マージの直前に取る
+        bump_card_version(db, job.user_id)
+        cursor.execute(MERGE_SQL, {"user_id": str(job.user_id), "today": today})
+        job.imported = cursor.rowcount
+        job.skipped = job.rows_parsed - job.imported
+        if job.imported:
+            realtime.publish(db, job.user_id, "cards.changed", count=job.imported)
+            due_counts.adjust(db, job.user_id, {today: job.imported})
+        db.commit()
+        job.status = "completed"
+    except Exception as e:
+        db.rollback()
+        jobs_db.rollback()
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        db.close()
+        job.finished_at = datetime.utcnow()
+        try:
+            jobs_db.commit()
+        finally:
+            jobs_db.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
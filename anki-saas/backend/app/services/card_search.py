@@ -0,0 +1,83 @@
+"""
+カード検索
+
+front は英語の全文検索（tsvector）と pg_trgm によるあいまい一致、
+back は日本語をバイグラム化した tsvector（migration 002 の card_search_ja_tsvector）で検索する。
+どちらも生成列 + GIN インデックスなので、カードの追加・更新時に自動で追従する。
+"""
+import re
+from uuid import UUID
+
+from sqlalchemy import literal_column, or_, select, func
+from sqlalchemy.orm import Session
+
+from app.models import Card
+from app.schemas import CardSearchHit
+from app.services.card_store import CARD_OUT_COLUMNS
+
+
+# card_search_ja_tsvector と同じ文字範囲（かな・カナ・CJK統合漢字・互換漢字）
+_CJK_RUN = re.compile("[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff]+")
+_WORD = re.compile(r"\w+")
+
+
+def ja_query_lexemes(q: str) -> list[str]:
+    """
+    back 検索用の語彙リスト
+    日本語は2文字ずつ（1文字だけなら前方一致）、それ以外は小文字化した単語
+    """
+    lexemes = []
+    for run in _CJK_RUN.findall(q):
+        if len(run) == 1:
+            lexemes.append(f"{run}:*")
+        else:
+            lexemes.extend(run[i:i + 2] for i in range(len(run) - 1))
+
+    rest = _CJK_RUN.sub(" ", q)
+    lexemes.extend(w.lower() for w in _WORD.findall(rest))
+
+    # 重複を除きつつ順序を保つ
+    return list(dict.fromkeys(lexemes))
+
+
+def ja_tsquery(q: str) -> str:
+    """to_tsquery('simple', ...) に渡す AND 検索式"""
+    return " & ".join(
+        f"'{lex[:-2]}':*" if lex.endswith(":*") else f"'{lex}'"
+        for lex in ja_query_lexemes(q)
+    )
+
+
+def search_cards(
+    db: Session,
+    user_id: UUID,
+    q: str,
+    limit: int,
+    offset: int
+) -> tuple[list[CardSearchHit], bool]:
+    """スコア順にカードを検索。戻り値は (結果, 次ページがあるか)"""
+    front_query = func.websearch_to_tsquery(literal_column("'english'"), q)
+    conditions = [
+        Card.front_tsv.op("@@")(front_query),
+        Card.front.op("%")(q),
+    ]
+    score = func.ts_rank_cd(Card.front_tsv, front_query) * 2 + func.similarity(Card.front, q)
+
+    back_tsquery = ja_tsquery(q)
+    if back_tsquery:
+        back_query = func.to_tsquery(literal_column("'simple'"), back_tsquery)
+        conditions.append(Card.back_tsv.op("@@")(back_query))
+        score = score + func.ts_rank_cd(Card.back_tsv, back_query)
+
+    score = score.label("score")
+    stmt = (
+        select(*CARD_OUT_COLUMNS, score)
+        .where(Card.user_id == user_id, or_(*conditions))
+        .order_by(score.desc(), Card.id)
+        .limit(limit + 1)
+        .offset(offset)
+    )
+    rows = db.execute(stmt).all()
+
+    hits = [CardSearchHit.model_validate(row) for row in rows[:limit]]
+    return hits, len(rows) > limit
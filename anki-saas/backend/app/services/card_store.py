@@ -0,0 +1,109 @@
+"""
+カードの一括作成
+
+1件ずつ add/flush せず、複数行 INSERT ... RETURNING で作成して
+返ってきた行から CardOut を直接組み立てる
+"""
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app import realtime
+from app.models import Card
+from app.schemas import ApproveResponse, CardOut, DuplicateCard, QuickCardRequest
+from app.services import dedup, due_counts
+from app.services.card_version import bump_card_version
+
+
+CARD_OUT_COLUMNS = (
+    Card.id,
+    Card.card_type,
+    Card.front,
+    Card.back,
+    Card.next_review,
+    Card.created_at,
+)
+
+
+def quick_card_fields(req: QuickCardRequest) -> dict:
+    """QuickCardRequest から card_type/front/back を決定"""
+    if req.card_type == "cloze" and req.context:
+        # Cloze: 文脈で単語を___に置換
+        front = req.context.replace(req.word, "___")
+        back = req.word
+    else:
+        # Vocab: 単語 → 意味
+        front = req.word
+        back = req.meaning
+
+    return {"card_type": req.card_type, "front": front, "back": back}
+
+
+def insert_cards(
+    db: Session,
+    user_id: UUID,
+    cards: list[dict],
+    conversation_id: Optional[UUID] = None
+) -> list[CardOut]:
+    """
+    cards: [{"card_type": ..., "front": ..., "back": ...}]
+    コミットは呼び出し側で行う。戻り値は入力と同じ順序
+    """
+    if not cards:
+        return []
+
+    rows = [
+        {
+            "user_id": user_id,
+            "conversation_id": conversation_id,
+            "card_type": c["card_type"],
+            "front": c["front"],
+            "back": c["back"],
+            **dedup.card_keys(c["front"]),
+        }
+        for c in cards
+    ]
+
+    bump_card_version(db, user_id)
+    # executemany + RETURNING は insertmanyvalues により複数行 VALUES にまとめて送られる
+    stmt = insert(Card).returning(*CARD_OUT_COLUMNS, sort_by_parameter_order=True)
+    result = db.execute(stmt, rows)
+
+    created = [CardOut.model_validate(row) for row in result]
+    realtime.publish(db, user_id, "card.created", [c.id for c in created])
+    due_counts.adjust(db, user_id, due_counts.count_days(c.next_review for c in created))
+
+    return created
+
+
+def to_duplicate_out(front: str, match: dedup.DuplicateMatch) -> DuplicateCard:
+    return DuplicateCard(
+        front=front,
+        existing_id=match.card_id,
+        existing_front=match.front,
+        similarity=match.similarity
+    )
+
+
+def create_cards(
+    db: Session,
+    user_id: UUID,
+    cards: list[dict],
+    conversation_id: Optional[UUID] = None,
+    allow_duplicates: bool = False
+) -> ApproveResponse:
+    """
+    重複（既存カード・リクエスト内）を除いてから insert_cards する
+    除外したカードは duplicates として返す
+    """
+    duplicates = []
+    if not allow_duplicates:
+        index = dedup.candidate_index(db, user_id, (c["front"] for c in cards))
+        cards, matches = dedup.split_duplicates(index, cards, key=lambda c: c["front"])
+        duplicates = [to_duplicate_out(c["front"], m) for c, m in matches]
+
+    created = insert_cards(db, user_id, cards, conversation_id=conversation_id)
+
+    return ApproveResponse(created=created, duplicates=duplicates)
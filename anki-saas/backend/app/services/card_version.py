@@ -0,0 +1,62 @@
+"""
+ユーザーごとのカードのバージョン番号と ETag
+
+カードを変更する処理（作成・編集・削除・復習・インポート）は同じトランザクション内で
+bump_card_version を呼ぶ。一覧系の GET はこの番号から弱い ETag を作り、
+If-None-Match が一致すればカードを読み込まずに 304 を返す。
+
+bump_card_version は users の行をロックするので、トランザクションで最初に呼ぶ。
+同じユーザーの書き込みはここで直列化され、その後の cards・due_counts のロックの順序が
+処理ごとに違ってもデッドロックしない。
+"""
+from typing import Optional
+from uuid import UUID
+
+from fastapi.responses import Response
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.models import User
+
+
+def bump_card_version(db: Session, user_id: UUID) -> None:
+    """他の行をロックする前に呼ぶ（モジュールの説明を参照）"""
+    db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(card_version=User.card_version + 1)
+    )
+
+
+def card_etag(user: User, scope: str, db: Optional[Session] = None) -> str:
+    """
+    scope: エンドポイントごとの識別子（日付依存なら日付も含める）
+    アクセストークンで認証した User は card_version を持たないので db から読む
+    レプリカから読むときも、返すカードと同じ時点の番号になるようレプリカの値を使う
+    """
+    version = user.card_version
+    if db is not None and (version is None or db.info.get("replica") is True):
+        version = db.execute(select(User.card_version).where(User.id == user.id)).scalar()
+    return f'W/"{scope}-{user.id.hex}-{version}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match の弱い比較（W/ の有無は無視、* とカンマ区切りに対応）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == wanted
+        for candidate in if_none_match.split(",")
+    )
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag))
+
+
+def cache_headers(etag: str) -> dict:
+    # 毎回 If-None-Match で再検証させる
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
@@ -1,17 +1,22 @@
 from anthropic import Anthropic
 
 from app.config import settings
+from app.metrics import track_external
 
-client = Anthropic(api_key=settings.anthropic_api_key)
+client = Anthropic(
+    api_key=settings.anthropic_api_key,
+    base_url=settings.anthropic_base_url or None
+)
 
 
 def chat_with_claude(messages: list[dict]) -> str:
     """
     messages: [{"role": "user"|"assistant", "content": "..."}]
     """
-    response = client.messages.create(
-        model="claude-sonnet-4-20250514",
-        max_tokens=2048,
-        messages=messages
-    )
+    with track_external("claude"):
+        response = client.messages.create(
+            model="claude-sonnet-4-20250514",
+            max_tokens=2048,
+            messages=messages
+        )
     return response.content[0].text
@@ -0,0 +1,210 @@
+"""
+重複カード検出
+
+front を正規化したフィンガープリントで完全一致を、トライグラムの MinHash + LSH で
+語尾や1文字程度の表記ゆれ（"take ... into consideration(s)" など）を検出する。
+トライグラムの Jaccard 係数で判定するので、"colour"/"color" のような短い語の綴り違いは閾値に届かない。
+
+フィンガープリントと LSH のバンドのキーはカードを書くときに cards.front_fingerprint /
+cards.front_bands に保存する（migration 013、既存行は scripts/backfill_dedup_keys.py で埋める）。
+判定時はそのどちらかが一致するカードだけをインデックス経由で読むので、
+ユーザーのカード全体を読み直したりワーカーごとにメモリへ持ったりしない。
+"""
+import hashlib
+import random
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app.models import Card
+
+
+SIMILARITY_THRESHOLD = 0.8
+NUM_PERM = 32
+BANDS = 8
+ROWS_PER_BAND = NUM_PERM // BANDS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240101)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+
+_LEADING_WORDS = re.compile(r"^(?:a|an|the|to)\s+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """大小文字・全角半角・記号・冠詞の違いを吸収した比較用文字列"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = "".join(
+        " " if unicodedata.category(ch)[0] in ("P", "S") else ch
+        for ch in text
+    )
+    text = _SPACES.sub(" ", text).strip()
+    return _LEADING_WORDS.sub("", text)
+
+
+def _digest(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def fingerprint(text: str) -> str:
+    return _digest(normalize(text))
+
+
+def trigrams(normalized: str) -> frozenset[str]:
+    """pg_trgm と同じく単語ごとに前2・後1の空白を補ってトライグラム化"""
+    grams = set()
+    for word in normalized.split(" "):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _gram_hash(gram: str) -> int:
+    # hash() はプロセスごとに値が変わるので、DB に残すバンドには使えない
+    return int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=6).digest(), "big")
+
+
+def minhash(grams: Iterable[str]) -> tuple[int, ...]:
+    hashes = [_gram_hash(g) for g in grams]
+    if not hashes:
+        return (0,) * NUM_PERM
+    return tuple(
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def _bands(signature: tuple[int, ...]) -> list[int]:
+    """バンドごとの行をまとめて bigint に収まるキーにする（cards.front_bands に入る値）"""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        data = bytes([band]) + b"".join(r.to_bytes(8, "big") for r in rows)
+        keys.append(int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big", signed=True))
+    return keys
+
+
+def card_keys(front: str) -> dict:
+    """カードを書くときに一緒に保存する列"""
+    norm = normalize(front)
+    return {
+        "front_fingerprint": _digest(norm),
+        "front_bands": _bands(minhash(trigrams(norm))),
+    }
+
+
+@dataclass
+class DuplicateMatch:
+    card_id: Optional[UUID]  # 同じリクエスト内の重複なら None
+    front: str
+    similarity: float
+
+
+class DedupIndex:
+    """1ユーザー分の重複検出インデックス（リクエストごとに候補のカードから作って捨てる）"""
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self._exact: dict[str, set[UUID]] = {}
+        self._buckets: dict[int, set[UUID]] = {}
+        self._entries: dict[UUID, tuple[str, str, frozenset, tuple]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, card_id: UUID, front: str) -> None:
+        norm = normalize(front)
+        grams = trigrams(norm)
+        signature = minhash(grams)
+        fp = _digest(norm)
+        self._entries[card_id] = (front, fp, grams, signature)
+        self._exact.setdefault(fp, set()).add(card_id)
+        for key in _bands(signature):
+            self._buckets.setdefault(key, set()).add(card_id)
+
+    def find(self, front: str) -> Optional[DuplicateMatch]:
+        """最も似ている既存カード（閾値以上のもの）を返す"""
+        norm = normalize(front)
+        same = self._exact.get(_digest(norm))
+        if same:
+            card_id = next(iter(same))
+            return DuplicateMatch(card_id, self._entries[card_id][0], 1.0)
+
+        grams = trigrams(norm)
+        candidates: set[UUID] = set()
+        for key in _bands(minhash(grams)):
+            candidates.update(self._buckets.get(key, ()))
+
+        best: Optional[DuplicateMatch] = None
+        for candidate_id in candidates:
+            entry = self._entries[candidate_id]
+            score = jaccard(grams, entry[2])
+            if score >= self.threshold and (best is None or score > best.similarity):
+                best = DuplicateMatch(candidate_id, entry[0], round(score, 3))
+        return best
+
+
+def candidate_index(db: Session, user_id: UUID, fronts: Iterable[str]) -> DedupIndex:
+    """
+    fronts とフィンガープリントかバンドが一致する既存カードだけを読み込んだインデックス
+    ix_cards_user_fingerprint / ix_cards_user_front_bands を使うので、読むのは候補の行だけ
+    """
+    fingerprints, bands = set(), set()
+    for front in fronts:
+        keys = card_keys(front)
+        fingerprints.add(keys["front_fingerprint"])
+        bands.update(keys["front_bands"])
+
+    index = DedupIndex()
+    if not fingerprints:
+        return index
+    rows = db.execute(
+        select(Card.id, Card.front).where(
+            Card.user_id == user_id,
+            or_(Card.front_fingerprint.in_(fingerprints), Card.front_bands.overlap(sorted(bands))),
+        )
+    )
+    for card_id, front in rows:
+        index.add(card_id, front)
+    return index
+
+
+def split_duplicates(
+    index: DedupIndex,
+    items: list,
+    key=lambda item: item.front
+) -> tuple[list, list[tuple[object, DuplicateMatch]]]:
+    """
+    items を (新規, [(重複, 一致したカード)]) に分ける
+    items 同士の重複は先に出てきたものを残す
+    """
+    unique, duplicates = [], []
+    batch = DedupIndex(index.threshold)
+    for i, item in enumerate(items):
+        text = key(item)
+        match = index.find(text)
+        if match is None:
+            match = batch.find(text)
+            if match is not None:
+                match = DuplicateMatch(None, match.front, match.similarity)
+        if match is None:
+            unique.append(item)
+            batch.add(i, text)
+        else:
+            duplicates.append((item, match))
+    return unique, duplicates
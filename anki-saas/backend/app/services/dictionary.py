@@ -0,0 +1,215 @@
+"""
+ローカルの英和辞書（メモリマップしたインデックス）
+
+build_dictionary.py で一度だけコンパイルした1ファイルを mmap で読む。
+ページはOSのページキャッシュを共有するので、ワーカーが何プロセスあっても
+辞書本体のコピーはプロセスごとに作られない（Python 側に持つのは数個のオブジェクトだけ）。
+
+ファイル形式（リトルエンディアン）:
+  ヘッダー 16 バイト: MAGIC (8) / 見出し語数 n (uint32) / 予約 (4)
+  key_offsets:   uint32 × (n + 1)  キー領域内の各キーの開始位置（最後は終端）
+  value_offsets: uint32 × (n + 1)  値領域内の各値の開始位置
+  キー領域: normalize_key 済みの UTF-8 を bytes 順にソートして連結
+  値領域:   "意味\\t発音\\t例文" の UTF-8 を連結（空欄は None）
+検索はキーの二分探索で、比べるキーだけをスライスして読む。
+
+置き換えるときは別名で書いてから os.replace する。動作中のワーカーは古いファイルを
+map したまま動き続け、次に起動したプロセスから新しい辞書を読む。
+"""
+import bisect
+import mmap
+import os
+import re
+import struct
+import sys
+import unicodedata
+from array import array
+from typing import Iterable, Optional
+
+
+MAGIC = b"ANKIDIC1"
+HEADER = struct.Struct("<8sII")
+FIELD_SEP = "\t"
+
+_SPACES = re.compile(r"\s+")
+
+# 規則変化で戻せない語（過去形・過去分詞・複数形など）
+IRREGULAR = {
+    "am": "be", "is": "be", "are": "be", "was": "be", "were": "be", "been": "be", "being": "be",
+    "has": "have", "had": "have", "does": "do", "did": "do", "done": "do",
+    "went": "go", "gone": "go", "came": "come", "saw": "see", "seen": "see",
+    "took": "take", "taken": "take", "gave": "give", "given": "give", "got": "get", "gotten": "get",
+    "made": "make", "said": "say", "knew": "know", "known": "know", "thought": "think",
+    "told": "tell", "found": "find", "felt": "feel", "left": "leave", "kept": "keep",
+    "brought": "bring", "bought": "buy", "caught": "catch", "taught": "teach", "sought": "seek",
+    "began": "begin", "begun": "begin", "ran": "run", "sat": "sit", "stood": "stand",
+    "wrote": "write", "written": "write", "spoke": "speak", "spoken": "speak",
+    "broke": "break", "broken": "break", "chose": "choose", "chosen": "choose",
+    "ate": "eat", "eaten": "eat", "fell": "fall", "fallen": "fall", "flew": "fly", "flown": "fly",
+    "grew": "grow", "grown": "grow", "drew": "draw", "drawn": "draw", "drove": "drive", "driven": "drive",
+    "rode": "ride", "ridden": "ride", "rose": "rise", "risen": "rise", "woke": "wake", "woken": "wake",
+    "wore": "wear", "worn": "wear", "tore": "tear", "torn": "tear", "swam": "swim", "swum": "swim",
+    "sang": "sing", "sung": "sing", "drank": "drink", "drunk": "drink", "rang": "ring", "rung": "ring",
+    "forgot": "forget", "forgotten": "forget", "understood": "understand", "meant": "mean",
+    "met": "meet", "paid": "pay", "sent": "send", "spent": "spend", "built": "build", "lent": "lend",
+    "lost": "lose", "led": "lead", "held": "hold", "heard": "hear", "sold": "sell", "slept": "sleep",
+    "fought": "fight", "won": "win", "shot": "shoot", "struck": "strike", "hid": "hide", "hidden": "hide",
+    "better": "good", "best": "good", "worse": "bad", "worst": "bad",
+    "children": "child", "men": "man", "women": "woman", "people": "person", "feet": "foot",
+    "teeth": "tooth", "mice": "mouse", "geese": "goose", "oxen": "ox", "lives": "life", "wives": "wife",
+    "knives": "knife", "leaves": "leaf", "analyses": "analysis", "crises": "crisis", "phenomena": "phenomenon",
+    "criteria": "criterion", "data": "datum",
+}
+
+# (語尾, 戻し方)。上から順に候補を作り、辞書にある最初のものを使う
+SUFFIX_RULES = (
+    ("ies", ("y",)), ("ves", ("f", "fe")),
+    ("sses", ("ss",)), ("ches", ("ch",)), ("shes", ("sh",)), ("xes", ("x",)), ("zes", ("z",)), ("oes", ("o",)),
+    ("s", ("",)),
+    ("ied", ("y",)), ("ed", ("", "e")),
+    ("ying", ("ie", "y")), ("ing", ("", "e")),
+    ("ier", ("y",)), ("iest", ("y",)), ("er", ("", "e")), ("est", ("", "e")),
+)
+# stopped → stop, running → run, bigger → big のように子音を重ねる語尾
+DOUBLING_SUFFIXES = ("ed", "ing", "er", "est")
+
+
+def normalize_key(word: str) -> str:
+    """全角・大文字・余分な空白を吸収した見出し語"""
+    return _SPACES.sub(" ", unicodedata.normalize("NFKC", word)).strip().lower()
+
+
+def lemma_candidates(word: str) -> list[str]:
+    """word そのもの → 不規則変化 → 規則変化の順に、辞書を引く候補を返す。
+
+    句（give up など）は先頭の語だけを活用から戻す（gave up → give up）。
+    """
+    key = normalize_key(word)
+    head, sep, rest = key.partition(" ")
+    candidates = [key]
+
+    def add(stem: str) -> None:
+        candidate = stem + sep + rest
+        if stem and candidate not in candidates:
+            candidates.append(candidate)
+
+    if head in IRREGULAR:
+        add(IRREGULAR[head])
+    for suffix, replacements in SUFFIX_RULES:
+        stem = head[:-len(suffix)]
+        # as → a のような短すぎる語幹は作らない（lying → lie だけは1文字）
+        if not head.endswith(suffix) or len(stem) < (1 if suffix == "ying" else 2):
+            continue
+        for replacement in replacements:
+            add(stem + replacement)
+        if suffix in DOUBLING_SUFFIXES and len(stem) >= 3 and stem[-1] == stem[-2] and stem[-1] not in "aeiou":
+            add(stem[:-1])
+    return candidates
+
+
+class _Keys:
+    """bisect で使うためのキー列（比べるキーだけを mmap から切り出す）"""
+
+    def __init__(self, mm: mmap.mmap, offsets: memoryview, base: int):
+        self._mm = mm
+        self._offsets = offsets
+        self._base = base
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        return self._mm[self._base + self._offsets[i]:self._base + self._offsets[i + 1]]
+
+
+class MmapDictionary:
+    def __init__(self, path: str):
+        if sys.byteorder != "little":
+            raise RuntimeError("dictionary index is little-endian only")
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, _ = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a dictionary index")
+
+        view = memoryview(self._mm)
+        pos = HEADER.size
+        size = 4 * (count + 1)
+        key_offsets = view[pos:pos + size].cast("I")
+        self._value_offsets = view[pos + size:pos + 2 * size].cast("I")
+        keys_base = pos + 2 * size
+        self._values_base = keys_base + key_offsets[count]
+        self._keys = _Keys(self._mm, key_offsets, keys_base)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def get(self, key: str) -> Optional[dict]:
+        """正規化済みのキーを完全一致で引く"""
+        target = key.encode("utf-8")
+        i = bisect.bisect_left(self._keys, target)
+        if i == len(self._keys) or self._keys[i] != target:
+            return None
+        start = self._values_base + self._value_offsets[i]
+        end = self._values_base + self._value_offsets[i + 1]
+        meaning, pronunciation, example = self._mm[start:end].decode("utf-8").split(FIELD_SEP)
+        return {
+            "word": key,
+            "meaning": meaning,
+            "pronunciation": pronunciation or None,
+            "example": example or None,
+        }
+
+    def lookup(self, word: str) -> Optional[dict]:
+        """活用形・複数形も見出し語に戻して引く"""
+        for candidate in lemma_candidates(word):
+            entry = self.get(candidate)
+            if entry is not None:
+                return entry
+        return None
+
+
+def _clean(value: Optional[str]) -> str:
+    return _SPACES.sub(" ", (value or "").replace(FIELD_SEP, " ")).strip()
+
+
+def write_index(entries: Iterable[tuple[str, str, Optional[str], Optional[str]]], path: str) -> int:
+    """
+    entries: (見出し語, 意味, 発音, 例文)。同じ見出し語は意味を " / " でつなぐ
+    一時ファイルに書いてから置き換え、見出し語数を返す
+    """
+    merged: dict[bytes, list[str]] = {}
+    for word, meaning, pronunciation, example in entries:
+        key = normalize_key(word)
+        meaning = _clean(meaning)
+        if not key or not meaning:
+            continue
+        fields = merged.get(key.encode("utf-8"))
+        if fields is None:
+            merged[key.encode("utf-8")] = [meaning, _clean(pronunciation), _clean(example)]
+        else:
+            fields[0] = f"{fields[0]} / {meaning}"
+            fields[1] = fields[1] or _clean(pronunciation)
+            fields[2] = fields[2] or _clean(example)
+
+    keys = sorted(merged)
+    values = [FIELD_SEP.join(merged[k]).encode("utf-8") for k in keys]
+
+    def offsets(blobs: list[bytes]) -> array:
+        result = array("I", [0])
+        for blob in blobs:
+            result.append(result[-1] + len(blob))
+        if sys.byteorder != "little":
+            result.byteswap()
+        return result
+
+    tmp_path = f"{path}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(keys), 0))
+        f.write(offsets(keys).tobytes())
+        f.write(offsets(values).tobytes())
+        f.write(b"".join(keys))
+        f.write(b"".join(values))
+    os.replace(tmp_path, path)
+    return len(keys)
@@ -0,0 +1,99 @@
+"""
+ユーザーごと・日ごとの復習予定枚数（due_counts）
+
+cards.next_review を変える処理（作成・削除・復習・インポート）は同じトランザクション内で
+adjust に増減を渡す。「今日の復習枚数」は day <= 今日 の合計なので、
+期限切れの日付は rebuild で今日の行にまとめておけば数行の読み取りで済む。
+"""
+from collections import Counter
+from datetime import date, timedelta
+from typing import Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app import realtime
+from app.models import DueCount
+from app.services.card_version import bump_card_version
+
+
+def adjust(db: Session, user_id: UUID, deltas: dict[date, int]) -> None:
+    """deltas: {next_review の日付: 増減}。増減 0 の日は書き込まない"""
+    # 行ロックを取る順序をそろえるため日付順に書く
+    rows = [
+        {"user_id": user_id, "day": day, "count": delta}
+        for day, delta in sorted(deltas.items()) if delta
+    ]
+    if not rows:
+        return
+    realtime.publish_due(db, user_id, {r["day"]: r["count"] for r in rows})
+    stmt = insert(DueCount).values(rows)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[DueCount.user_id, DueCount.day],
+        set_={"count": DueCount.count + stmt.excluded.count}
+    ))
+
+
+def count_days(days: Iterable[date], sign: int = 1) -> dict[date, int]:
+    return {day: n * sign for day, n in Counter(days).items()}
+
+
+def moved(old_day: date, new_day: date) -> dict[date, int]:
+    """1枚のカードの next_review が変わったときの増減"""
+    if old_day == new_day:
+        return {}
+    return {old_day: -1, new_day: 1}
+
+
+def due_today(db: Session, user_id: UUID, today: date) -> int:
+    return db.execute(
+        select(func.coalesce(func.sum(DueCount.count), 0))
+        .where(DueCount.user_id == user_id, DueCount.day <= today)
+    ).scalar_one()
+
+
+def forecast(db: Session, user_id: UUID, today: date, days: int) -> list[dict]:
+    """今日から days 日分の予定枚数。今日の分には期限切れも含める"""
+    rows = db.execute(
+        select(
+            func.greatest(DueCount.day, today).label("day"),
+            func.sum(DueCount.count).label("count"),
+        )
+        .where(DueCount.user_id == user_id, DueCount.day < today + timedelta(days=days))
+        .group_by(func.greatest(DueCount.day, today))
+    )
+    counts = {row.day: row.count for row in rows}
+    return [
+        {"date": today + timedelta(days=i), "count": counts.get(today + timedelta(days=i), 0)}
+        for i in range(days)
+    ]
+
+
+# 期限切れの日付は今日にまとめて作り直す（増減は元の日付に入っても合計は変わらない）
+REBUILD_SQL = """
+    INSERT INTO due_counts (user_id, day, count)
+    SELECT user_id, greatest(next_review, CAST(:today AS date)), count(*)
+    FROM cards
+    {where}
+    GROUP BY 1, 2
+"""
+
+
+def rebuild(db: Session, today: date, user_id: Optional[UUID] = None) -> None:
+    """
+    cards から1回の集計で作り直す。コミットは呼び出し側で行う
+    同時に adjust された増減を取りこぼさないよう、1ユーザー分なら他の書き込みと同じく
+    users の行ロック（bump_card_version）で、全ユーザー分なら due_counts 全体をロックする
+    """
+    params = {"today": today}
+    if user_id is None:
+        db.execute(text("LOCK TABLE due_counts IN EXCLUSIVE MODE"))
+        db.execute(text("DELETE FROM due_counts"))
+        db.execute(text(REBUILD_SQL.format(where="")), params)
+    else:
+        bump_card_version(db, user_id)
+        params["user_id"] = user_id
+        db.execute(text("DELETE FROM due_counts WHERE user_id = :user_id"), params)
+        db.execute(text(REBUILD_SQL.format(where="WHERE user_id = :user_id")), params)
@@ -0,0 +1,162 @@
+"""
+溜まった復習の平準化（リスケジュール）
+
+休み明けなどで期限切れが大量に溜まったとき、期限切れのカードを今日から window 日の範囲に、
+1日の上限を超えて集中している日のカードを元の日の前後 fuzz 日の範囲に振り分け直す。
+
+plan は DB に触れない純粋関数で、apply は plan の結果を1回の UPDATE で反映する。
+"""
+import math
+from collections import Counter
+from dataclasses import dataclass, field
+from operator import itemgetter
+from datetime import date, timedelta
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from app import realtime
+from app.models import Card
+from app.services import due_counts
+from app.services.card_version import bump_card_version
+
+
+@dataclass
+class ReschedulePlan:
+    daily_cap: int
+    moves: list[tuple[UUID, date, date]] = field(default_factory=list)  # (card_id, 元の日付, 新しい日付)
+    before: list[int] = field(default_factory=list)  # 今日から window 日分の枚数（期限切れは今日に含める）
+    after: list[int] = field(default_factory=list)
+
+
+_priority = itemgetter(0)
+
+
+def fuzz(interval: int) -> int:
+    """集中日のカードは間隔の1割（最低1日）までなら前後に動かしてよい"""
+    return max(1, round(interval * 0.1))
+
+
+def plan(
+    cards: list[tuple[UUID, date, int]],
+    today: date,
+    window_days: int,
+    daily_cap: Optional[int] = None
+) -> ReschedulePlan:
+    """
+    cards: [(card_id, next_review, interval)]。next_review が today + window_days 未満のもの
+    daily_cap: 1日の上限。全体が収まらない値なら収まる最小値まで引き上げる
+
+    優先度は「期限切れ日数 / 間隔」（間隔に対してどれだけ遅れているか）。
+    優先度の高いカードから、置ける最も早い日に詰めていく。
+    期限切れでないカードは元の日 ± fuzz(間隔) の中でしか動かさず、空きがなければ元の日に残す
+    （間隔 1 日のカードが window の端まで飛ばされないように）。
+    """
+    cap = max(daily_cap or 0, math.ceil(len(cards) / window_days), 1)
+    result = ReschedulePlan(daily_cap=cap)
+
+    # (優先度, 今日からの日数, 間隔, card_id, 元の日付)
+    overdue = []
+    by_day: list[list] = [[] for _ in range(window_days)]
+    today_ordinal = today.toordinal()
+    for card_id, due, interval in cards:
+        offset = due.toordinal() - today_ordinal
+        entry = (-offset / (interval or 1), offset, interval, card_id, due)
+        if offset < 0:
+            overdue.append(entry)
+        else:
+            by_day[offset].append(entry)
+
+    result.before = [len(day) for day in by_day]
+    if result.before:
+        result.before[0] += len(overdue)
+
+    # 上限を超えた日は、優先度の低いカードを動かす対象にする
+    movable = overdue
+    load = [0] * window_days
+    for offset, day in enumerate(by_day):
+        if len(day) > cap:
+            day.sort(key=_priority, reverse=True)
+            movable.extend(day[cap:])
+        load[offset] = min(len(day), cap)
+    movable.sort(key=_priority, reverse=True)
+
+    # 空きのある次の日を辿る union-find（window_days は「空きなし」の番兵）
+    next_free = list(range(window_days + 1))
+    for offset in range(window_days):
+        if load[offset] >= cap:
+            next_free[offset] = offset + 1
+
+    def find(offset: int) -> int:
+        while next_free[offset] != offset:
+            next_free[offset] = next_free[next_free[offset]]
+            offset = next_free[offset]
+        return offset
+
+    days = [today + timedelta(days=i) for i in range(window_days)]
+    for _, offset, interval, card_id, due in movable:
+        if offset < 0:
+            earliest, latest = 0, window_days - 1
+        else:
+            earliest, latest = max(offset - fuzz(interval), 0), offset + fuzz(interval)
+        target = find(earliest)
+        if target > latest or target == window_days:
+            if offset >= 0:
+                load[offset] += 1  # 置ける日がなければ元の日のまま
+                continue
+            target = min(range(window_days), key=load.__getitem__)
+        load[target] += 1
+        if load[target] >= cap:
+            next_free[target] = target + 1
+        if target != offset:
+            result.moves.append((card_id, due, days[target]))
+
+    result.after = load
+    return result
+
+
+def load_cards(db: Session, user_id: UUID, today: date, window_days: int) -> list[tuple[UUID, date, int]]:
+    # 新規カード（interval = 0）は新規キューで出すので対象外
+    rows = db.execute(
+        select(Card.id, Card.next_review, Card.interval)
+        .where(
+            Card.user_id == user_id,
+            Card.interval > 0,
+            Card.next_review < today + timedelta(days=window_days)
+        )
+    )
+    return [tuple(row) for row in rows]
+
+
+# 読み込み後に復習されたカードは next_review が変わっているので上書きしない
+APPLY_SQL = text("""
+    UPDATE cards AS c
+    SET next_review = v.new_day, updated_at = timezone('utc', clock_timestamp())
+    FROM unnest(CAST(:ids AS uuid[]), CAST(:old_days AS date[]), CAST(:new_days AS date[]))
+         AS v(id, old_day, new_day)
+    WHERE c.id = v.id AND c.user_id = :user_id AND c.next_review = v.old_day
+    RETURNING v.old_day, v.new_day
+""")
+
+
+def apply(db: Session, user_id: UUID, result: ReschedulePlan) -> int:
+    """plan の結果を反映する。コミットは呼び出し側で行う。戻り値は実際に動かした枚数"""
+    if not result.moves:
+        return 0
+
+    bump_card_version(db, user_id)
+    ids, old_days, new_days = zip(*result.moves)
+    rows = db.execute(APPLY_SQL, {
+        "ids": list(ids), "old_days": list(old_days), "new_days": list(new_days), "user_id": user_id,
+    }).all()
+
+    deltas = Counter()
+    for old_day, new_day in rows:
+        deltas[old_day] -= 1
+        deltas[new_day] += 1
+    due_counts.adjust(db, user_id, deltas)
+    if rows:
+        realtime.publish(db, user_id, "cards.changed", count=len(rows))
+    return len(rows)
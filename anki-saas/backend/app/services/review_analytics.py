@@ -0,0 +1,229 @@
+"""
+復習履歴の Parquet エクスポートと分析用ヘルパー
+
+export_review_logs は review_logs と cards の現在の状態を結合し、
+前回の続き（ウォーターマーク）から月ごとの Parquet ファイルに追記する。
+ウォーターマークは挿入時刻の logged_at に置く。オフライン同期やスピルの再投入で
+過去の reviewed_at の行が後から入っても、挿入された次の回に書き出される。
+分析側は load_reviews で Arrow のテーブルとして読み込み、
+retention_curve / ease_distribution などを numpy で計算する（Postgres には触れない）。
+
+pyarrow は分析用の追加依存（requirements-analytics.txt）なので関数内で読み込む。
+
+出力ディレクトリの構成:
+  <out_dir>/_watermark.json
+  <out_dir>/month=2026-10/part-20261019T120000.parquet
+"""
+import functools
+import json
+import operator
+import os
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import Card, ReviewLog
+
+
+EXPORT_BATCH_SIZE = 50_000
+# logged_at は挿入時の時刻なので、コミットがそれより遅れた行を取りこぼさないよう直近は次回に回す
+SETTLE_LAG = timedelta(minutes=5)
+WATERMARK_FILE = "_watermark.json"
+
+COLUMNS = (
+    "id", "user_id", "card_id", "rating", "reviewed_at",
+    "card_type", "ease_factor", "interval", "repetitions",
+)
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError("pyarrow is required: pip install -r requirements-analytics.txt") from e
+    return pyarrow
+
+
+def schema():
+    pa = _pyarrow()
+    return pa.schema([
+        ("id", pa.string()),
+        ("user_id", pa.string()),
+        ("card_id", pa.string()),
+        ("rating", pa.int8()),
+        ("reviewed_at", pa.timestamp("us")),
+        ("card_type", pa.dictionary(pa.int8(), pa.string())),
+        ("ease_factor", pa.float32()),
+        ("interval", pa.int32()),
+        ("repetitions", pa.int16()),
+    ])
+
+
+def read_watermark(out_dir: str) -> Optional[datetime]:
+    try:
+        with open(os.path.join(out_dir, WATERMARK_FILE)) as f:
+            return datetime.fromisoformat(json.load(f)["until"])
+    except FileNotFoundError:
+        return None
+
+
+def write_watermark(out_dir: str, until: datetime) -> None:
+    path = os.path.join(out_dir, WATERMARK_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"until": until.isoformat()}, f)
+    os.replace(tmp, path)  # 途中で落ちても前回の値が残る
+
+
+def export_query(since: Optional[datetime], until: datetime):
+    # カードの状態は復習時点ではなくエクスポート時点のもの
+    stmt = (
+        select(
+            ReviewLog.id, ReviewLog.user_id, ReviewLog.card_id, ReviewLog.rating, ReviewLog.reviewed_at,
+            Card.card_type, Card.ease_factor, Card.interval, Card.repetitions,
+        )
+        .join(Card, Card.id == ReviewLog.card_id)
+        .where(ReviewLog.logged_at < until)
+        .order_by(ReviewLog.logged_at)
+    )
+    if since is not None:
+        stmt = stmt.where(ReviewLog.logged_at >= since)
+    return stmt
+
+
+def write_batches(batches: Iterable[list[tuple]], out_dir: str, tag: str) -> dict[str, int]:
+    """
+    行のバッチを reviewed_at の月ごとのファイルに書く（同期で遡った行があるので月の順は問わない）
+    Returns: {月: 行数}
+    """
+    pa = _pyarrow()
+    table_schema = schema()
+    written: dict[str, int] = {}
+    writers = {}
+
+    try:
+        for rows in batches:
+            if not rows:
+                continue
+            columns = list(zip(*rows))
+            months = [ts.strftime("%Y-%m") for ts in columns[4]]
+            start = 0
+            # バッチが月をまたぐことがあるので、月が変わる位置で区切る
+            for end in range(1, len(rows) + 1):
+                if end < len(rows) and months[end] == months[start]:
+                    continue
+                month = months[start]
+                writer = writers.get(month)
+                if writer is None:
+                    month_dir = os.path.join(out_dir, f"month={month}")
+                    os.makedirs(month_dir, exist_ok=True)
+                    writer = writers[month] = pa.parquet.ParquetWriter(
+                        os.path.join(month_dir, f"part-{tag}.parquet"), table_schema, compression="zstd"
+                    )
+                arrays = [
+                    pa.array([str(v) for v in columns[0][start:end]], pa.string()),
+                    pa.array([str(v) for v in columns[1][start:end]], pa.string()),
+                    pa.array([str(v) for v in columns[2][start:end]], pa.string()),
+                    pa.array(columns[3][start:end], pa.int8()),
+                    pa.array(columns[4][start:end], pa.timestamp("us")),
+                    pa.array(columns[5][start:end], pa.string()).dictionary_encode().cast(table_schema.field("card_type").type),
+                    pa.array(columns[6][start:end], pa.float32()),
+                    pa.array(columns[7][start:end], pa.int32()),
+                    pa.array(columns[8][start:end], pa.int16()),
+                ]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=table_schema))
+                written[month] = written.get(month, 0) + (end - start)
+                start = end
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return written
+
+
+def _row_batches(db: Session, stmt, batch_size: int) -> Iterator[list[tuple]]:
+    result = db.execute(stmt.execution_options(yield_per=batch_size))
+    for rows in result.partitions():
+        yield [tuple(row) for row in rows]
+
+
+def export_review_logs(
+    db: Session,
+    out_dir: str,
+    now: Optional[datetime] = None,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> dict:
+    """前回のウォーターマークから (now - SETTLE_LAG) までに挿入された行を書き出してウォーターマークを進める"""
+    os.makedirs(out_dir, exist_ok=True)
+    since = read_watermark(out_dir)
+    until = (now or datetime.utcnow()) - SETTLE_LAG
+    if since is not None and since >= until:
+        return {"since": since, "until": since, "rows": 0, "months": {}}
+
+    months = write_batches(
+        _row_batches(db, export_query(since, until), batch_size), out_dir, until.strftime("%Y%m%dT%H%M%S")
+    )
+    write_watermark(out_dir, until)
+    return {"since": since, "until": until, "rows": sum(months.values()), "months": months}
+
+
+def load_reviews(
+    out_dir: str,
+    columns: Optional[list[str]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """エクスポート済みの Parquet を Arrow のテーブルとして読む（期間の指定は月のディレクトリ単位でも絞られる）"""
+    pa = _pyarrow()
+    dataset = pa.dataset.dataset(out_dir, format="parquet", partitioning="hive")
+    reviewed_at, month = pa.dataset.field("reviewed_at"), pa.dataset.field("month")
+
+    conditions = []
+    if since is not None:
+        conditions += [reviewed_at >= pa.scalar(since, pa.timestamp("us")), month >= since.strftime("%Y-%m")]
+    if until is not None:
+        conditions += [reviewed_at < pa.scalar(until, pa.timestamp("us")), month <= until.strftime("%Y-%m")]
+    condition = functools.reduce(operator.and_, conditions) if conditions else None
+
+    return dataset.to_table(columns=columns or list(COLUMNS), filter=condition)
+
+
+def retention_curve(table, max_days: int = 60) -> dict[str, np.ndarray]:
+    """
+    前回の復習からの経過日数ごとの想起率（Good/Easy の割合）
+    各カードの初回の復習は経過日数がないので除く
+    Returns: {"days", "reviews", "retention"}（max_days 以上は最後の要素にまとめる）
+    """
+    card_codes = table.column("card_id").combine_chunks().dictionary_encode().indices.to_numpy()
+    reviewed = table.column("reviewed_at").to_numpy().astype("datetime64[s]").astype(np.int64)
+    passed = table.column("rating").to_numpy() >= 2
+
+    order = np.lexsort((reviewed, card_codes))
+    card_codes, reviewed, passed = card_codes[order], reviewed[order], passed[order]
+
+    same_card = card_codes[1:] == card_codes[:-1]
+    elapsed_days = ((reviewed[1:] - reviewed[:-1]) // 86400)[same_card]
+    outcome = passed[1:][same_card]
+
+    elapsed_days = np.minimum(elapsed_days, max_days)
+    reviews = np.bincount(elapsed_days, minlength=max_days + 1)
+    recalled = np.bincount(elapsed_days, weights=outcome, minlength=max_days + 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        retention = np.where(reviews > 0, recalled / reviews, np.nan)
+    return {"days": np.arange(max_days + 1), "reviews": reviews, "retention": retention}
+
+
+def ease_distribution(table, bins: Optional[np.ndarray] = None) -> dict[str, np.ndarray]:
+    """カードごとの ease_factor（1カード1回）のヒストグラム"""
+    if bins is None:
+        bins = np.round(np.arange(1.3, 3.6, 0.1), 1)
+    card_codes = table.column("card_id").combine_chunks().dictionary_encode().indices.to_numpy()
+    # float32 で保存しているので 1.3 が 1.2999... になり最初の区間から漏れないよう丸め直す
+    ease = np.round(table.column("ease_factor").to_numpy().astype(np.float64), 2)
+    _, first = np.unique(card_codes, return_index=True)
+    counts, edges = np.histogram(ease[first], bins=bins)
+    return {"edges": edges, "counts": counts}
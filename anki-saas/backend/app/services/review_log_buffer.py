@@ -0,0 +1,281 @@
+"""
+復習ログの write-behind バッファ（REVIEW_LOG_BUFFER_ENABLED=true のときだけ使う）
+
+submit_review はカードの更新だけをトランザクションでコミットし、ReviewLog の行は
+このバッファに積む。バッファは件数（REVIEW_LOG_FLUSH_ROWS）か間隔
+（REVIEW_LOG_FLUSH_INTERVAL_S）のどちらかに達したら、1 文の INSERT でまとめて書き込む。
+
+クラッシュ対策:
+  - append は行を spill ファイル（JSON Lines）に書いてからメモリに積む。
+    既定ではプロセスが落ちても OS に渡った分は残る。電源断にも備えるなら
+    REVIEW_LOG_FSYNC=true（append ごとに fsync するぶん遅い）。
+  - フラッシュ時はファイルを切り替え、INSERT が成功したら古いファイルを消す。
+    失敗した行はメモリに戻して次回に再試行する。
+  - 起動時に他のプロセスが握っていない spill ファイルを再生する。id は append 時に
+    uuid7 で決めておき ON CONFLICT DO NOTHING で入れるので、二重に再生しても重複しない。
+  - ワーカーごとに自分の spill ファイルを flock で握るので、動作中の他ワーカーの
+    ファイルを再生・削除することはない。
+
+順序の保証:
+  - reviewed_at は append 時（カード更新のコミット直後）の時刻で、遅れて書き込まれても
+    変わらない。同じプロセス内では append 順に id（uuid7）も増える。
+  - 同じカードの復習が別々のワーカーで処理されると、書き込み順は入れ替わりうる。
+    ログを読む側は必ず (reviewed_at, id) で並べること（エクスポートや分析は既にそうしている）。
+  - 書き込まれるまで最大で REVIEW_LOG_FLUSH_INTERVAL_S 秒遅れる。カードの状態は
+    即座に反映されるが、ログのエクスポートには直近の復習がまだ含まれないことがある。
+  - カード更新のコミット後・append 前にプロセスが落ちた場合、その 1 件のログは失われる
+    （カードの状態はログより優先する）。append 済みで書き込み前に消えたカードのログは捨てる。
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Optional
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import SessionLocal
+from app.ids import uuid7
+
+
+logger = logging.getLogger("app.review_log_buffer")
+
+SPILL_PREFIX = "review_logs-"
+SPILL_SUFFIX = ".jsonl"
+
+# カードが削除済みのログは外部キー違反で全体が失敗しないよう落とす
+INSERT_SQL = text("""
+    INSERT INTO review_logs (id, user_id, card_id, rating, reviewed_at)
+    SELECT v.id, v.user_id, v.card_id, v.rating, v.reviewed_at
+    FROM unnest(
+        CAST(:ids AS uuid[]), CAST(:user_ids AS uuid[]), CAST(:card_ids AS uuid[]),
+        CAST(:ratings AS smallint[]), CAST(:reviewed_at AS timestamp[])
+    ) AS v(id, user_id, card_id, rating, reviewed_at)
+    WHERE EXISTS (SELECT 1 FROM cards c WHERE c.id = v.card_id)
+    ON CONFLICT DO NOTHING
+""")
+
+
+def insert_params(rows: list[dict]) -> dict:
+    return {
+        "ids": [r["id"] for r in rows],
+        "user_ids": [r["user_id"] for r in rows],
+        "card_ids": [r["card_id"] for r in rows],
+        "ratings": [r["rating"] for r in rows],
+        "reviewed_at": [r["reviewed_at"] for r in rows],
+    }
+
+
+def insert_rows(rows: list[dict]) -> None:
+    """ログ行をまとめて書き込む（1 トランザクション）"""
+    with SessionLocal() as db:
+        db.execute(INSERT_SQL, insert_params(rows))
+        db.commit()
+
+
+def encode_row(row: dict) -> str:
+    return json.dumps({
+        "id": str(row["id"]),
+        "user_id": str(row["user_id"]),
+        "card_id": str(row["card_id"]),
+        "rating": row["rating"],
+        "reviewed_at": row["reviewed_at"].isoformat(),
+    }) + "\n"
+
+
+def decode_row(line: str) -> dict:
+    data = json.loads(line)
+    return {
+        "id": uuid.UUID(data["id"]),
+        "user_id": uuid.UUID(data["user_id"]),
+        "card_id": uuid.UUID(data["card_id"]),
+        "rating": int(data["rating"]),
+        "reviewed_at": datetime.fromisoformat(data["reviewed_at"]),
+    }
+
+
+def read_spill(path: str) -> list[dict]:
+    """spill ファイルの行。書きかけで切れた末尾の行は読み飛ばす"""
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                rows.append(decode_row(line))
+            except (ValueError, KeyError):
+                logger.warning("skipping broken line in %s", path)
+    return rows
+
+
+class ReviewLogBuffer:
+    def __init__(
+        self,
+        spill_dir: str,
+        flush_rows: int = 500,
+        flush_interval: float = 1.0,
+        fsync: bool = False,
+        writer: Callable[[list[dict]], None] = insert_rows,
+    ):
+        self.spill_dir = spill_dir
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.writer = writer
+        self._rows: list[dict] = []
+        self._lock = threading.Lock()  # _rows と spill ファイルへの追記
+        self._flush_lock = threading.Lock()  # フラッシュは同時に1つだけ
+        self._spill = None
+        self._pending: list = []  # 切り替え済みで書き込み待ちのファイル（flock を握ったまま）
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self.replay()
+        with self._lock:
+            self._spill = self._open_spill()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="review-log-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """残りを書き込んで停止する。書き込めなかった分は spill ファイルに残る"""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._lock:
+            if self._spill is not None:
+                if not self._rows and not self._pending:
+                    os.remove(self._spill.name)
+                self._spill.close()
+                self._spill = None
+            for f in self._pending:
+                f.close()
+            self._pending = []
+
+    def append(self, user_id, card_id, rating: int, reviewed_at: Optional[datetime] = None) -> uuid.UUID:
+        row = {
+            "id": uuid7(),
+            "user_id": user_id,
+            "card_id": card_id,
+            "rating": rating,
+            "reviewed_at": reviewed_at or datetime.utcnow(),
+        }
+        line = encode_row(row)
+        with self._lock:
+            if self._spill is None:
+                raise RuntimeError("review log buffer is not started")
+            self._spill.write(line)
+            self._spill.flush()
+            if self.fsync:
+                os.fsync(self._spill.fileno())
+            self._rows.append(row)
+            full = len(self._rows) >= self.flush_rows
+        if full:
+            self._wake.set()
+        return row["id"]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    def flush(self) -> int:
+        """溜まっている行を書き込み、書き込んだ件数を返す。失敗したら 0"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._rows and not self._pending:
+                    return 0
+                rows, self._rows = self._rows, []
+                if self._spill is not None:
+                    self._pending.append(self._spill)
+                    self._spill = self._open_spill()
+                pending = list(self._pending)
+            try:
+                for i in range(0, len(rows), self.flush_rows):
+                    self.writer(rows[i:i + self.flush_rows])
+            except Exception:
+                logger.exception("failed to flush %d review logs; will retry", len(rows))
+                with self._lock:
+                    self._rows[:0] = rows
+                return 0
+            # 失敗して戻した行も今回まとめて書けたので、切り替え済みのファイルは全部不要
+            with self._lock:
+                for f in pending:
+                    os.remove(f.name)
+                    f.close()
+                    self._pending.remove(f)
+            return len(rows)
+
+    def replay(self) -> int:
+        """前回のプロセスが残した spill ファイルを引き取って書き込む。
+
+        書き込みに失敗したらファイルを握ったままメモリに積み、通常のフラッシュで再試行する。
+        """
+        adopted = 0
+        for name in sorted(os.listdir(self.spill_dir)):
+            if not (name.startswith(SPILL_PREFIX) and name.endswith(SPILL_SUFFIX)):
+                continue
+            f = open(os.path.join(self.spill_dir, name), "a", encoding="utf-8")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()  # 動作中の別ワーカーのファイル
+                continue
+            rows = read_spill(f.name)
+            with self._lock:
+                self._rows.extend(rows)
+                self._pending.append(f)
+            adopted += len(rows)
+        if adopted:
+            logger.info("replaying %d review logs from %s", adopted, self.spill_dir)
+        self.flush()
+        return adopted
+
+    def _open_spill(self):
+        name = f"{SPILL_PREFIX}{os.getpid()}-{time.time_ns()}{SPILL_SUFFIX}"
+        f = open(os.path.join(self.spill_dir, name), "a", encoding="utf-8")
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return f
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+_buffer: Optional[ReviewLogBuffer] = None
+
+
+def get_buffer() -> Optional[ReviewLogBuffer]:
+    """有効なら起動済みのバッファ、無効なら None（同期書き込み）"""
+    return _buffer
+
+
+def start() -> None:
+    global _buffer
+    if not settings.review_log_buffer_enabled or _buffer is not None:
+        return
+    buffer = ReviewLogBuffer(
+        settings.review_log_spill_dir,
+        flush_rows=settings.review_log_flush_rows,
+        flush_interval=settings.review_log_flush_interval_s,
+        fsync=settings.review_log_fsync,
+    )
+    buffer.start()
+    _buffer = buffer
+
+
+def stop() -> None:
+    global _buffer
+    if _buffer is not None:
+        _buffer.stop()
+        _buffer = None
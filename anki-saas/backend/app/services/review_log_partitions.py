@@ -0,0 +1,137 @@
+"""
+review_logs の月別パーティション管理
+
+パーティション名は review_logs_YYYY_MM。範囲外の行は review_logs_default に入るので、
+先の月のパーティションは scripts/manage_review_log_partitions.py で前もって作っておく。
+作り忘れて DEFAULT に行が入った月は、その行を新しいパーティションに移してから付け替える
+（DEFAULT に範囲の重なる行があると CREATE TABLE ... PARTITION OF が失敗するため）。
+古い月は切り離して（必要なら CSV.gz に書き出してから）削除する。
+"""
+import gzip
+import os
+import re
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+PARENT = "review_logs"
+DEFAULT_PARTITION = "review_logs_default"
+NAME_PATTERN = re.compile(r"^review_logs_(\d{4})_(\d{2})$")
+
+
+def month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_{month:%Y_%m}"
+
+
+def parse_partition_name(name: str) -> Optional[date]:
+    match = NAME_PATTERN.match(name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def list_partitions(db: Session, attached: bool = True) -> list[tuple[str, date]]:
+    """
+    attached=True なら review_logs に付いている月別パーティション、
+    False なら切り離し済みで残っているテーブル。月の昇順
+    """
+    if attached:
+        rows = db.execute(text("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = CAST(:parent AS regclass)
+        """), {"parent": PARENT})
+    else:
+        rows = db.execute(text("""
+            SELECT c.relname FROM pg_class c
+            WHERE c.relkind = 'r' AND c.relname LIKE 'review\\_logs\\_%'
+              AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)
+        """))
+    partitions = [(name, parse_partition_name(name)) for (name,) in rows]
+    return sorted((p for p in partitions if p[1] is not None), key=lambda p: p[1])
+
+
+def _bounds(month: date) -> str:
+    return f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+
+
+def default_has_rows(db: Session, month: date) -> bool:
+    return db.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE reviewed_at >= :start AND reviewed_at < :end)"),
+        {"start": month, "end": add_months(month, 1)}
+    ).scalar()
+
+
+def move_from_default(db: Session, name: str, month: date) -> None:
+    """
+    DEFAULT に入った month の行を新しいテーブルに移し、パーティションとして付ける
+    DEFAULT を切り離さないので、その間も他の月の挿入は止まらない
+    """
+    # 移している間に同じ月の行が DEFAULT に入らないよう、DEFAULT への書き込みを止める
+    db.execute(text(f"LOCK TABLE {DEFAULT_PARTITION} IN SHARE ROW EXCLUSIVE MODE"))
+    db.execute(text(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    db.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE reviewed_at >= :start AND reviewed_at < :end
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), {"start": month, "end": add_months(month, 1)})
+    # 親のインデックス・主キー・外部キーは ATTACH 時に作られる
+    db.execute(text(f"ALTER TABLE {PARENT} ATTACH PARTITION {name} {_bounds(month)}"))
+
+
+def create_partitions(db: Session, first_month: date, last_month: date) -> list[str]:
+    """first_month〜last_month のパーティションを作る（既存は飛ばす）。作った名前を返す"""
+    existing = {name for name, _ in list_partitions(db)}
+    created = []
+    month = month_start(first_month)
+    while month <= last_month:
+        name = partition_name(month)
+        if name not in existing:
+            if default_has_rows(db, month):
+                move_from_default(db, name, month)
+            else:
+                db.execute(text(f"CREATE TABLE {name} PARTITION OF {PARENT} {_bounds(month)}"))
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+def default_partition_rows(db: Session) -> int:
+    """DEFAULT パーティションに落ちた行数（0 でなければ先のパーティションが足りていない）"""
+    return db.execute(text(f"SELECT count(*) FROM {DEFAULT_PARTITION}")).scalar_one()
+
+
+def detach_partition(db: Session, name: str) -> None:
+    db.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+
+
+def archive_table(db: Session, name: str, archive_dir: str) -> str:
+    """切り離したテーブルを CSV.gz に書き出す。書き出したパスを返す"""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    cursor = db.connection().connection.cursor()
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        cursor.copy_expert(
+            f"COPY (SELECT id, user_id, card_id, rating, reviewed_at FROM {name} ORDER BY reviewed_at) "
+            "TO STDOUT WITH (FORMAT csv, HEADER)",
+            f
+        )
+    return path
+
+
+def drop_table(db: Session, name: str) -> None:
+    db.execute(text(f"DROP TABLE {name}"))
@@ -0,0 +1,204 @@
+"""
+サーバー側の復習キュー
+
+セッション作成時に一度だけ出題順を決め、カード ID の配列として review_sessions に保存する。
+以降の「次のカード」は position を進めて配列の一部を返すだけなので、
+期限切れカードの絞り込みを毎回やり直さない。
+
+new_limit / review_limit は1日あたりの上限。復習（オンライン・同期）のたびに
+daily_study_counts に新規・復習の枚数を足しておき、セッション作成時に今日の分を差し引く。
+"""
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import Integer, delete, func, insert, literal, select, text, union_all
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID, insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models import Card, DailyStudyCount, ReviewSession
+from app.services.card_store import CARD_OUT_COLUMNS
+
+
+MAX_SESSION_CARDS = 1000
+REQUEUE_AFTER = 10  # Again のカードは何枚後に再出題するか
+SESSION_TTL = timedelta(days=1)
+
+
+def build_queue(learning: list, reviews: list, new: list) -> list:
+    """
+    学習中のカードを先頭に、その後ろで復習カードの間に新規カードを均等に混ぜる
+    """
+    queue = list(learning)
+    r = n = 0
+    while r < len(reviews) or n < len(new):
+        # 新規カードは「復習カードの進み具合」に追いついたときだけ出す
+        if n < len(new) and (r >= len(reviews) or (n + 1) * len(reviews) <= r * len(new)):
+            queue.append(new[n])
+            n += 1
+        else:
+            queue.append(reviews[r])
+            r += 1
+    return queue[:MAX_SESSION_CARDS]
+
+
+def _candidates(user_id: UUID, kind: str, where: list, order_by, limit: int):
+    return (
+        select(
+            Card.id,
+            literal(kind).label("kind"),
+            func.row_number().over(order_by=order_by).label("rank"),
+        )
+        .where(Card.user_id == user_id, *where)
+        .order_by(order_by)
+        .limit(limit)
+        .subquery()
+    )
+
+
+def fetch_candidates(db: Session, user_id: UUID, new_limit: int, review_limit: int) -> dict[str, list[UUID]]:
+    """学習中・復習・新規のカード ID を1回のクエリでまとめて取得"""
+    today = date.today()
+    parts = [
+        # 一度 Again/Hard で戻されたカード（interval は 1 以上、repetitions は 0）
+        _candidates(user_id, "learning", [Card.interval > 0, Card.repetitions == 0, Card.next_review <= today],
+                    Card.next_review, MAX_SESSION_CARDS),
+        _candidates(user_id, "review", [Card.repetitions > 0, Card.next_review <= today],
+                    Card.next_review, review_limit),
+        # まだ一度も復習していないカード
+        _candidates(user_id, "new", [Card.interval == 0], Card.created_at, new_limit),
+    ]
+    rows = db.execute(union_all(*(select(p) for p in parts)))
+
+    result = {"learning": [], "review": [], "new": []}
+    for card_id, kind, rank in sorted(rows, key=lambda row: (row.kind, row.rank)):
+        result[kind].append(card_id)
+    return result
+
+
+def study_kind(interval: Optional[int], repetitions: Optional[int]) -> Optional[str]:
+    """復習する前のカードの状態から "new" / "review" を返す（学習中は上限の対象外なので None）"""
+    if not interval:
+        return "new"
+    if repetitions:
+        return "review"
+    return None
+
+
+def count_kinds(studied: Iterable[tuple[date, Optional[str]]]) -> dict[date, tuple[int, int]]:
+    """[(日付, study_kind)] → {日付: (新規, 復習)}"""
+    counts: dict[date, tuple[int, int]] = {}
+    for day, kind in studied:
+        new, reviews = counts.get(day, (0, 0))
+        counts[day] = (new + (kind == "new"), reviews + (kind == "review"))
+    return counts
+
+
+def record_studied(db: Session, user_id: UUID, counts: dict[date, tuple[int, int]]) -> None:
+    """counts: {日付: (新規, 復習)}。コミットは呼び出し側で行う"""
+    rows = [
+        {"user_id": user_id, "day": day, "new_count": new, "review_count": reviews}
+        for day, (new, reviews) in sorted(counts.items()) if new or reviews
+    ]
+    if not rows:
+        return
+    stmt = pg_insert(DailyStudyCount).values(rows)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[DailyStudyCount.user_id, DailyStudyCount.day],
+        set_={
+            "new_count": DailyStudyCount.new_count + stmt.excluded.new_count,
+            "review_count": DailyStudyCount.review_count + stmt.excluded.review_count,
+        }
+    ))
+
+
+def studied_on(db: Session, user_id: UUID, day: date) -> tuple[int, int]:
+    """(新規, 復習) の学習済み枚数"""
+    row = db.execute(
+        select(DailyStudyCount.new_count, DailyStudyCount.review_count)
+        .where(DailyStudyCount.user_id == user_id, DailyStudyCount.day == day)
+    ).first()
+    return (row.new_count, row.review_count) if row is not None else (0, 0)
+
+
+def create_session(db: Session, user_id: UUID, new_limit: int, review_limit: int) -> dict:
+    # 上限は1日あたりなので、今日すでに学習した分を差し引いてから選ぶ
+    new_done, reviews_done = studied_on(db, user_id, date.today())
+    new_limit = max(new_limit - new_done, 0)
+    review_limit = max(review_limit - reviews_done, 0)
+    candidates = fetch_candidates(db, user_id, new_limit, review_limit)
+    queue = build_queue(candidates["learning"], candidates["review"], candidates["new"])
+
+    # 古いセッションは溜めない（created_at は naive UTC なので、サーバーのタイムゾーンに依らない Python 側の時刻と比べる）
+    db.execute(
+        delete(ReviewSession).where(
+            ReviewSession.user_id == user_id,
+            ReviewSession.created_at < datetime.utcnow() - SESSION_TTL
+        )
+    )
+    session_id = db.execute(
+        insert(ReviewSession)
+        .values(user_id=user_id, card_ids=queue, position=0)
+        .returning(ReviewSession.id)
+    ).scalar_one()
+
+    return {
+        "id": session_id,
+        "total": len(queue),
+        "learning": len(candidates["learning"]),
+        "review": len(candidates["review"]),
+        "new": len(candidates["new"]),
+    }
+
+
+# position を進めつつ、進める前後の間にあるカード ID を返す（行ロックで同時取得でも重複しない）
+NEXT_SQL = text("""
+    UPDATE review_sessions AS s
+    SET position = least(s.position + :n, cardinality(s.card_ids))
+    FROM (
+        SELECT id, position FROM review_sessions
+        WHERE id = :session_id AND user_id = :user_id
+        FOR UPDATE
+    ) AS old
+    WHERE s.id = old.id
+    RETURNING s.card_ids[old.position + 1 : s.position] AS card_ids,
+              cardinality(s.card_ids) - s.position AS remaining
+""").columns(card_ids=ARRAY(PG_UUID(as_uuid=True)), remaining=Integer)
+
+
+def next_cards(db: Session, user_id: UUID, session_id: UUID, n: int) -> Optional[tuple[list[dict], int]]:
+    """
+    次の n 枚を返して position を進める。セッションがなければ None
+    Returns: (カード, 残り枚数)
+    """
+    row = db.execute(NEXT_SQL, {"n": n, "session_id": session_id, "user_id": user_id}).first()
+    if row is None:
+        return None
+
+    card_ids = row.card_ids or []
+    if not card_ids:
+        return [], row.remaining
+
+    # 主キーでの取得のみ。削除済みのカードは飛ばす
+    result = db.execute(
+        select(*CARD_OUT_COLUMNS).where(Card.id.in_(set(card_ids)), Card.user_id == user_id)
+    )
+    keys = list(result.keys())
+    by_id = {r.id: dict(zip(keys, r)) for r in result}
+    return [by_id[card_id] for card_id in card_ids if card_id in by_id], row.remaining
+
+
+REQUEUE_SQL = text("""
+    UPDATE review_sessions
+    SET card_ids = card_ids[1 : position + :after]
+                   || CAST(:card_id AS uuid)
+                   || card_ids[position + :after + 1 :]
+    WHERE id = :session_id AND user_id = :user_id
+""")
+
+
+def requeue(db: Session, user_id: UUID, session_id: UUID, card_id: UUID) -> None:
+    """Again のカードをキューの少し先に差し込む"""
+    db.execute(REQUEUE_SQL, {
+        "after": REQUEUE_AFTER, "card_id": card_id, "session_id": session_id, "user_id": user_id,
+    })
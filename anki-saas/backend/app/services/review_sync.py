@@ -0,0 +1,245 @@
+"""
+オフライン復習の同期（POST /review/sync）
+
+端末はオフライン中の復習を操作ログ（op_id = 端末が生成する冪等キー, card_id, rating, reviewed_at）
+として溜め、接続時にまとめて送る。サーバーは
+  1. users の行をロックし（同じユーザーの同期は直列になる）、applied_ops に既にある op_id を duplicate にする
+  2. 対象カードを FOR UPDATE で1回だけ読み、reviewed_at 順に SM-2 を畳み込む（replay は純粋関数）。
+     カードの last_reviewed_at より前の操作は、その後のオンラインの復習で状態が変わっているので
+     今の状態に重ねず rejected として返す
+  3. 適用する操作だけを applied_ops に入れる（rejected は入れないので、再送しても rejected のまま）
+  4. カードの最終状態・復習ログ・due_counts をそれぞれ1文で書く
+  5. since トークン以降にサーバー側で変わったカードと削除されたカードを返す
+
+復習ログは write-behind バッファの設定に関わらず同じトランザクションで書く（既に1文にまとまっている）。
+applied_ops と card_tombstones は RETENTION_DAYS 日で消すので、それより古い操作は受け付けず、
+それより古いトークンには全件（full）を返す。
+"""
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.orm import Session
+
+from app import realtime
+from app.ids import uuid7
+from app.models import AppliedOp, Card, CardTombstone
+from app.responses import rows_as_dicts
+from app.services import due_counts, review_session
+from app.services.card_store import CARD_OUT_COLUMNS
+from app.services.card_version import bump_card_version
+from app.services.review_log_buffer import INSERT_SQL, insert_params
+from app.services.sm2 import calculate_sm2
+
+
+MAX_SYNC_OPS = 1000
+RETENTION_DAYS = 30
+# 同時に走っていたトランザクションのコミット遅れと時計のずれを拾うため、前回のトークンより少し前から返す
+# （updated_at を SQL で書くところは now() = トランザクション開始時刻ではなく clock_timestamp() を使い、
+#   長いトランザクションでもコミットとの差がこの幅に収まるようにする）
+TOKEN_OVERLAP = timedelta(minutes=1)
+
+SYNC_CARD_COLUMNS = (*CARD_OUT_COLUMNS, Card.repetitions, Card.ease_factor, Card.interval)
+
+_EPOCH = datetime(1970, 1, 1)
+
+CLAIM_SQL = text("""
+    INSERT INTO applied_ops (user_id, op_id)
+    SELECT :user_id, unnest(CAST(:op_ids AS uuid[]))
+    ON CONFLICT DO NOTHING
+    RETURNING op_id
+""")
+
+APPLY_SQL = text("""
+    UPDATE cards AS c
+    SET repetitions = v.repetitions, ease_factor = v.ease_factor, interval = v.interval,
+        next_review = v.next_review, last_reviewed_at = v.last_reviewed_at,
+        updated_at = timezone('utc', clock_timestamp())
+    FROM unnest(
+        CAST(:ids AS uuid[]), CAST(:repetitions AS integer[]), CAST(:ease_factors AS float8[]),
+        CAST(:intervals AS integer[]), CAST(:next_reviews AS date[]), CAST(:last_reviewed_at AS timestamp[])
+    ) AS v(id, repetitions, ease_factor, interval, next_review, last_reviewed_at)
+    WHERE c.id = v.id
+""")
+
+
+@dataclass
+class SyncOp:
+    op_id: UUID
+    card_id: UUID
+    rating: int
+    reviewed_at: datetime  # UTC（naive）
+
+
+@dataclass
+class CardState:
+    repetitions: int
+    ease_factor: float
+    interval: int
+    next_review: date
+
+
+@dataclass
+class SyncResult:
+    applied: list[UUID] = field(default_factory=list)
+    duplicate: list[UUID] = field(default_factory=list)  # 適用済みの op_id
+    # 存在しないカード・保持期間より古い操作・カードの最後の復習より前の操作
+    rejected: list[UUID] = field(default_factory=list)
+
+
+def encode_token(at: datetime) -> str:
+    return str((at - _EPOCH) // timedelta(microseconds=1))
+
+
+def decode_token(token: str) -> datetime:
+    """不正なトークンは ValueError"""
+    return _EPOCH + timedelta(microseconds=int(token))
+
+
+def to_utc(at: datetime, now: datetime) -> datetime:
+    """端末の時刻を naive UTC にそろえる。未来の時刻（端末の時計のずれ）は now に丸める"""
+    if at.tzinfo is not None:
+        at = at.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(at, now)
+
+
+def replay(states: dict[UUID, CardState], ops: list[SyncOp]) -> dict[UUID, CardState]:
+    """ops を reviewed_at 順に SM-2 で畳み込み、変わったカードの最終状態を返す（states は変更しない）"""
+    final: dict[UUID, CardState] = {}
+    for op in sorted(ops, key=lambda o: (o.reviewed_at, o.op_id)):
+        state = final.get(op.card_id) or states[op.card_id]
+        result = calculate_sm2(
+            rating=op.rating,
+            repetitions=state.repetitions,
+            ease_factor=state.ease_factor,
+            interval=state.interval,
+            review_date=op.reviewed_at.date()
+        )
+        final[op.card_id] = CardState(result.repetitions, result.ease_factor, result.interval, result.next_review)
+    return final
+
+
+def apply_ops(db: Session, user_id: UUID, ops: list[SyncOp], now: datetime) -> SyncResult:
+    result = SyncResult()
+    horizon = now - timedelta(days=RETENTION_DAYS)
+
+    fresh: dict[UUID, SyncOp] = {}
+    for op in ops:
+        if op.reviewed_at < horizon:
+            result.rejected.append(op.op_id)
+        elif op.op_id in fresh:
+            result.duplicate.append(op.op_id)
+        else:
+            fresh[op.op_id] = op
+    if not fresh:
+        return result
+
+    bump_card_version(db, user_id)
+    # 適用済みかどうかを先に見る（適用済みの操作は last_reviewed_at より前になり得るが rejected ではない）
+    seen = set(db.execute(
+        select(AppliedOp.op_id).where(AppliedOp.user_id == user_id, AppliedOp.op_id.in_(list(fresh)))
+    ).scalars())
+    new_ops = []
+    for op_id, op in fresh.items():
+        if op_id in seen:
+            result.duplicate.append(op_id)
+        else:
+            new_ops.append(op)
+    if not new_ops:
+        return result
+
+    # users の行は bump_card_version でロック済み。cards も id 順に取る
+    rows = db.execute(
+        select(Card.id, Card.repetitions, Card.ease_factor, Card.interval, Card.next_review, Card.last_reviewed_at)
+        .where(Card.user_id == user_id, Card.id.in_({op.card_id for op in new_ops}))
+        .order_by(Card.id)
+        .with_for_update()
+    ).all()
+    states = {
+        row.id: CardState(row.repetitions or 0, row.ease_factor or 2.5, row.interval or 0, row.next_review)
+        for row in rows
+    }
+
+    last_reviewed = {row.id: row.last_reviewed_at for row in rows}
+
+    applicable = []
+    for op in new_ops:
+        if op.card_id not in states:
+            result.rejected.append(op.op_id)
+        elif last_reviewed[op.card_id] is not None and op.reviewed_at < last_reviewed[op.card_id]:
+            # オフライン中に別の端末やオンラインで復習済み。古い操作を新しい状態に重ねない
+            result.rejected.append(op.op_id)
+        else:
+            applicable.append(op)
+    if not applicable:
+        return result
+
+    # users の行ロックで直列になっているので通常は全件入る。入らなかったものは適用済みとして扱う
+    claimed = set(db.execute(CLAIM_SQL, {"user_id": user_id, "op_ids": [op.op_id for op in applicable]}).scalars())
+    result.duplicate.extend(op.op_id for op in applicable if op.op_id not in claimed)
+    applicable = [op for op in applicable if op.op_id in claimed]
+    if not applicable:
+        return result
+
+    final = replay(states, applicable)
+    ids = list(final)
+    latest: dict[UUID, datetime] = {}
+    for op in applicable:
+        latest[op.card_id] = max(latest.get(op.card_id, op.reviewed_at), op.reviewed_at)
+    db.execute(APPLY_SQL, {
+        "ids": ids,
+        "repetitions": [final[i].repetitions for i in ids],
+        "ease_factors": [final[i].ease_factor for i in ids],
+        "intervals": [final[i].interval for i in ids],
+        "next_reviews": [final[i].next_review for i in ids],
+        "last_reviewed_at": [latest[i] for i in ids],
+    })
+    db.execute(INSERT_SQL, insert_params([
+        {"id": uuid7(), "user_id": user_id, "card_id": op.card_id, "rating": op.rating, "reviewed_at": op.reviewed_at}
+        for op in sorted(applicable, key=lambda o: (o.reviewed_at, o.op_id))
+    ]))
+
+    deltas: Counter = Counter()
+    for card_id, state in final.items():
+        deltas.update(due_counts.moved(states[card_id].next_review, state.next_review))
+    due_counts.adjust(db, user_id, deltas)
+    # 1日の上限用。カードごとに最初の操作の日に、同期前の状態で新規・復習を数える
+    first_ops: dict[UUID, SyncOp] = {}
+    for op in sorted(applicable, key=lambda o: (o.reviewed_at, o.op_id)):
+        first_ops.setdefault(op.card_id, op)
+    review_session.record_studied(db, user_id, review_session.count_kinds(
+        (op.reviewed_at.date(), review_session.study_kind(states[card_id].interval, states[card_id].repetitions))
+        for card_id, op in first_ops.items()
+    ))
+    realtime.publish(db, user_id, "card.reviewed", ids)
+
+    result.applied = [op.op_id for op in applicable]
+    return result
+
+
+def changes(db: Session, user_id: UUID, since: Optional[datetime], now: datetime) -> tuple[list[dict], list[UUID], bool]:
+    """(変わったカード, 削除されたカード ID, 全件か)。since が無いか保持期間より古ければ全件"""
+    full = since is None or since < now - timedelta(days=RETENTION_DAYS)
+    stmt = select(*SYNC_CARD_COLUMNS).where(Card.user_id == user_id)
+    if full:
+        return rows_as_dicts(db.execute(stmt.order_by(Card.id))), [], True
+
+    after = since - TOKEN_OVERLAP
+    cards = rows_as_dicts(db.execute(
+        stmt.where(Card.updated_at > after).order_by(Card.updated_at, Card.id)
+    ))
+    deleted = list(db.execute(
+        select(CardTombstone.card_id)
+        .where(CardTombstone.user_id == user_id, CardTombstone.deleted_at > after)
+    ).scalars())
+    return cards, deleted, False
+
+
+def purge(db: Session, user_id: UUID, now: datetime) -> None:
+    """保持期間を過ぎた冪等キーと削除記録を消す"""
+    horizon = now - timedelta(days=RETENTION_DAYS)
+    db.execute(delete(AppliedOp).where(AppliedOp.user_id == user_id, AppliedOp.applied_at < horizon))
+    db.execute(delete(CardTombstone).where(CardTombstone.user_id == user_id, CardTombstone.deleted_at < horizon))
@@ -0,0 +1,147 @@
+"""
+復習量のモンテカルロシミュレーション（DB の容量計画用）
+
+N ユーザー × カード枚数の SM-2 状態を numpy の配列で持ち、1日ずつ進める。
+その日に期限が来たカードだけを取り出して sm2_step でまとめて更新するので、
+100万枚 × 365日でも数秒で終わる。
+
+sm2_step は app.services.sm2.calculate_sm2 と同じ計算をベクトル化したもの。
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+
+
+# 0=Again, 1=Hard, 2=Good, 3=Easy の出現確率
+DEFAULT_RATING_PROBS = (0.10, 0.10, 0.65, 0.15)
+
+# 最終日の interval（日数）の分布を出す区切り
+INTERVAL_BINS = (0, 1, 2, 7, 21, 61, 181, 366)
+INTERVAL_LABELS = ("new", "1", "2-6", "7-20", "21-60", "61-180", "181-365", "366+")
+
+
+def sm2_step(
+    rating: np.ndarray,
+    repetitions: np.ndarray,
+    ease_factor: np.ndarray,
+    interval: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    calculate_sm2 の配列版
+    Returns: (repetitions, ease_factor, interval)
+    """
+    passed = rating >= 2
+    grown = np.where(
+        repetitions == 0, 1,
+        np.where(repetitions == 1, 6, np.round(interval * ease_factor))
+    )
+    new_interval = np.where(passed, grown, 1)
+    new_repetitions = np.where(passed, repetitions + 1, 0)
+
+    q = rating + 2
+    new_ease = np.maximum(1.3, ease_factor + (0.1 - (5 - q) * (0.08 + (5 - q) * 0.02)))
+
+    new_interval = np.where(rating == 3, np.round(new_interval * 1.3), new_interval)
+
+    return new_repetitions, np.round(new_ease, 2), new_interval.astype(np.int64)
+
+
+@dataclass
+class SimulationResult:
+    users: int
+    cards: int
+    days: int
+    daily_reviews: np.ndarray  # 日ごとの復習回数（新規を含む）
+    daily_new: np.ndarray  # 日ごとの初回学習枚数
+    interval_histogram: dict[str, int] = field(default_factory=dict)
+    mean_ease: float = 0.0
+
+    @property
+    def total_reviews(self) -> int:
+        return int(self.daily_reviews.sum())
+
+    def log_rows(self) -> np.ndarray:
+        """review_logs の累積行数（1回の復習 = 1行）"""
+        return np.cumsum(self.daily_reviews)
+
+    def to_dict(self, bytes_per_log: int = 0) -> dict:
+        result = {
+            "users": self.users,
+            "cards": self.cards,
+            "days": self.days,
+            "total_reviews": self.total_reviews,
+            "daily_reviews": self.daily_reviews.tolist(),
+            "daily_new": self.daily_new.tolist(),
+            "review_log_rows": self.log_rows().tolist(),
+            "peak_daily_reviews": int(self.daily_reviews.max(initial=0)),
+            "mean_daily_reviews": round(float(self.daily_reviews.mean()), 1) if self.days else 0.0,
+            "interval_histogram": self.interval_histogram,
+            "mean_ease": self.mean_ease,
+        }
+        if bytes_per_log:
+            result["review_log_bytes"] = self.total_reviews * bytes_per_log
+        return result
+
+
+def simulate(
+    users: int,
+    cards_per_user: int,
+    days: int,
+    new_per_day: int = 20,
+    rating_probs: tuple[float, float, float, float] = DEFAULT_RATING_PROBS,
+    skip_prob: float = 0.0,
+    seed: int = 0
+) -> SimulationResult:
+    """
+    users: ユーザー数
+    cards_per_user: 1人あたりのカード枚数（1日 new_per_day 枚ずつ学習を始める）
+    rating_probs: 各評価の確率（合計 1）
+    skip_prob: ユーザーがその日の復習をしない確率（休むと期限切れが溜まる）
+    """
+    rng = np.random.default_rng(seed)
+    probs = np.asarray(rating_probs, dtype=float)
+    probs = probs / probs.sum()
+
+    n = users * cards_per_user
+    owner = np.repeat(np.arange(users), cards_per_user)
+    # 各ユーザーの k 枚目は k // new_per_day 日目に初めて出る
+    due_day = np.tile(np.arange(cards_per_user) // max(new_per_day, 1), users)
+    repetitions = np.zeros(n, dtype=np.int64)
+    interval = np.zeros(n, dtype=np.int64)
+    ease = np.full(n, 2.5)
+    started = np.zeros(n, dtype=bool)
+
+    daily_reviews = np.zeros(days, dtype=np.int64)
+    daily_new = np.zeros(days, dtype=np.int64)
+
+    for day in range(days):
+        due = due_day <= day
+        if skip_prob:
+            studying = rng.random(users) >= skip_prob
+            due &= studying[owner]
+        idx = np.flatnonzero(due)
+        if idx.size == 0:
+            continue
+
+        rating = rng.choice(4, size=idx.size, p=probs)
+        repetitions[idx], ease[idx], interval[idx] = sm2_step(
+            rating, repetitions[idx], ease[idx], interval[idx]
+        )
+        due_day[idx] = day + interval[idx]
+
+        daily_reviews[day] = idx.size
+        daily_new[day] = np.count_nonzero(~started[idx])
+        started[idx] = True
+
+    # 一度も出ていないカードは new として数える
+    binned = np.digitize(np.where(started, interval, 0), INTERVAL_BINS[1:])
+    counts = np.bincount(binned, minlength=len(INTERVAL_LABELS))
+    return SimulationResult(
+        users=users,
+        cards=n,
+        days=days,
+        daily_reviews=daily_reviews,
+        daily_new=daily_new,
+        interval_histogram={label: int(c) for label, c in zip(INTERVAL_LABELS, counts)},
+        mean_ease=round(float(ease[started].mean()), 3) if started.any() else 2.5,
+    )
@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from datetime import date, timedelta
+from typing import Optional
 
 
 @dataclass
@@ -14,7 +15,8 @@ def calculate_sm2(
     rating: int,
     repetitions: int,
     ease_factor: float,
-    interval: int
+    interval: int,
+    review_date: Optional[date] = None
 ) -> SM2Result:
     """
     SM-2 アルゴリズム実装
@@ -23,6 +25,7 @@ def calculate_sm2(
     repetitions: 連続正解回数
     ease_factor: 難易度係数 (1.3以上)
     interval: 次回までの日数
+    review_date: 復習した日（オフライン同期の再生用、省略時は今日）
 
     Returns: SM2Result with updated values
     """
@@ -46,7 +49,7 @@ def calculate_sm2(
     if rating == 3:
         interval = round(interval * 1.3)
 
-    next_review = date.today() + timedelta(days=interval)
+    next_review = (review_date or date.today()) + timedelta(days=interval)
 
     return SM2Result(
         repetitions=repetitions,
@@ -1,7 +1,23 @@
+import hashlib
 import json
+import logging
+import os
 import re
+import threading
+from typing import Optional
 
+from app import shared_cache
+from app.config import settings
+from app.metrics import WORD_LOOKUPS
 from app.services.claude import chat_with_claude
+from app.services.dictionary import MmapDictionary, normalize_key
+
+
+logger = logging.getLogger("app.word_lookup")
+
+_dictionary: Optional[MmapDictionary] = None
+_dictionary_loaded = False
+_dictionary_lock = threading.Lock()
 
 
 LOOKUP_PROMPT = """あなたは英語学習アシスタントです。
@@ -22,10 +38,51 @@ LOOKUP_PROMPT = """あなたは英語学習アシスタントです。
 """
 
 
-def lookup_word(word: str, context: str = None) -> dict:
+def get_dictionary() -> Optional[MmapDictionary]:
+    """初回の検索時に辞書を map する。ファイルが無ければ None（Claude だけで引く）"""
+    global _dictionary, _dictionary_loaded
+    if not _dictionary_loaded:
+        with _dictionary_lock:
+            if not _dictionary_loaded:
+                if os.path.exists(settings.dictionary_path):
+                    _dictionary = MmapDictionary(settings.dictionary_path)
+                    logger.info("loaded %d dictionary entries from %s", len(_dictionary), settings.dictionary_path)
+                else:
+                    logger.info("no dictionary at %s; lookups go to Claude", settings.dictionary_path)
+                _dictionary_loaded = True
+    return _dictionary
+
+
+def cache_key(word: str, context: Optional[str]) -> str:
+    """文脈つきで Claude に聞いた結果はその文脈でしか使えないので、文脈のハッシュもキーに入れる"""
+    key = f"lookup:{normalize_key(word)}"
+    if context and context.strip():
+        digest = hashlib.blake2b(normalize_key(context).encode("utf-8"), digest_size=8).hexdigest()
+        key = f"{key}:{digest}"
+    return key
+
+
+def lookup_word(word: str, context: str = None, contextual: bool = False) -> dict:
     """
-    単語の意味を Claude API で取得
+    単語の意味を取得
+    ローカル辞書（活用形は見出し語に戻す）にあればそれを返し、無いとき・
+    文脈に合った意味（contextual）を求められたときだけ Claude API を呼ぶ
+    辞書に無い語の Claude の結果はワーカー間の共有キャッシュに置き、どのワーカーでも使い回す
     """
+    cache = None
+    if not contextual:
+        dictionary = get_dictionary()
+        entry = dictionary.lookup(word) if dictionary is not None else None
+        if entry is not None:
+            WORD_LOOKUPS.labels("dictionary").inc()
+            return {**entry, "source": "dictionary"}
+        cache = shared_cache.get_cache()
+        cached = cache.get(cache_key(word, context)) if cache is not None else None
+        if cached is not None:
+            WORD_LOOKUPS.labels("cache").inc()
+            return cached
+
+    WORD_LOOKUPS.labels("claude").inc()
     context_line = f"文脈: {context}" if context else ""
     prompt = LOOKUP_PROMPT.format(word=word, context_line=context_line)
 
@@ -36,12 +93,16 @@ def lookup_word(word: str, context: str = None) -> dict:
     if json_match:
         try:
             data = json.loads(json_match.group())
-            return {
+            result = {
                 "word": data.get("word", word),
                 "meaning": data.get("meaning", ""),
                 "pronunciation": data.get("pronunciation"),
-                "example": data.get("example")
+                "example": data.get("example"),
+                "source": "claude"
             }
+            if cache is not None:
+                cache.set(cache_key(word, context), result, settings.lookup_cache_ttl_s)
+            return result
         except json.JSONDecodeError:
             pass
 
@@ -50,5 +111,6 @@ def lookup_word(word: str, context: str = None) -> dict:
         "word": word,
         "meaning": response.strip(),
         "pronunciation": None,
-        "example": None
+        "example": None,
+        "source": "claude"
     }
@@ -0,0 +1,102 @@
+"""
+同じホストのワーカー間で共有するキャッシュ（/dev/shm 上の SQLite）
+
+gunicorn で複数ワーカーを動かすと、プロセス内のキャッシュはワーカーの数だけ別々に
+温まり、そのぶん DB や Claude API への問い合わせが増える。ここに置いた値は
+全ワーカーから見えるので、ワーカーを増やしてもヒット率は変わらない。
+
+/dev/shm（tmpfs）に置けばディスクに書かず、1回の読み書きは数十マイクロ秒で済む。
+SQLite のファイルロックでプロセス間の排他を取る（WAL なので読み込みは書き込みを待たない）。
+キャッシュなので、読み書きに失敗したらミスとして扱いリクエストは失敗させない。
+
+SHARED_CACHE_PATH が空ならキャッシュしない（gunicorn.conf.py が既定値を入れる）。
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+import orjson
+
+from app.config import settings
+
+
+logger = logging.getLogger("app.shared_cache")
+
+PURGE_EVERY = 1000  # この回数の set ごとに期限切れの行を消す
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+
+class SharedCache:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._sets = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # SQLite の接続はスレッド間・fork をまたいで使えないので、スレッドとプロセスごとに開く
+        pid = os.getpid()
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != pid:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=OFF")  # tmpfs なので fsync しても意味がない
+            self._local.conn, self._local.pid = conn, pid
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            row = self._conn().execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        except sqlite3.Error:
+            logger.warning("shared cache read failed", exc_info=True)
+            return None
+        return orjson.loads(row[0]) if row is not None else None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, orjson.dumps(value), now + ttl),
+            )
+            self._sets += 1
+            if self._sets % PURGE_EVERY == 0:
+                conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+        except sqlite3.Error:
+            logger.warning("shared cache write failed", exc_info=True)
+
+    def delete(self, key: str) -> None:
+        try:
+            self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+        except sqlite3.Error:
+            logger.warning("shared cache delete failed", exc_info=True)
+
+
+_cache: Optional[SharedCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[SharedCache]:
+    global _cache
+    if not settings.shared_cache_path:
+        return None
+    if _cache is None or _cache.path != settings.shared_cache_path:
+        with _cache_lock:
+            if _cache is None or _cache.path != settings.shared_cache_path:
+                _cache = SharedCache(settings.shared_cache_path)
+    return _cache
@@ -0,0 +1,9 @@
+"""
+gunicorn 用の uvicorn ワーカー（gunicorn.conf.py から使う）
+"""
+from uvicorn_worker import UvicornWorker as _UvicornWorker
+
+
+class UvicornWorker(_UvicornWorker):
+    # uvicorn 単体で動かすときの --ws-per-message-deflate false と同じ
+    CONFIG_KWARGS = {**_UvicornWorker.CONFIG_KWARGS, "ws_per_message_deflate": False}
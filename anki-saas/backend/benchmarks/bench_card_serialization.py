@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+カード一覧のシリアライズ比較ベンチマーク
+
+旧: ORM の Card を生成 → CardOut.model_validate → response_model で再検証
+新: 列だけの行 → FastJSONResponse（orjson で1回だけシリアライズ）
+
+DB を使わずにシリアライズ部分だけを比較するため、行データはメモリ上で作る。
+Usage: python benchmarks/bench_card_serialization.py [--cards 10000] [--repeat 20]
+"""
+import argparse
+import statistics
+import sys
+import time
+import uuid
+from datetime import date, datetime
+
+sys.path.insert(0, '.')
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.models import Card
+from app.responses import FastJSONResponse
+from app.schemas import CardOut
+
+
+COLUMNS = ("id", "card_type", "front", "back", "next_review", "created_at")
+
+
+def make_rows(n: int) -> list[tuple]:
+    return [
+        (uuid.uuid4(), "vocab", f"word {i}", f"意味 {i}", date.today(), datetime.utcnow())
+        for i in range(n)
+    ]
+
+
+def build_app(rows: list[tuple]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/orm", response_model=list[CardOut])
+    def orm_path():
+        # DB から ORM オブジェクトを作るのと同等のコスト
+        cards = [Card(**dict(zip(COLUMNS, row))) for row in rows]
+        return [CardOut.model_validate(c) for c in cards]
+
+    @app.get("/fast", response_model=list[CardOut])
+    def fast_path():
+        return FastJSONResponse([dict(zip(COLUMNS, row)) for row in rows])
+
+    return app
+
+
+def measure(client: TestClient, path: str, repeat: int) -> tuple[float, int]:
+    client.get(path)  # warm up
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(path)
+        timings.append(time.perf_counter() - start)
+        size = len(response.content)
+    return statistics.median(timings), size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    client = TestClient(build_app(make_rows(args.cards)))
+
+    orm_time, orm_size = measure(client, "/orm", args.repeat)
+    fast_time, fast_size = measure(client, "/fast", args.repeat)
+
+    print(f"cards: {args.cards}")
+    print(f"ORM + model_validate + response_model: {orm_time * 1000:8.1f} ms  ({orm_size} bytes)")
+    print(f"Core rows + orjson:                    {fast_time * 1000:8.1f} ms  ({fast_size} bytes)")
+    print(f"speedup: {orm_time / fast_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
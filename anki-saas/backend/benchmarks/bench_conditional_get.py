@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+ETag / 304 と gzip による転送量・クエリ数の削減を測るベンチマーク
+
+フロントエンドのポーリングを模して /cards を繰り返し取得し、
+  1. 毎回全件取得（従来）
+  2. gzip のみ
+  3. If-None-Match + gzip（変更は --change-every 回に1回）
+の転送バイト数とカード読み込みクエリ数を比較する。
+DB はメモリ上の行を返すスタブで置き換える。
+
+Usage: python benchmarks/bench_conditional_get.py [--cards 2000] [--polls 100] [--change-every 20]
+"""
+import argparse
+import sys
+import uuid
+from datetime import date, datetime
+
+sys.path.insert(0, '.')
+
+from fastapi.testclient import TestClient
+
+from app.database import get_db
+from app.deps import get_current_user
+from app.main import app
+from app.models import User
+
+
+class StubResult:
+    def __init__(self, keys, rows):
+        self._keys = keys
+        self._rows = rows
+
+    def keys(self):
+        return self._keys
+
+    def __iter__(self):
+        return iter(self._rows)
+
+
+class StubSession:
+    KEYS = ["id", "card_type", "front", "back", "next_review", "created_at"]
+
+    def __init__(self, n_cards: int):
+        self.rows = [
+            (uuid.uuid4(), "vocab", f"word {i}", f"意味 {i}", date.today(), datetime.utcnow())
+            for i in range(n_cards)
+        ]
+        self.queries = 0
+
+    def execute(self, *args, **kwargs):
+        self.queries += 1
+        return StubResult(self.KEYS, self.rows)
+
+
+def run(client, session, user, polls, change_every, conditional, gzip):
+    session.queries = 0
+    transferred = 0
+    etag = None
+    for i in range(polls):
+        if change_every and i and i % change_every == 0:
+            user.card_version += 1  # 別の端末でカードが変更された
+        headers = {"X-API-Key": "bench", "Accept-Encoding": "gzip" if gzip else "identity"}
+        if conditional and etag:
+            headers["If-None-Match"] = etag
+        response = client.get("/cards", headers=headers)
+        etag = response.headers.get("etag")
+        # TestClient は展開済みの本文を返すので、圧縮後のサイズはヘッダーから取る
+        transferred += int(response.headers.get("content-length", len(response.content)))
+    return transferred, session.queries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=2000)
+    parser.add_argument("--polls", type=int, default=100)
+    parser.add_argument("--change-every", type=int, default=20)
+    args = parser.parse_args()
+
+    session = StubSession(args.cards)
+    user = User(id=uuid.uuid4(), card_version=0)
+    app.dependency_overrides[get_db] = lambda: session
+    app.dependency_overrides[get_current_user] = lambda: user
+    client = TestClient(app)
+
+    scenarios = [
+        ("full download", False, False),
+        ("gzip", False, True),
+        ("ETag + gzip", True, True),
+    ]
+    baseline = None
+    print(f"cards: {args.cards}, polls: {args.polls}, change every {args.change_every} polls")
+    for name, conditional, gzip in scenarios:
+        transferred, queries = run(client, session, user, args.polls, args.change_every, conditional, gzip)
+        baseline = baseline or transferred
+        print(f"{name:14s} {transferred / 1024:10.1f} KiB ({transferred / baseline:6.1%})  card queries: {queries}")
+
+    app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    main()
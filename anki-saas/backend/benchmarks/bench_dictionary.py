@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+ローカル辞書（MmapDictionary）の検索速度を測るベンチマーク
+
+一時ファイルに --entries 語のインデックスを書き、見出し語の完全一致（get）と
+活用形からの検索（lookup）を1回あたりのマイクロ秒で表示する。
+数十万語でも1回数マイクロ秒〜数十マイクロ秒に収まるのが目安。
+
+Usage: python benchmarks/bench_dictionary.py [--entries 100000] [--lookups 100000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, '.')
+
+from app.services.dictionary import MmapDictionary, write_index
+
+
+def per_call_us(fn, words: list[str]) -> float:
+    start = time.perf_counter()
+    for word in words:
+        fn(word)
+    return (time.perf_counter() - start) / len(words) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.idx")
+        write_index(((f"word{i:07d}", f"意味{i}", None, None) for i in range(args.entries)), path)
+        dictionary = MmapDictionary(path)
+
+        rng = random.Random(0)
+        hits = [f"word{rng.randrange(args.entries):07d}" for _ in range(args.lookups)]
+        inflected = [f"{word}s" for word in hits]
+        misses = [f"missing{i}" for i in range(args.lookups)]
+
+        per_call_us(dictionary.get, hits[:1000])  # ページキャッシュを温める
+        print(f"entries: {len(dictionary)}  index: {os.path.getsize(path) / 1e6:.1f} MB")
+        print(f"get (hit):        {per_call_us(dictionary.get, hits):8.2f} µs")
+        print(f"get (miss):       {per_call_us(dictionary.get, misses):8.2f} µs")
+        print(f"lookup (plural):  {per_call_us(dictionary.lookup, inflected):8.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
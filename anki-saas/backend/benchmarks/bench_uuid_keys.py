@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+UUIDv4 と UUIDv7 の主キーで INSERT の速度・インデックスサイズ・WAL 量を比べるベンチマーク
+
+ローカルの PostgreSQL（DATABASE_URL）に一時的なテーブルを作り、
+cards と同じく uuid の主キーを持つ行を batch ごとに INSERT する。
+--existing で先に行を入れておくと、インデックスがキャッシュに収まらない状況に近づく。
+
+Usage: python benchmarks/bench_uuid_keys.py [--rows 1000000] [--existing 1000000] [--batch 1000]
+"""
+import argparse
+import sys
+import time
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, '.')
+
+from psycopg2.extras import execute_values
+
+from app.database import engine
+from app.ids import uuid7
+
+
+GENERATORS = {"v4": uuid.uuid4, "v7": uuid7}
+
+
+def insert_rows(cursor, table: str, make_id, n: int, batch: int) -> None:
+    now = datetime.utcnow()
+    user_id = uuid.uuid4()
+    for start in range(0, n, batch):
+        rows = [(make_id(), user_id, f"word {start + i}", now) for i in range(min(batch, n - start))]
+        execute_values(cursor, f"INSERT INTO {table} (id, user_id, front, created_at) VALUES %s", rows)
+
+
+def run(conn, kind: str, args) -> dict:
+    table = f"bench_uuid_{kind}"
+    make_id = GENERATORS[kind]
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(f"""
+            CREATE TABLE {table} (
+                id uuid PRIMARY KEY,
+                user_id uuid NOT NULL,
+                front text NOT NULL,
+                created_at timestamp NOT NULL
+            )
+        """)
+        conn.commit()
+
+        insert_rows(cursor, table, make_id, args.existing, args.batch)
+        conn.commit()
+        cursor.execute("CHECKPOINT")
+
+        cursor.execute("SELECT pg_current_wal_lsn()")
+        wal_start = cursor.fetchone()[0]
+        start = time.perf_counter()
+        insert_rows(cursor, table, make_id, args.rows, args.batch)
+        conn.commit()
+        elapsed = time.perf_counter() - start
+
+        cursor.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s)", (wal_start,))
+        wal_bytes = int(cursor.fetchone()[0])
+        cursor.execute("SELECT pg_relation_size(%s), pg_relation_size(%s)", (table, f"{table}_pkey"))
+        table_size, index_size = cursor.fetchone()
+
+        if not args.keep:
+            cursor.execute(f"DROP TABLE {table}")
+            conn.commit()
+
+    return {
+        "rows_per_s": args.rows / elapsed,
+        "elapsed": elapsed,
+        "wal_mib": wal_bytes / 1024 ** 2,
+        "table_mib": table_size / 1024 ** 2,
+        "index_mib": index_size / 1024 ** 2,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000, help="計測する INSERT の行数")
+    parser.add_argument("--existing", type=int, default=1_000_000, help="計測前に入れておく行数")
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--keep", action="store_true", help="テーブルを残す（pgstattuple などで調べる用）")
+    args = parser.parse_args()
+
+    conn = engine.raw_connection()
+    try:
+        print(f"existing rows: {args.existing}, inserted rows: {args.rows}, batch: {args.batch}")
+        print(f"{'key':4s} {'rows/s':>10s} {'WAL MiB':>9s} {'table MiB':>10s} {'pkey MiB':>9s}")
+        results = {}
+        for kind in GENERATORS:
+            results[kind] = r = run(conn, kind, args)
+            print(f"{kind:4s} {r['rows_per_s']:10,.0f} {r['wal_mib']:9.1f} {r['table_mib']:10.1f} {r['index_mib']:9.1f}")
+        print(f"v7 / v4: {results['v7']['rows_per_s'] / results['v4']['rows_per_s']:.2f}x throughput, "
+              f"{results['v7']['index_mib'] / results['v4']['index_mib']:.2f}x index size")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
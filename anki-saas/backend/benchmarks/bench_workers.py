@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+gunicorn のワーカー数を増やしたときのスループットの伸びを測るベンチマーク
+
+gunicorn.conf.py の設定のまま WEB_CONCURRENCY を 1, 2, 4, 8 と変えて起動し、
+DB だけを読むルート（/review/due/count・/review/forecast）に一定の同時接続数で
+リクエストを送り続け、1秒あたりの成功数とワーカー1個のときに対する効率を表示する。
+認証は共有キャッシュ（/dev/shm）に載るので、ワーカーを増やしても api_keys は引き直さない。
+
+負荷をかける側もCPUを使うので、サーバーは taskset で先頭のコアに固定し、
+クライアント（--clients プロセス）は残りのコアで動かす。コアが足りないときは警告する。
+
+前提: benchmarks/load/seed.py でデータを入れた PostgreSQL（DATABASE_URL）
+Usage: python benchmarks/bench_workers.py [--workers 1,2,4,8] [--users 1000] [--duration 20]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, 'benchmarks/load')
+
+from seed import api_key_for
+
+
+ROUTES = ("/review/due/count", "/review/forecast?days=7")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(base_url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def drive(base_url: str, users: int, concurrency: int, warmup: float, duration: float, seed: int) -> tuple[int, int]:
+    """warmup 秒後から duration 秒間の (成功数, 失敗数)"""
+    rng = random.Random(seed)
+    start = time.monotonic() + warmup
+    deadline = start + duration
+    ok = failed = 0
+
+    async def loop(client: httpx.AsyncClient) -> None:
+        nonlocal ok, failed
+        while (now := time.monotonic()) < deadline:
+            key = api_key_for(rng.randrange(users))
+            try:
+                response = await client.get(rng.choice(ROUTES), headers={"X-API-Key": key})
+                success = response.status_code == 200
+            except httpx.HTTPError:
+                success = False
+            if now >= start:
+                ok += success
+                failed += not success
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        await asyncio.gather(*(loop(client) for _ in range(concurrency)))
+    return ok, failed
+
+
+def client_process(args: tuple) -> tuple[int, int]:
+    return asyncio.run(drive(*args))
+
+
+def measure(workers: int, args, cpus: list[int]) -> tuple[float, int]:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    shm = tempfile.mkdtemp(prefix="bench-workers-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    env = {
+        **os.environ,
+        "PORT": str(port),
+        "WEB_CONCURRENCY": str(workers),
+        "PROMETHEUS_MULTIPROC_DIR": os.path.join(shm, "metrics"),
+        "SHARED_CACHE_PATH": os.path.join(shm, "cache.sqlite3"),
+        "REALTIME_ENABLED": "false",
+    }
+    command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning", "app.main:app"]
+    if shutil.which("taskset") and len(cpus) > workers:
+        command = ["taskset", "-c", ",".join(map(str, cpus[:workers]))] + command
+    server = subprocess.Popen(command, env=env)
+    try:
+        wait_ready(base_url)
+        per_client = max(args.concurrency // args.clients, 1)
+        jobs = [
+            (base_url, args.users, per_client, args.warmup, args.duration, i)
+            for i in range(args.clients)
+        ]
+        with multiprocessing.Pool(args.clients) as pool:
+            results = pool.map(client_process, jobs)
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(shm, ignore_errors=True)
+    ok = sum(r[0] for r in results)
+    failed = sum(r[1] for r in results)
+    return ok / args.duration, failed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--users", type=int, default=1000, help="seed.py で作ったユーザー数以下")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=4, help="負荷をかけるプロセス数")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    args = parser.parse_args()
+
+    counts = [int(n) for n in args.workers.split(",")]
+    cpus = sorted(os.sched_getaffinity(0))
+    if max(counts) + args.clients > len(cpus):
+        print(f"warning: {len(cpus)} CPUs for up to {max(counts)} workers + {args.clients} clients; "
+              "the load generator will compete with the server")
+
+    baseline = None
+    print(f"{'workers':>7} {'req/s':>9} {'speedup':>8} {'efficiency':>10} {'errors':>7}")
+    for workers in counts:
+        rps, failed = measure(workers, args, cpus)
+        if baseline is None:
+            baseline = rps / workers
+        speedup = rps / baseline if baseline else 0.0
+        print(f"{workers:>7} {rps:>9.0f} {speedup:>7.2f}x {speedup / workers:>9.0%} {failed:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+/ws のアイドル接続1本あたりのメモリを測るベンチマーク
+
+uvicorn を別プロセスで起動し（API キーの認証は DB を使わないものに差し替え、
+lifespan は切るので LISTEN もしない）、--connections 本の WebSocket を張って
+hello を受け取ったあとのサーバーの RSS 増加分を接続数で割る。
+permessage-deflate の有無（本番は --ws-per-message-deflate false）で比較する。
+比較用に、同じ間隔でポーリングした場合の 1 分あたりのリクエスト数も表示する。
+
+Usage: python benchmarks/bench_ws_idle.py [--connections 2000] [--users 200] [--poll-interval 30]
+"""
+import argparse
+import asyncio
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+sys.path.insert(0, '.')
+
+
+def serve(port: int, deflate: bool) -> None:
+    import uvicorn
+
+    from app.main import app
+    from app.routers import ws
+
+    ws.authenticate = lambda key: uuid.uuid5(uuid.NAMESPACE_URL, key or "")
+    uvicorn.run(
+        app, host="127.0.0.1", port=port, lifespan="off", log_level="warning",
+        ws="websockets-sansio", ws_per_message_deflate=deflate,
+    )
+
+
+def rss_kib(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    raise RuntimeError("VmRSS not found")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def open_connections(port: int, n: int, users: int, batch: int = 100) -> list:
+    from websockets.asyncio.client import connect
+
+    async def one(i: int):
+        conn = await connect(f"ws://127.0.0.1:{port}/ws?key=bench-{i % users}")
+        await conn.recv()  # hello
+        return conn
+
+    conns = []
+    for start in range(0, n, batch):
+        conns += await asyncio.gather(*(one(i) for i in range(start, min(n, start + batch))))
+    return conns
+
+
+async def measure(pid: int, port: int, n: int, users: int) -> tuple[int, int, float]:
+    # ウォームアップ（初回接続で読み込まれるモジュール分を除く）
+    for conn in await open_connections(port, 10, users):
+        await conn.close()
+    await asyncio.sleep(1)
+
+    before = rss_kib(pid)
+    start = time.perf_counter()
+    conns = await open_connections(port, n, users)
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(2)
+    after = rss_kib(pid)
+
+    await asyncio.gather(*(c.close() for c in conns))
+    return before, after, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--poll-interval", type=float, default=30.0, help="置き換え前のポーリング間隔（秒）")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--deflate", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.deflate)
+        return
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    if args.connections + 100 > hard:
+        sys.exit(f"open file limit {hard} is too low for {args.connections} connections")
+
+    print(f"connections: {args.connections} ({args.users} users)")
+    for deflate in (True, False):
+        port = free_port()
+        command = [sys.executable, __file__, "--serve", str(port)] + (["--deflate"] if deflate else [])
+        server = subprocess.Popen(command, cwd=os.getcwd())
+        try:
+            wait_for_port(port)
+            before, after, elapsed = asyncio.run(measure(server.pid, port, args.connections, args.users))
+        finally:
+            server.terminate()
+            server.wait()
+        per_conn = (after - before) / args.connections
+        print(f"permessage-deflate {'on ' if deflate else 'off'}: "
+              f"RSS {before / 1024:6.1f} -> {after / 1024:6.1f} MiB, "
+              f"{per_conn:5.1f} KiB/connection (opened in {elapsed:.2f}s)")
+
+    print(f"polling every {args.poll_interval:.0f}s instead: "
+          f"{args.connections * 60 / args.poll_interval:.0f} requests/min (each a DB round trip)")
+
+
+if __name__ == "__main__":
+    main()
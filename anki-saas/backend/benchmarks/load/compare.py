@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+run.py の結果 JSON を2つ比較する
+
+エンドポイントごとに p50/p95/p99 と RPS の変化率を表示する。
+--fail-on-regression を付けると、p95 が閾値以上悪化したときに終了コード 1 を返す（CI 用）。
+
+Usage: python benchmarks/load/compare.py baseline.json candidate.json [--fail-on-regression 10]
+"""
+import argparse
+import json
+import sys
+
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "rps")
+
+
+def change(before: float, after: float) -> float | None:
+    if not before:
+        return None
+    return (after - before) / before * 100
+
+
+def compare(baseline: dict, candidate: dict) -> list[dict]:
+    rows = []
+    for name in sorted(set(baseline["endpoints"]) | set(candidate["endpoints"])):
+        before = baseline["endpoints"].get(name)
+        after = candidate["endpoints"].get(name)
+        row = {"endpoint": name}
+        for metric in METRICS:
+            b = before[metric] if before else None
+            a = after[metric] if after else None
+            row[metric] = (b, a, change(b, a) if b is not None and a is not None else None)
+        rows.append(row)
+    return rows
+
+
+def format_cell(b, a, pct) -> str:
+    if b is None or a is None:
+        return f"{'-' if b is None else b:>8} → {'-' if a is None else a:<8}"
+    return f"{b:8.1f} → {a:8.1f} ({pct:+6.1f}%)" if pct is not None else f"{b:8.1f} → {a:8.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--fail-on-regression", type=float, metavar="PCT",
+                        help="p95 がこの割合 (%%) 以上悪化したエンドポイントがあれば失敗")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    for label, result in (("baseline", baseline), ("candidate", candidate)):
+        meta = result["meta"]
+        print(f"{label:9s}: {meta.get('label') or '-'} @ {meta.get('git_commit') or '?'} "
+              f"({meta['concurrency']} users, {meta['duration_s']}s)")
+    print()
+
+    rows = compare(baseline, candidate)
+    print(f"{'endpoint':32s} " + " ".join(f"{m:^30s}" for m in METRICS))
+    regressions = []
+    for row in rows:
+        print(f"{row['endpoint']:32s} " + " ".join(format_cell(*row[m]) for m in METRICS))
+        pct = row["p95_ms"][2]
+        if args.fail_on_regression is not None and pct is not None and pct >= args.fail_on_regression:
+            regressions.append((row["endpoint"], pct))
+
+    if regressions:
+        print()
+        for name, pct in regressions:
+            print(f"REGRESSION: {name} p95 {pct:+.1f}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
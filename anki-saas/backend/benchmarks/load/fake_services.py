@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+負荷試験用の Claude API / AnkiConnect の代役
+
+- Claude: POST /v1/messages（Anthropic Messages API 互換、stream=true なら SSE）
+  応答までの遅延、ストリーミング時のトークン間隔を指定できる。
+  プロンプトの内容からカード生成・単語検索・チャットの応答を返し分ける。
+- AnkiConnect: POST /（version 6 の主要アクション）
+
+アプリ側は .env で次のように向け先を変える:
+  ANTHROPIC_BASE_URL=http://127.0.0.1:9100
+  ANKI_CONNECT_URL=http://127.0.0.1:8765
+
+Usage: python benchmarks/load/fake_services.py [--latency-ms 800] [--jitter-ms 200] [--token-delay-ms 20]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+CARDS_REPLY = json.dumps([
+    {"card_type": "vocab", "front": "give up", "back": "あきらめる"},
+    {"card_type": "cloze", "front": "Don't ___ on your dreams.", "back": "give up"},
+    {"card_type": "rewrite", "front": "I stopped trying.", "back": "I gave up."},
+], ensure_ascii=False)
+LOOKUP_REPLY = json.dumps({
+    "word": "resilient", "meaning": "回復力のある", "pronunciation": "/rɪˈzɪliənt/",
+    "example": "Children are remarkably resilient.",
+}, ensure_ascii=False)
+CHAT_REPLY = (
+    "'Give up' means to stop trying to do something. "
+    "For example: 'She never gave up on learning English.'"
+)
+
+
+def reply_for(messages: list[dict]) -> str:
+    prompt = messages[-1]["content"] if messages else ""
+    if isinstance(prompt, list):  # content block 形式
+        prompt = " ".join(block.get("text", "") for block in prompt)
+    if "フラッシュカード" in prompt:
+        # approve を重複扱いにしないよう、毎回少しずつ違う表面にする
+        suffix = uuid.uuid4().hex[:6]
+        return CARDS_REPLY.replace("give up\"", f"give up {suffix}\"", 1)
+    if "単語:" in prompt:
+        return LOOKUP_REPLY
+    return CHAT_REPLY
+
+
+def build_claude_app(args) -> FastAPI:
+    app = FastAPI()
+
+    async def delay():
+        latency = args.latency_ms + random.uniform(-args.jitter_ms, args.jitter_ms)
+        await asyncio.sleep(max(latency, 0) / 1000)
+
+    @app.post("/v1/messages")
+    async def messages(request: Request):
+        body = await request.json()
+        text = reply_for(body.get("messages", []))
+        message_id = f"msg_{uuid.uuid4().hex}"
+        usage = {"input_tokens": 100, "output_tokens": len(text) // 4}
+        await delay()
+
+        if not body.get("stream"):
+            return JSONResponse({
+                "id": message_id, "type": "message", "role": "assistant", "model": body.get("model"),
+                "content": [{"type": "text", "text": text}],
+                "stop_reason": "end_turn", "stop_sequence": None, "usage": usage,
+            })
+
+        async def events():
+            def sse(event: str, data: dict) -> str:
+                return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+            yield sse("message_start", {"type": "message_start", "message": {
+                "id": message_id, "type": "message", "role": "assistant", "model": body.get("model"),
+                "content": [], "stop_reason": None, "stop_sequence": None,
+                "usage": {"input_tokens": usage["input_tokens"], "output_tokens": 0},
+            }})
+            yield sse("content_block_start", {"type": "content_block_start", "index": 0,
+                                              "content_block": {"type": "text", "text": ""}})
+            # 4文字を1トークンとみなして少しずつ返す
+            for i in range(0, len(text), 4):
+                await asyncio.sleep(args.token_delay_ms / 1000)
+                yield sse("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                                  "delta": {"type": "text_delta", "text": text[i:i + 4]}})
+            yield sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+            yield sse("message_delta", {"type": "message_delta",
+                                        "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                        "usage": {"output_tokens": usage["output_tokens"]}})
+            yield sse("message_stop", {"type": "message_stop"})
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def build_anki_app(args) -> FastAPI:
+    app = FastAPI()
+    note_ids = itertools.count(1_700_000_000_000)
+    decks = {"Default": 1}
+
+    @app.post("/")
+    async def invoke(request: Request):
+        body = await request.json()
+        action, params = body.get("action"), body.get("params", {})
+        await asyncio.sleep(args.anki_latency_ms / 1000)
+
+        if action == "version":
+            result = 6
+        elif action == "deckNames":
+            result = list(decks)
+        elif action == "modelNames":
+            result = ["Basic", "Cloze"]
+        elif action == "createDeck":
+            result = decks.setdefault(params["deck"], len(decks) + 1)
+        elif action == "addNote":
+            result = next(note_ids)
+        elif action == "addNotes":
+            result = [next(note_ids) for _ in params.get("notes", [])]
+        elif action == "sync":
+            result = None
+        else:
+            return {"result": None, "error": f"unsupported action: {action}"}
+        return {"result": result, "error": None}
+
+    return app
+
+
+async def serve(args) -> None:
+    servers = [
+        uvicorn.Server(uvicorn.Config(build_claude_app(args), host=args.host, port=args.claude_port, log_level="warning")),
+        uvicorn.Server(uvicorn.Config(build_anki_app(args), host=args.host, port=args.anki_port, log_level="warning")),
+    ]
+    print(f"fake Claude:      http://{args.host}:{args.claude_port}")
+    print(f"fake AnkiConnect: http://{args.host}:{args.anki_port}")
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--claude-port", type=int, default=9100)
+    parser.add_argument("--anki-port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=800, help="Claude の応答開始までの遅延")
+    parser.add_argument("--jitter-ms", type=float, default=200)
+    parser.add_argument("--token-delay-ms", type=float, default=20, help="ストリーミング時のトークン間隔")
+    parser.add_argument("--anki-latency-ms", type=float, default=5)
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+ユーザージャーニーを並行実行してエンドポイントごとのレイテンシを測る
+
+ジャーニー:
+  chat     : /chat を同じ会話で2往復
+  generate : /chat → /generate → /approve
+  review   : /review/session → next → 数枚を /review/{card_id} で採点
+  export   : /cards/export.ndjson と /review/logs/export.ndjson を読み切る
+
+ユーザーは seed.py が作った ak_bench_NNNNNN からランダムに選ぶ。
+結果（p50/p95/p99・RPS・エラー数）は JSON に保存し、compare.py で比較できる。
+
+Usage:
+  python benchmarks/load/run.py --users 10000 --concurrency 50 --duration 60 \
+      --output benchmarks/load/results/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import subprocess
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from seed import api_key_for
+
+
+DEFAULT_WEIGHTS = "chat=3,generate=1,review=5,export=1"
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """nearest-rank 法"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+        self.journeys = defaultdict(list)
+        self.recording = False
+
+    async def request(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """1リクエストを送り、本文を読み切るまでの時間を name で記録する"""
+        start = time.perf_counter()
+        try:
+            async with client.stream(method, url, **kwargs) as response:
+                await response.aread()
+        except httpx.HTTPError:
+            if self.recording:
+                self.errors[name] += 1
+            raise
+        elapsed = time.perf_counter() - start
+        if self.recording:
+            self.latencies[name].append(elapsed)
+            self.statuses[name][response.status_code] += 1
+            if response.status_code >= 400:
+                self.errors[name] += 1
+        return response
+
+    def summary(self, elapsed: float) -> dict:
+        def stats(values: list[float]) -> dict:
+            values = sorted(values)
+            return {
+                "count": len(values),
+                "rps": round(len(values) / elapsed, 2),
+                "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+                "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+            }
+
+        endpoints = {}
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            endpoints[name] = {
+                **stats(self.latencies[name]),
+                "errors": self.errors[name],
+                "status": {str(k): v for k, v in sorted(self.statuses[name].items())},
+            }
+        return {
+            "endpoints": endpoints,
+            "journeys": {name: stats(values) for name, values in sorted(self.journeys.items())},
+        }
+
+
+async def journey_chat(client, rec, rng):
+    response = await rec.request(client, "POST /chat", "POST", "/chat", json={"message": "What does 'give up' mean?"})
+    conversation_id = response.json()["conversation_id"]
+    await rec.request(client, "POST /chat", "POST", "/chat", json={
+        "conversation_id": conversation_id, "message": "Can you give me another example?",
+    })
+
+
+async def journey_generate(client, rec, rng):
+    response = await rec.request(client, "POST /chat", "POST", "/chat", json={"message": "Teach me phrasal verbs with 'give'."})
+    conversation_id = response.json()["conversation_id"]
+    response = await rec.request(client, "POST /generate", "POST", "/generate", json={"conversation_id": conversation_id})
+    candidates = response.json()["candidates"]
+    if candidates:
+        await rec.request(client, "POST /approve", "POST", "/approve", json={
+            "conversation_id": conversation_id, "cards": candidates,
+        })
+
+
+async def journey_review(client, rec, rng, max_reviews=10):
+    response = await rec.request(client, "POST /review/session", "POST", "/review/session", json={})
+    session_id = response.json()["id"]
+    response = await rec.request(client, "GET /review/session/{id}/next", "GET",
+                                 f"/review/session/{session_id}/next", params={"n": max_reviews})
+    for card in response.json()["cards"]:
+        await rec.request(client, "POST /review/{card_id}", "POST", f"/review/{card['id']}", json={
+            "rating": rng.choice((0, 1, 2, 2, 2, 3)), "session_id": session_id,
+        })
+
+
+async def journey_export(client, rec, rng):
+    await rec.request(client, "GET /cards/export.ndjson", "GET", "/cards/export.ndjson")
+    since = (datetime.now(timezone.utc) - timedelta(days=30)).isoformat()
+    await rec.request(client, "GET /review/logs/export.ndjson", "GET", "/review/logs/export.ndjson", params={"since": since})
+
+
+JOURNEYS = {
+    "chat": journey_chat,
+    "generate": journey_generate,
+    "review": journey_review,
+    "export": journey_export,
+}
+
+
+def parse_weights(spec: str) -> dict[str, float]:
+    weights = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in JOURNEYS:
+            raise SystemExit(f"unknown journey: {name} (choose from {', '.join(JOURNEYS)})")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+async def virtual_user(base_url, args, weights, rec, deadline, worker_id):
+    rng = random.Random(args.seed + worker_id)
+    names, values = list(weights), list(weights.values())
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout) as client:
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, values)[0]
+            client.headers["X-API-Key"] = api_key_for(rng.randrange(args.users))
+            start = time.perf_counter()
+            try:
+                await JOURNEYS[name](client, rec, rng)
+            except (httpx.HTTPError, KeyError, ValueError):
+                pass  # エラーはリクエスト単位で記録済み
+            else:
+                if rec.recording:
+                    rec.journeys[name].append(time.perf_counter() - start)
+            if args.think_ms:
+                await asyncio.sleep(rng.uniform(0, 2 * args.think_ms) / 1000)
+
+
+async def run(args) -> dict:
+    weights = parse_weights(args.journeys)
+    rec = Recorder()
+    start = time.perf_counter()
+    deadline = start + args.warmup + args.duration
+    tasks = [
+        asyncio.create_task(virtual_user(args.base_url, args, weights, rec, deadline, i))
+        for i in range(args.concurrency)
+    ]
+    await asyncio.sleep(args.warmup)
+    rec.recording = True
+    measured_from = time.perf_counter()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - measured_from
+    return {
+        "meta": {
+            "label": args.label,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "base_url": args.base_url,
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "duration_s": round(elapsed, 2),
+            "warmup_s": args.warmup,
+            "think_ms": args.think_ms,
+            "journeys": weights,
+        },
+        **rec.summary(elapsed),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result: dict) -> None:
+    print(f"{'endpoint':32s} {'count':>7s} {'rps':>8s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'errors':>7s}")
+    for name, s in result["endpoints"].items():
+        print(f"{name:32s} {s['count']:7d} {s['rps']:8.1f} {s['p50_ms']:8.1f} {s['p95_ms']:8.1f} {s['p99_ms']:8.1f} {s['errors']:7d}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=10000, help="seed.py で作ったユーザー数")
+    parser.add_argument("--concurrency", type=int, default=50, help="同時に動く仮想ユーザー数")
+    parser.add_argument("--duration", type=float, default=60, help="計測する秒数")
+    parser.add_argument("--warmup", type=float, default=10, help="計測前に捨てる秒数")
+    parser.add_argument("--think-ms", type=float, default=0, help="ジャーニー間の平均待ち時間")
+    parser.add_argument("--journeys", default=DEFAULT_WEIGHTS, help="ジャーニーと重み (例: chat=3,review=5)")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default="")
+    parser.add_argument("--output", help="結果を書き出す JSON ファイル")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+負荷試験用のデータをローカル PostgreSQL に投入する
+
+既定値で 10k ユーザー / 5M カード / 50M 復習ログ。
+すべて COPY で流し込む。ID はアプリと同じく Python で作る uuid7 なので、
+主キーのインデックスは本番と同じく右端に追記される形で育つ。
+
+API キーは ak_bench_000000 のように連番で決まるので、
+run.py は --users に同じ数を渡すだけでログインできる。
+
+Usage:
+  python benchmarks/load/seed.py [--users 10000] [--cards-per-user 500] [--logs-per-card 10]
+  python benchmarks/load/seed.py --users 100 --truncate   # 小さく作り直す
+"""
+import argparse
+import csv
+import hashlib
+import io
+import random
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, '.')
+
+from app.ids import uuid7
+
+
+BENCH_NAMESPACE = uuid.UUID("6f1d2c1e-8a53-4c5e-9a43-3f8c1d2b7e10")
+
+WORDS = [
+    "apple", "run", "give up", "take off", "consider", "reluctant", "abundant", "negotiate",
+    "figure out", "deadline", "commute", "grateful", "inevitable", "look forward to", "obsolete",
+    "put off", "resilient", "subtle", "thorough", "turn down", "vivid", "wander", "yield",
+    "bring up", "carry on", "come across", "deal with", "get along", "make up for", "run into",
+]
+MEANINGS = [
+    "りんご", "走る", "あきらめる", "離陸する", "よく考える", "気が進まない", "豊富な", "交渉する",
+    "理解する", "締め切り", "通勤する", "感謝している", "避けられない", "楽しみにする", "時代遅れの",
+    "延期する", "回復力のある", "微妙な", "徹底的な", "断る", "鮮やかな", "さまよう", "生み出す",
+    "話題に出す", "続ける", "偶然見つける", "対処する", "うまくやる", "埋め合わせる", "偶然会う",
+]
+
+
+def api_key_for(index: int) -> str:
+    return f"ak_bench_{index:06d}"
+
+
+def user_id_for(index: int) -> uuid.UUID:
+    return uuid.uuid5(BENCH_NAMESPACE, f"user-{index}")
+
+
+def copy_rows(cursor, table: str, columns: tuple[str, ...], rows: list[tuple]) -> None:
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+
+def card_rows(rng: random.Random, user_id: uuid.UUID, conversation_id: uuid.UUID, n: int, now: datetime):
+    from app.services.dedup import card_keys
+
+    today = date.today()
+    for i in range(n):
+        w = rng.randrange(len(WORDS))
+        front = f"{WORDS[w]} #{i}"
+        keys = card_keys(front)  # 重複検出はこの列で候補を引くので、本番と同じく埋めておく
+        repetitions = rng.choice((0, 0, 1, 2, 3, 4, 5, 6))
+        interval = 0 if repetitions == 0 else min(int(rng.expovariate(1 / 15)) + 1, 365)
+        created = now - timedelta(days=rng.randrange(365), seconds=rng.randrange(86400))
+        yield (
+            uuid7(), user_id, conversation_id if i % 10 == 0 else "",
+            rng.choice(("vocab", "vocab", "vocab", "cloze", "rewrite")),
+            front, f"{MEANINGS[w]} ({i})",
+            round(rng.uniform(1.3, 3.0), 2), interval, repetitions,
+            today + timedelta(days=rng.randint(-30, 60)),  # 一部は期限切れで復習対象になる
+            created, created,
+            keys["front_fingerprint"], "{" + ",".join(map(str, keys["front_bands"])) + "}",
+        )
+
+
+REVIEW_LOG_COLUMNS = ("id", "user_id", "card_id", "rating", "reviewed_at", "logged_at")
+REVIEW_LOG_CHUNK = 100_000  # 1回の COPY で送る行数（メモリに溜めすぎない）
+RATINGS = (0, 1, 2, 2, 2, 3)
+
+
+def review_log_rows(rng: random.Random, cards: list[tuple], logs_per_card: int, now: datetime):
+    """カードの作成から今までに散らばった復習ログ。logged_at は migration 014 の移行と同じく reviewed_at"""
+    for card in cards:
+        card_id, user_id, created = card[0], card[1], card[10]
+        span = (now - created).total_seconds()
+        for _ in range(logs_per_card):
+            reviewed = created + timedelta(seconds=rng.random() * span)
+            yield uuid7(), user_id, card_id, rng.choice(RATINGS), reviewed, reviewed
+
+
+def copy_review_logs(cursor, rows) -> None:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= REVIEW_LOG_CHUNK:
+            copy_rows(cursor, "review_logs", REVIEW_LOG_COLUMNS, chunk)
+            chunk = []
+    if chunk:
+        copy_rows(cursor, "review_logs", REVIEW_LOG_COLUMNS, chunk)
+
+
+DUE_COUNTS_SQL = """
+    INSERT INTO due_counts (user_id, day, count)
+    SELECT user_id, greatest(next_review, current_date), count(*)
+    FROM cards
+    WHERE user_id = ANY(%(user_ids)s::uuid[])
+    GROUP BY 1, 2
+"""
+
+
+def seed_batch(conn, rng: random.Random, start: int, stop: int, args) -> None:
+    now = datetime.utcnow()
+    users, keys, conversations, messages, cards = [], [], [], [], []
+    for index in range(start, stop):
+        user_id = user_id_for(index)
+        conversation_id = uuid7()
+        users.append((user_id, now))
+        keys.append((uuid7(), user_id, hashlib.sha256(api_key_for(index).encode()).hexdigest(), now))
+        conversations.append((conversation_id, user_id, "bench", now))
+        messages.append((uuid7(), conversation_id, "user", "What does 'give up' mean?", now))
+        messages.append((uuid7(), conversation_id, "assistant", "It means to stop trying.", now))
+        cards.extend(card_rows(rng, user_id, conversation_id, args.cards_per_user, now))
+
+    with conn.cursor() as cursor:
+        copy_rows(cursor, "users", ("id", "created_at"), users)
+        copy_rows(cursor, "api_keys", ("id", "user_id", "key_hash", "created_at"), keys)
+        copy_rows(cursor, "conversations", ("id", "user_id", "title", "created_at"), conversations)
+        copy_rows(cursor, "messages", ("id", "conversation_id", "role", "content", "created_at"), messages)
+        copy_rows(cursor, "cards", (
+            "id", "user_id", "conversation_id", "card_type", "front", "back",
+            "ease_factor", "interval", "repetitions", "next_review", "created_at", "updated_at",
+            "front_fingerprint", "front_bands",
+        ), cards)
+        user_ids = [str(u[0]) for u in users]
+        cursor.execute(DUE_COUNTS_SQL, {"user_ids": user_ids})
+        if args.logs_per_card:
+            copy_review_logs(cursor, review_log_rows(rng, cards, args.logs_per_card, now))
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--cards-per-user", type=int, default=500)
+    parser.add_argument("--logs-per-card", type=int, default=10)
+    parser.add_argument("--batch-users", type=int, default=200, help="1トランザクションで投入するユーザー数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--truncate", action="store_true", help="投入前に全テーブルを空にする")
+    args = parser.parse_args()
+
+    # run.py から api_key_for だけを import できるよう、DB 接続はここで読み込む
+    from app.database import SessionLocal, engine
+    from app.services import review_log_partitions as partitions
+
+    # 復習ログは過去1年に散らばるので、その分の月別パーティションを先に作る
+    db = SessionLocal()
+    try:
+        this_month = partitions.month_start(date.today())
+        partitions.create_partitions(db, partitions.add_months(this_month, -12), partitions.add_months(this_month, 3))
+        db.commit()
+    finally:
+        db.close()
+
+    rng = random.Random(args.seed)
+    conn = engine.raw_connection()
+    try:
+        if args.truncate:
+            with conn.cursor() as cursor:
+                # users を参照するテーブルが増えても漏れないよう CASCADE で消す
+                cursor.execute(
+                    "TRUNCATE review_sessions, due_counts, daily_study_counts, import_jobs, applied_ops, "
+                    "card_tombstones, revoked_tokens, review_logs, cards, messages, conversations, api_keys, users "
+                    "CASCADE"
+                )
+            conn.commit()
+
+        total_cards = args.users * args.cards_per_user
+        print(f"seeding {args.users} users, {total_cards} cards, {total_cards * args.logs_per_card} review logs")
+        start_time = time.perf_counter()
+        for start in range(0, args.users, args.batch_users):
+            stop = min(start + args.batch_users, args.users)
+            seed_batch(conn, rng, start, stop, args)
+            elapsed = time.perf_counter() - start_time
+            print(f"  {stop}/{args.users} users ({elapsed:.0f}s)", flush=True)
+
+        # 統計情報がないと最初の計測でプランがぶれる
+        conn.set_isolation_level(0)
+        with conn.cursor() as cursor:
+            cursor.execute("VACUUM ANALYZE")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
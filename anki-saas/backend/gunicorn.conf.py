@@ -0,0 +1,81 @@
+"""
+本番用の gunicorn 設定（gunicorn -c gunicorn.conf.py app.main:app）
+
+- WEB_CONCURRENCY 個の uvicorn ワーカーで動かす。既定はこのプロセスが使える CPU 数
+  （sched_getaffinity。cpu_count はホスト全体を数えるので taskset・cpuset の制限を反映しない）で、
+  上限は MAX_DEFAULT_WORKERS
+
+- preload_app: マスターで一度だけ app を import し、ワーカーは fork で作る
+  （起動が速く、import 済みのモジュールのメモリをワーカー間で共有できる）
+- 共有キャッシュ（app.shared_cache）と Prometheus のメトリクスは /dev/shm に置き、全ワーカーで共有する
+
+再起動:
+  kill -HUP <master>   ワーカーを1つずつ入れ替える（preload なのでコードは読み直さない）
+  kill -USR2 <master>  新しいマスターでコードを読み直し、起動できたら古い方に -QUIT を送る
+  kill -TERM <master>  処理中のリクエストを graceful_timeout まで待って止める
+
+DB 接続はワーカーごとに次の本数まで開く（ワーカー数を増やすときは PostgreSQL の max_connections と比べる）:
+  プライマリ  SQLAlchemy のプール: pool_size 5 + max_overflow 10 = 15 本
+               （リクエスト、インポートのバックグラウンド処理、復習ログの write-behind バッファの書き出し、
+                トークン失効リストの更新スレッド、レプリカの遅延を測るスレッドで共用）
+             + LISTEN 専用の接続 1 本（REALTIME_ENABLED のとき）
+  レプリカ   DATABASE_REPLICA_URLS の1台ごとに同じく最大 15 本
+既定の上限 4 ワーカーならプライマリは最大 64 本で、PostgreSQL の既定の max_connections (100) に収まる。
+重複検出のキーとインポートの進捗は DB に置き、ワーカー内には持たない。
+"""
+import os
+import shutil
+
+# app を import する前に設定しておく（prometheus_client と Settings が import 時に読む）
+SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else "/tmp"
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(SHM_DIR, "anki-saas-metrics"))
+os.environ.setdefault("SHARED_CACHE_PATH", os.path.join(SHM_DIR, "anki-saas-cache", "cache.sqlite3"))
+# preload で import する時点でメトリクスのファイルを作るので、先にディレクトリを用意する
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+# CPU が多いホストでも DB 接続数が膨らみすぎないよう、既定値には上限を設ける（WEB_CONCURRENCY なら制限なし）
+MAX_DEFAULT_WORKERS = 4
+
+
+def default_workers() -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS など
+        cpus = os.cpu_count() or 1
+    return max(min(cpus, MAX_DEFAULT_WORKERS), 1)
+
+
+workers = int(os.environ.get("WEB_CONCURRENCY") or default_workers())
+worker_class = "app.worker.UvicornWorker"
+preload_app = True
+
+# /ws の接続は長く開いたままなので、ワーカーの入れ替え時は少し長めに待つ
+graceful_timeout = 30
+timeout = 60
+keepalive = 5
+# メモリの断片化対策に一定数のリクエストごとにワーカーを入れ替える（同時に入れ替わらないようずらす）
+max_requests = 10000
+max_requests_jitter = 1000
+
+
+def on_starting(server):
+    # 前回のプロセスのメトリクスが混ざらないよう空にする（マスター自身はリクエストを処理しない）
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_fork(server, worker):
+    # マスターで作ったコネクションプールの接続を子で使わない（close=False で親の接続は閉じない）
+    # レプリカのエンジンも app.replicas の import 時に作られ、同じくプールごと引き継がれる
+    from app.database import engine
+    from app.replicas import replicas
+    engine.dispose(close=False)
+    for replica in replicas:
+        replica.engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+重複検出のキー（cards.front_fingerprint / front_bands）が空のカードを埋める
+
+migration 013 より前に作られたカードは、これを流すまで重複検出の対象にならない。
+id 順に BATCH 件ずつ更新してコミットするので、途中で止めても続きから再開できる。
+Usage: python scripts/backfill_dedup_keys.py [--batch 1000]
+"""
+import argparse
+import sys
+import time
+sys.path.insert(0, '.')
+
+from sqlalchemy import bindparam, select, update
+
+from app.database import SessionLocal
+from app.models import Card
+from app.services import dedup
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    stmt = (
+        update(Card)
+        .where(Card.id == bindparam("card_id"))
+        .values(front_fingerprint=bindparam("fp"), front_bands=bindparam("bands"))
+    )
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        total = 0
+        while True:
+            rows = db.execute(
+                select(Card.id, Card.front)
+                .where(Card.front_fingerprint.is_(None))
+                .order_by(Card.id)
+                .limit(args.batch)
+            ).all()
+            if not rows:
+                break
+            params = []
+            for card_id, front in rows:
+                keys = dedup.card_keys(front)
+                params.append({"card_id": card_id, "fp": keys["front_fingerprint"], "bands": keys["front_bands"]})
+            db.connection().execute(stmt, params)
+            db.commit()
+            total += len(rows)
+        print(f"backfilled {total} cards in {time.perf_counter() - start:.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+/lookup 用のローカル英和辞書（mmap インデックス）を作る
+
+入力は TSV（.gz 可）: 見出し語<TAB>意味[<TAB>発音[<TAB>例文]]
+EJDict-hand（パブリックドメイン）の ejdic-hand-utf8.txt をそのまま使える。
+見出し語が "color,colour" のようにカンマ区切りなら、それぞれを見出し語にする。
+
+出力先は既定で DICTIONARY_PATH。動作中のワーカーは古い辞書のまま動き、再起動後に新しい辞書を読む。
+Usage: python scripts/build_dictionary.py ejdic-hand-utf8.txt [more.tsv ...] [--output PATH] [--max-senses 5]
+"""
+import argparse
+import gzip
+import sys
+import time
+sys.path.insert(0, '.')
+
+from app.config import settings
+from app.services.dictionary import MmapDictionary, write_index
+
+
+def read_entries(paths: list[str], max_senses: int):
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) < 2:
+                    continue
+                words, meaning = fields[0], fields[1]
+                pronunciation = fields[2] if len(fields) > 2 else None
+                example = fields[3] if len(fields) > 3 else None
+                if max_senses:
+                    meaning = " / ".join(meaning.split(" / ")[:max_senses])
+                for word in words.split(","):
+                    yield word, meaning, pronunciation, example
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sources", nargs="+", help="TSV ファイル（.gz 可）")
+    parser.add_argument("--output", default=settings.dictionary_path)
+    parser.add_argument("--max-senses", type=int, default=5, help="意味を先頭から何個まで残すか（0 なら全部）")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = write_index(read_entries(args.sources, args.max_senses), args.output)
+    dictionary = MmapDictionary(args.output)
+    assert len(dictionary) == count
+    print(f"wrote {count} entries to {args.output} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,12 @@ Usage: python scripts/create_user.py
 """
 import secrets
 import hashlib
-import uuid
 import sys
 sys.path.insert(0, '.')
 
 from sqlalchemy.orm import Session
 from app.database import engine, SessionLocal
+from app.ids import uuid7
 from app.models import User, ApiKey
 
 
@@ -18,7 +18,7 @@ def create_test_user():
     db = SessionLocal()
     try:
         # Create user
-        user = User(id=uuid.uuid4())
+        user = User(id=uuid7())
         db.add(user)
         db.flush()
 
@@ -27,7 +27,7 @@ def create_test_user():
         key_hash = hashlib.sha256(api_key.encode()).hexdigest()
 
         api_key_record = ApiKey(
-            id=uuid.uuid4(),
+            id=uuid7(),
             user_id=user.id,
             key_hash=key_hash
         )
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+review_logs の月別パーティションを管理する（cron で日次実行を想定）
+
+- 今月から --ahead か月先までのパーティションを作る
+  （既に DEFAULT に行が入っている月はその行を移して作る。作れなかった月があっても古い月の整理は続け、
+   最後に終了コード 1 で知らせる）
+- --retain-months より古い月を切り離す
+  --archive-dir を付けると CSV.gz に書き出してから削除、--drop なら書き出さずに削除
+  どちらもなければ切り離したテーブルはそのまま残す（次に --archive-dir/--drop で実行したときに片付ける）
+  切り離しは review_logs 全体を ACCESS EXCLUSIVE でロックするので、1か月ごとにすぐコミットし、
+  書き出しと削除は切り離したテーブルだけを相手に別のトランザクションで行う
+
+Usage:
+  python scripts/manage_review_log_partitions.py --ahead 3
+  python scripts/manage_review_log_partitions.py --retain-months 24 --archive-dir /var/backups/review_logs
+  python scripts/manage_review_log_partitions.py --since 2025-01   # 過去分を作る（データ投入前）
+"""
+import argparse
+import sys
+import traceback
+from datetime import date, datetime
+sys.path.insert(0, '.')
+
+from app.database import SessionLocal
+from app.services import review_log_partitions as partitions
+
+
+def parse_month(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m").date()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ahead", type=int, default=3, help="何か月先まで作っておくか")
+    parser.add_argument("--since", type=parse_month, help="この月 (YYYY-MM) から作る")
+    parser.add_argument("--retain-months", type=int, help="これより古い月を切り離す")
+    parser.add_argument("--archive-dir", help="切り離した月を CSV.gz で保存して削除する")
+    parser.add_argument("--drop", action="store_true", help="切り離した月を保存せずに削除する")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    this_month = partitions.month_start(date.today())
+    failed = False
+    db = SessionLocal()
+    try:
+        first = args.since or this_month
+        last = partitions.add_months(this_month, args.ahead)
+        try:
+            with db.begin_nested():
+                created = partitions.create_partitions(db, first, last)
+            for name in created:
+                print(f"created {name}")
+        except Exception:
+            # 作成に失敗しても古い月の切り離しは行う（ディスクが溢れるのを防ぐ）
+            traceback.print_exc()
+            print("error: could not create partitions; continuing with retention")
+            failed = True
+        if not args.dry_run:
+            db.commit()
+
+        if args.retain_months is not None:
+            cutoff = partitions.add_months(this_month, -args.retain_months)
+            old = [name for name, month in partitions.list_partitions(db) if month < cutoff]
+            for name in old:
+                print(f"detach {name}")
+                if not args.dry_run:
+                    partitions.detach_partition(db, name)
+                    db.commit()
+
+            if args.archive_dir or args.drop:
+                # 以前の実行で切り離しただけのテーブルも対象にする
+                leftovers = [
+                    name for name, month in partitions.list_partitions(db, attached=False)
+                    if month < cutoff and name not in old
+                ]
+                for name in old + leftovers:
+                    if args.dry_run:
+                        print(f"  would {'archive and drop' if args.archive_dir else 'drop'} {name}")
+                        continue
+                    if args.archive_dir:
+                        path = partitions.archive_table(db, name, args.archive_dir)
+                        print(f"  archived {name} to {path}")
+                    partitions.drop_table(db, name)
+                    db.commit()
+                    print(f"  dropped {name}")
+
+        rows = partitions.default_partition_rows(db)
+        if rows:
+            print(f"warning: {rows} rows in {partitions.DEFAULT_PARTITION} (missing partitions?)")
+
+        if args.dry_run:
+            db.rollback()
+            print("dry run: rolled back")
+        else:
+            db.commit()
+    finally:
+        db.close()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
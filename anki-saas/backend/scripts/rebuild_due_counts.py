@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+due_counts を cards から作り直す（ずれの修正・期限切れ日付の集約）
+
+日次で実行すると、期限切れの行が今日の1行にまとまり、今日の枚数の取得が数行の読み取りで済む。
+Usage: python scripts/rebuild_due_counts.py [--user-id UUID]
+"""
+import argparse
+import sys
+import time
+import uuid
+from datetime import date
+sys.path.insert(0, '.')
+
+from app.database import SessionLocal
+from app.services import due_counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--user-id", type=uuid.UUID, help="指定したユーザーだけ作り直す")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        due_counts.rebuild(db, date.today(), args.user_id)
+        db.commit()
+        print(f"rebuilt due_counts in {time.perf_counter() - start:.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+復習履歴を Parquet に書き出し、書き出したファイルだけで分析する
+
+  export : 前回の続きから review_logs（+ カードの状態）を月ごとの Parquet に追記
+  report : Parquet を読み、経過日数ごとの想起率と ease factor の分布を表示
+
+Usage:
+  python scripts/review_analytics.py export --out data/review_logs
+  python scripts/review_analytics.py report --out data/review_logs [--since 2026-01-01]
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+sys.path.insert(0, '.')
+
+from app.services import review_analytics
+
+
+def export(args):
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        result = review_analytics.export_review_logs(db, args.out, batch_size=args.batch_size)
+    finally:
+        db.close()
+
+    print(f"exported {result['rows']} rows ({result['since'] or 'beginning'} .. {result['until']}) "
+          f"in {time.perf_counter() - start:.1f}s")
+    for month, rows in sorted(result["months"].items()):
+        print(f"  month={month}: {rows}")
+
+
+def report(args):
+    table = review_analytics.load_reviews(
+        args.out, columns=["card_id", "rating", "reviewed_at", "ease_factor"], since=args.since, until=args.until
+    )
+    print(f"{table.num_rows} reviews")
+
+    curve = review_analytics.retention_curve(table, max_days=args.max_days)
+    print("\ndays since last review  reviews  retention")
+    for days, reviews, retention in zip(curve["days"], curve["reviews"], curve["retention"]):
+        if reviews:
+            label = f"{days}+" if days == args.max_days else str(days)
+            print(f"{label:>22s}  {reviews:7d}  {retention:9.1%}")
+
+    dist = review_analytics.ease_distribution(table)
+    print("\nease factor  cards")
+    for low, count in zip(dist["edges"][:-1], dist["counts"]):
+        print(f"{low:11.1f}  {count:5d}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("export")
+    p.add_argument("--out", default="data/review_logs")
+    p.add_argument("--batch-size", type=int, default=review_analytics.EXPORT_BATCH_SIZE)
+    p.set_defaults(func=export)
+
+    p = sub.add_parser("report")
+    p.add_argument("--out", default="data/review_logs")
+    p.add_argument("--since", type=datetime.fromisoformat)
+    p.add_argument("--until", type=datetime.fromisoformat)
+    p.add_argument("--max-days", type=int, default=60)
+    p.set_defaults(func=report)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
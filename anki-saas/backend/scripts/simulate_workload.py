@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+SM-2 の復習量をシミュレーションして、日ごとの復習回数と review_logs の増え方を予測する
+
+Usage:
+  python scripts/simulate_workload.py --users 10000 --cards-per-user 100 --days 365
+  python scripts/simulate_workload.py --ratings 0.2,0.1,0.6,0.1 --skip-prob 0.2 --output sim.json
+"""
+import argparse
+import json
+import sys
+import time
+sys.path.insert(0, '.')
+
+from app.services.simulator import DEFAULT_RATING_PROBS, simulate
+
+
+def parse_ratings(value: str) -> tuple[float, float, float, float]:
+    probs = tuple(float(p) for p in value.split(","))
+    if len(probs) != 4:
+        raise argparse.ArgumentTypeError("Again,Hard,Good,Easy の4つを指定してください")
+    return probs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--cards-per-user", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--new-per-day", type=int, default=20, help="1人が1日に学習を始める枚数")
+    parser.add_argument("--ratings", type=parse_ratings, default=DEFAULT_RATING_PROBS,
+                        help="Again,Hard,Good,Easy の確率 (例: 0.1,0.1,0.65,0.15)")
+    parser.add_argument("--skip-prob", type=float, default=0.0, help="ユーザーが1日休む確率")
+    parser.add_argument("--bytes-per-log", type=int, default=120, help="review_logs 1行あたりの容量（インデックス込みの目安）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="結果を書き出す JSON ファイル")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = simulate(
+        users=args.users,
+        cards_per_user=args.cards_per_user,
+        days=args.days,
+        new_per_day=args.new_per_day,
+        rating_probs=args.ratings,
+        skip_prob=args.skip_prob,
+        seed=args.seed,
+    )
+    elapsed = time.perf_counter() - start
+    summary = result.to_dict(bytes_per_log=args.bytes_per_log)
+
+    print(f"simulated {result.cards} cards ({result.users} users) over {result.days} days in {elapsed:.1f}s")
+    print(f"reviews: total {summary['total_reviews']:,}, "
+          f"mean/day {summary['mean_daily_reviews']:,}, peak/day {summary['peak_daily_reviews']:,}")
+    print(f"review_logs growth: {summary['total_reviews']:,} rows "
+          f"(~{summary['review_log_bytes'] / 1024 ** 3:.1f} GiB at {args.bytes_per_log} B/row)")
+    print("\nweek  reviews/day  new/day")
+    for week_start in range(0, result.days, 7):
+        reviews = result.daily_reviews[week_start:week_start + 7]
+        new = result.daily_new[week_start:week_start + 7]
+        print(f"{week_start // 7 + 1:4d}  {reviews.mean():11,.0f}  {new.mean():7,.0f}")
+    print("\ninterval distribution (last day)")
+    for label, count in summary["interval_histogram"].items():
+        print(f"  {label:>8s}: {count:,}")
+    print(f"  mean ease: {summary['mean_ease']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"params": {k: v for k, v in vars(args).items() if k != "output"}, **summary}, f, indent=2)
+        print(f"\nsaved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+Shared test fixtures
+"""
+from contextlib import contextmanager
+
+import pytest
+
+from app.database import engine
+from app.query_counter import QueryCounter
+
+
+@pytest.fixture
+def assert_max_queries():
+    """
+    Query budget for a block of code
+
+        with assert_max_queries(2):
+            client.get("/cards")
+    """
+    @contextmanager
+    def _assert_max_queries(n: int):
+        with QueryCounter(engine) as counter:
+            yield counter
+        assert counter.count <= n, (
+            f"{counter.count} queries executed, budget is {n}:\n{counter.report()}"
+        )
+
+    return _assert_max_queries
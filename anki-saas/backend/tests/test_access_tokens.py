@@ -0,0 +1,177 @@
+"""
+Access Token Tests
+"""
+import time
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.database import get_db
+from app.main import app
+from app.services import access_tokens
+from app.services.access_tokens import RevocationList, issue, verify
+
+
+@pytest.fixture(autouse=True)
+def signing_keys(monkeypatch):
+    monkeypatch.setattr(settings, "token_signing_keys", "k2:new-secret,k1:old-secret")
+    monkeypatch.setattr(settings, "token_ttl_s", 900)
+    monkeypatch.setattr(access_tokens, "revocations", RevocationList())
+
+
+class TestSignedTokens:
+    """Test issuing and verifying tokens"""
+
+    def test_round_trip(self):
+        """A fresh token should verify to the user it was issued for"""
+        user_id = uuid.uuid4()
+        value, token = issue(user_id)
+
+        assert value.startswith("k2.")
+        assert verify(value) == token
+        assert token.user_id == user_id
+
+    def test_tampered_token_rejected(self):
+        """Changing any part of the token should invalidate the signature"""
+        value, _ = issue(uuid.uuid4())
+        kid, payload, signature = value.split(".")
+        other, _ = issue(uuid.uuid4())
+
+        assert verify(f"{kid}.{other.split('.')[1]}.{signature}") is None
+        assert verify(f"k1.{payload}.{signature}") is None
+        assert verify(f"{kid}.{payload}.{signature[:-2]}AA") is None
+        assert verify("ak_not-a-token") is None
+        assert verify("k2.!!!.???") is None
+
+    def test_expiry(self):
+        """Tokens should stop verifying after the TTL"""
+        now = time.time()
+        value, token = issue(uuid.uuid4(), now=now)
+
+        assert verify(value, now=now + 899) is not None
+        assert verify(value, now=token.expires_at) is None
+
+    def test_key_rotation(self, monkeypatch):
+        """Tokens signed with an older key should verify until the key is removed"""
+        monkeypatch.setattr(settings, "token_signing_keys", "k1:old-secret")
+        old, _ = issue(uuid.uuid4())
+
+        monkeypatch.setattr(settings, "token_signing_keys", "k2:new-secret,k1:old-secret")
+        assert verify(old) is not None
+        assert issue(uuid.uuid4())[0].startswith("k2.")
+
+        monkeypatch.setattr(settings, "token_signing_keys", "k2:new-secret")
+        assert verify(old) is None
+
+    def test_invalid_key_config(self):
+        """Malformed key lists should fail loudly"""
+        with pytest.raises(ValueError):
+            access_tokens.parse_keys("no-secret")
+
+    def test_verify_is_fast(self):
+        """Verification should take microseconds, not a DB round trip"""
+        value, _ = issue(uuid.uuid4())
+        verify(value)
+
+        start = time.perf_counter()
+        for _ in range(10_000):
+            assert verify(value) is not None
+        elapsed = (time.perf_counter() - start) / 10_000
+
+        assert elapsed < 0.0001
+
+
+class TestRevocation:
+    """Test the in-memory revocation list"""
+
+    def test_single_token(self):
+        """Revoking one token should not affect the user's other tokens"""
+        user_id = uuid.uuid4()
+        revoked, token = issue(user_id)
+        kept, _ = issue(user_id)
+
+        access_tokens.revocations.add(user_id, token.token_id, datetime.utcnow())
+
+        assert verify(revoked) is None
+        assert verify(kept) is not None
+
+    def test_all_tokens_before_cutoff(self):
+        """Revoking all tokens should only affect tokens issued before the revocation"""
+        user_id = uuid.uuid4()
+        before, _ = issue(user_id)
+        access_tokens.revocations.replace([(user_id, None, datetime.utcnow())])
+        time.sleep(0.002)
+        after, _ = issue(user_id)
+
+        assert verify(before) is None
+        assert verify(after) is not None
+        assert verify(issue(uuid.uuid4())[0]) is not None
+
+    def test_revoke_writes_and_prunes(self):
+        """Revoking should store the entry and delete expired ones"""
+        db = MagicMock()
+        _, token = issue(uuid.uuid4())
+
+        access_tokens.revoke(db, token.user_id, token, datetime.utcnow())
+
+        row = db.add.call_args[0][0]
+        assert row.token_id == token.token_id
+        assert row.expires_at == datetime.utcfromtimestamp(token.expires_at)
+        db.execute.assert_called_once()
+        db.commit.assert_called_once()
+        assert len(access_tokens.revocations) == 1
+
+    def test_revoke_all_expires_after_ttl(self):
+        """A revoke-all entry only needs to live as long as the longest token"""
+        db = MagicMock()
+        now = datetime(2026, 10, 19, 12, 0)
+
+        access_tokens.revoke(db, uuid.uuid4(), None, now)
+
+        assert db.add.call_args[0][0].expires_at == now + timedelta(seconds=900)
+
+
+class TestTokenAuth:
+    """Test authenticating requests with tokens"""
+
+    @pytest.fixture
+    def db(self):
+        db = MagicMock()
+        app.dependency_overrides[get_db] = lambda: db
+        yield db
+        app.dependency_overrides.clear()
+
+    def test_bearer_token_skips_db(self, db):
+        """Token-authenticated requests should not query api_keys"""
+        value, _ = issue(uuid.uuid4())
+        db.execute.return_value.scalar.return_value = 7
+
+        response = TestClient(app).get("/review/due/count", headers={"Authorization": f"Bearer {value}"})
+
+        db.query.assert_not_called()
+        assert response.status_code == 200
+
+    def test_invalid_bearer_token(self, db):
+        """Bad tokens should be 401 even if an API key is also sent"""
+        response = TestClient(app).get(
+            "/review/due/count", headers={"Authorization": "Bearer k2.bad.token", "X-API-Key": "test"}
+        )
+
+        assert response.status_code == 401
+        assert response.headers["WWW-Authenticate"] == "Bearer"
+
+    def test_missing_credentials(self, db):
+        """No API key and no token should still be a validation error"""
+        assert TestClient(app).get("/review/due/count").status_code == 422
+
+    def test_token_endpoint_disabled(self, db, monkeypatch):
+        """Issuing tokens without signing keys should be unavailable"""
+        monkeypatch.setattr(settings, "token_signing_keys", "")
+
+        response = TestClient(app).post("/auth/token", headers={"X-API-Key": "test"})
+
+        assert response.status_code == 503
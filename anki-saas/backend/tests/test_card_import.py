@@ -0,0 +1,154 @@
+"""
+Bulk Import Tests
+"""
+import io
+import sqlite3
+import tempfile
+import uuid
+import zipfile
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.database import get_db
+from app.deps import get_current_user
+from app.main import app
+from app.models import ImportJob, User
+from app.services import card_import
+from app.services.card_import import (
+    create_job, detect_format, iter_delimited_rows, iter_rows
+)
+
+
+class TestDetectFormat:
+    """Test upload format detection"""
+
+    def test_detect_from_extension(self):
+        """Extension should determine format"""
+        assert detect_format("deck.csv") == "csv"
+        assert detect_format("deck.TSV") == "tsv"
+        assert detect_format("deck.apkg") == "apkg"
+
+    def test_txt_is_tsv(self):
+        """Anki text export (.txt) is tab separated"""
+        assert detect_format("export.txt") == "tsv"
+
+    def test_declared_format_wins(self):
+        """Explicit format should override the extension"""
+        assert detect_format("deck.bin", "csv") == "csv"
+
+    def test_unsupported_format(self):
+        """Unknown formats should return None"""
+        assert detect_format("deck.xlsx") is None
+        assert detect_format("deck.csv", "xml") is None
+
+
+class TestDelimitedParser:
+    """Test CSV/TSV row parsing"""
+
+    def test_parses_front_back(self):
+        """Rows should map to (card_type, front, back)"""
+        rows = list(iter_delimited_rows(io.StringIO("apple,りんご\nrun,走る\n"), ","))
+        assert rows == [("vocab", "apple", "りんご"), ("vocab", "run", "走る")]
+
+    def test_skips_header_and_comments(self):
+        """Header row and Anki comment lines should be skipped"""
+        text = "#separator:tab\nfront\tback\napple\tりんご\n"
+        rows = list(iter_delimited_rows(io.StringIO(text), "\t"))
+        assert rows == [("vocab", "apple", "りんご")]
+
+    def test_card_type_column(self):
+        """Optional third column should set card_type, unknown types fall back to vocab"""
+        text = "これは___です,テスト,cloze\nfoo,bar,unknown\n"
+        rows = list(iter_delimited_rows(io.StringIO(text), ","))
+        assert rows[0][0] == "cloze"
+        assert rows[1][0] == "vocab"
+
+    def test_skips_incomplete_rows(self):
+        """Rows missing front or back should be ignored"""
+        text = "only-front\n,back\nfront,\n ok , fine \n"
+        rows = list(iter_delimited_rows(io.StringIO(text), ","))
+        assert rows == [("vocab", "ok", "fine")]
+
+    def test_tracks_bytes_read(self, tmp_path):
+        """File parsing should report progress through the job"""
+        path = tmp_path / "deck.csv"
+        path.write_text("apple,りんご\n" * 100, encoding="utf-8")
+        job = create_job(MagicMock(), uuid.uuid4(), "deck.csv", "csv", path.stat().st_size)
+
+        rows = list(iter_rows(str(path), "csv", job))
+
+        assert len(rows) == 100
+        assert job.bytes_read == job.bytes_total
+
+    def test_job_is_persisted(self):
+        """Jobs should be committed to the database so any worker can report them"""
+        db = MagicMock()
+
+        job = create_job(db, uuid.uuid4(), "deck.csv", "csv", 10)
+
+        db.add.assert_called_once_with(job)
+        db.commit.assert_called_once()
+        assert isinstance(job, ImportJob)
+        assert job.status == "queued" and job.progress == 0.0
+
+
+class TestApkgParser:
+    """Test .apkg parsing"""
+
+    def _make_apkg(self, tmp_path, notes):
+        db_path = tmp_path / "collection.anki2"
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE notes (id integer primary key, flds text)")
+        conn.executemany("INSERT INTO notes (id, flds) VALUES (?, ?)", enumerate(notes, start=1))
+        conn.commit()
+        conn.close()
+
+        apkg = tmp_path / "deck.apkg"
+        with zipfile.ZipFile(apkg, "w") as archive:
+            archive.write(db_path, "collection.anki2")
+        return apkg
+
+    def test_reads_notes(self, tmp_path):
+        """First two fields of each note should become front/back"""
+        apkg = self._make_apkg(tmp_path, ["apple\x1fりんご", "<b>run</b>\x1f走る<br>駆ける"])
+
+        rows = list(iter_rows(str(apkg), "apkg"))
+
+        assert rows == [("vocab", "apple", "りんご"), ("vocab", "run", "走る\n駆ける")]
+
+    def test_missing_collection(self, tmp_path):
+        """Archive without a collection database should be rejected"""
+        apkg = tmp_path / "broken.apkg"
+        with zipfile.ZipFile(apkg, "w") as archive:
+            archive.writestr("media", "{}")
+
+        with pytest.raises(ValueError):
+            list(iter_rows(str(apkg), "apkg"))
+
+
+class TestImportEndpoint:
+    """Test the upload route"""
+
+    def test_upload_removed_when_job_fails(self, tmp_path, monkeypatch):
+        """The spooled upload should be deleted if the job row cannot be created"""
+        mkstemp = tempfile.mkstemp
+        monkeypatch.setattr(tempfile, "mkstemp", lambda **kwargs: mkstemp(dir=tmp_path, **kwargs))
+
+        def fail(*args):
+            raise OSError("database unavailable")
+
+        monkeypatch.setattr(card_import, "create_job", fail)
+        app.dependency_overrides[get_db] = lambda: MagicMock()
+        app.dependency_overrides[get_current_user] = lambda: User(id=uuid.uuid4())
+        try:
+            response = TestClient(app, raise_server_exceptions=False).post(
+                "/cards/import", files={"file": ("deck.csv", "front,back\napple,りんご\n".encode())},
+                headers={"X-API-Key": "test"},
+            )
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 500
+        assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,50 @@
+"""
+Card Search Query Tests
+"""
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import postgresql
+
+from app.services.card_search import ja_query_lexemes, ja_tsquery, search_cards
+
+
+class TestJapaneseQuery:
+    """Test back-side query lexemes"""
+
+    def test_bigrams(self):
+        """Japanese runs should be split into bigrams"""
+        assert ja_query_lexemes("りんご") == ["りん", "んご"]
+
+    def test_single_character_prefix(self):
+        """A single Japanese character should become a prefix match"""
+        assert ja_query_lexemes("犬") == ["犬:*"]
+
+    def test_mixed_text(self):
+        """Latin words should be lowercased alongside Japanese bigrams"""
+        assert ja_query_lexemes("Apple 果物") == ["果物", "apple"]
+
+    def test_tsquery(self):
+        """Lexemes should be ANDed and quoted"""
+        assert ja_tsquery("日本語") == "'日本' & '本語'"
+        assert ja_tsquery("犬") == "'犬':*"
+
+    def test_symbols_only(self):
+        """Queries without searchable text should produce an empty query"""
+        assert ja_tsquery("!?") == ""
+
+
+class TestSearchStatement:
+    """Test generated search SQL"""
+
+    def test_uses_indexes(self):
+        """Search should filter by user and use tsvector/trigram operators"""
+        db = MagicMock()
+        db.execute.return_value.all.return_value = []
+        search_cards(db, "user-id", "りんご apple", 20, 0)
+
+        sql = str(db.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+        assert "cards.user_id =" in sql
+        assert "cards.front_tsv @@ websearch_to_tsquery('english'" in sql
+        assert "cards.back_tsv @@ to_tsquery('simple'" in sql
+        assert "cards.front %" in sql
+        assert "LIMIT" in sql
@@ -0,0 +1,84 @@
+"""
+Bulk Card Creation Tests
+"""
+import uuid
+from datetime import date, datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from app.schemas import CardOut, QuickCardRequest
+from app.services.card_store import insert_cards, quick_card_fields
+
+
+class TestQuickCardFields:
+    """Test quick card front/back derivation"""
+
+    def test_vocab(self):
+        """Vocab card should be word -> meaning"""
+        req = QuickCardRequest(word="apple", meaning="りんご")
+        assert quick_card_fields(req) == {"card_type": "vocab", "front": "apple", "back": "りんご"}
+
+    def test_cloze_with_context(self):
+        """Cloze card should blank the word in its context"""
+        req = QuickCardRequest(word="apple", meaning="りんご", context="I ate an apple.", card_type="cloze")
+        assert quick_card_fields(req) == {"card_type": "cloze", "front": "I ate an ___.", "back": "apple"}
+
+
+class TestInsertCards:
+    """Test set-based card insertion"""
+
+    def _returned_row(self, front):
+        return SimpleNamespace(
+            id=uuid.uuid4(), card_type="vocab", front=front, back="x",
+            next_review=date.today(), created_at=datetime.utcnow()
+        )
+
+    def test_single_statement_for_many_cards(self):
+        """All cards should be inserted with one execute call"""
+        db = MagicMock()
+        db.execute.return_value = [self._returned_row(f"w{i}") for i in range(3)]
+        cards = [{"card_type": "vocab", "front": f"w{i}", "back": "x"} for i in range(3)]
+
+        created = insert_cards(db, uuid.uuid4(), cards)
+
+        inserts = [
+            c for c in db.execute.call_args_list
+            if c[0][0].is_insert and c[0][0].table.name == "cards"
+        ]
+        assert len(inserts) == 1
+        params = inserts[0][0][1]
+        assert [p["front"] for p in params] == ["w0", "w1", "w2"]
+        assert all(isinstance(c, CardOut) for c in created)
+        assert [c.front for c in created] == ["w0", "w1", "w2"]
+
+    def test_bumps_card_version(self):
+        """Creating cards should bump the user's card version in the same transaction"""
+        db = MagicMock()
+        db.execute.return_value = [self._returned_row("w0")]
+
+        insert_cards(db, uuid.uuid4(), [{"card_type": "vocab", "front": "w0", "back": "x"}])
+
+        updates = [c for c in db.execute.call_args_list if c[0][0].is_update]
+        assert len(updates) == 1
+        assert updates[0][0][0].table.name == "users"
+
+    def test_updates_due_counts(self):
+        """New cards should be added to the due histogram for their review day"""
+        db = MagicMock()
+        db.execute.return_value = [self._returned_row(f"w{i}") for i in range(3)]
+
+        insert_cards(db, uuid.uuid4(), [{"card_type": "vocab", "front": f"w{i}", "back": "x"} for i in range(3)])
+
+        upserts = [
+            c[0][0] for c in db.execute.call_args_list
+            if c[0][0].is_insert and c[0][0].table.name == "due_counts"
+        ]
+        assert len(upserts) == 1
+        params = upserts[0].compile().params
+        assert params["count_m0"] == 3
+
+    def test_empty_input_skips_query(self):
+        """No cards should mean no query"""
+        db = MagicMock()
+        assert insert_cards(db, uuid.uuid4(), []) == []
+        db.execute.assert_not_called()
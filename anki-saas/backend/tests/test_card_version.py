@@ -0,0 +1,109 @@
+"""
+Conditional GET (ETag) Tests
+"""
+import uuid
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.database import get_db
+from app.deps import get_current_user
+from app.main import app
+from app.models import User
+from app.services.card_version import card_etag, etag_matches
+
+
+class TestEtagMatching:
+    """Test If-None-Match comparison"""
+
+    def test_weak_comparison(self):
+        """W/ prefix should be ignored when comparing"""
+        assert etag_matches('W/"cards-1"', 'W/"cards-1"')
+        assert etag_matches('"cards-1"', 'W/"cards-1"')
+
+    def test_list_and_wildcard(self):
+        """Comma separated lists and * should match"""
+        assert etag_matches('"a", W/"cards-1"', 'W/"cards-1"')
+        assert etag_matches('*', 'W/"cards-1"')
+
+    def test_mismatch(self):
+        """Different versions or missing header should not match"""
+        assert not etag_matches('W/"cards-1"', 'W/"cards-2"')
+        assert not etag_matches(None, 'W/"cards-1"')
+
+    def test_etag_changes_with_version(self):
+        """Bumping the version should change the ETag"""
+        user = User(id=uuid.uuid4(), card_version=1)
+        before = card_etag(user, "cards")
+        user.card_version = 2
+        assert card_etag(user, "cards") != before
+
+
+class TestConditionalEndpoints:
+    """Test 304 responses on card listings"""
+
+    @pytest.fixture
+    def db(self):
+        db = MagicMock()
+        user = User(id=uuid.uuid4(), card_version=7)
+        app.dependency_overrides[get_db] = lambda: db
+        app.dependency_overrides[get_current_user] = lambda: user
+        yield db, user
+        app.dependency_overrides.clear()
+
+    def test_not_modified_skips_query(self, db):
+        """Matching If-None-Match should return 304 without loading cards"""
+        mock_db, user = db
+        client = TestClient(app)
+
+        etag = card_etag(user, "cards")
+        response = client.get("/cards", headers={"X-API-Key": "test", "If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+        assert response.content == b""
+        mock_db.execute.assert_not_called()
+
+    def test_due_etag_includes_date(self, db):
+        """Due card ETag from a previous day should not match"""
+        mock_db, user = db
+        client = TestClient(app)
+
+        current = card_etag(user, f"due-{date.today().isoformat()}")
+        response = client.get("/review/due", headers={"X-API-Key": "test", "If-None-Match": current})
+        assert response.status_code == 304
+
+        stale = card_etag(user, "due-2000-01-01")
+        response = client.get("/review/due", headers={"X-API-Key": "test", "If-None-Match": stale})
+        assert response.status_code == 200
+        assert response.headers["etag"] == current
+        mock_db.execute.assert_called_once()
+
+
+class TestLockOrder:
+    """Test that writers lock the user's row before anything else"""
+
+    def test_review_locks_user_then_card(self):
+        """submit_review should bump the version before loading the card FOR UPDATE"""
+        card = SimpleNamespace(
+            id=uuid.uuid4(), repetitions=0, ease_factor=2.5, interval=0, next_review=date.today()
+        )
+        calls = []
+        db = MagicMock()
+        db.execute.side_effect = lambda stmt, *args: calls.append(stmt.table.name)
+        query = db.query.return_value.filter.return_value
+        query.with_for_update.side_effect = lambda: calls.append("cards FOR UPDATE") or query
+        query.first.return_value = card
+        app.dependency_overrides[get_db] = lambda: db
+        app.dependency_overrides[get_current_user] = lambda: User(id=uuid.uuid4())
+        try:
+            response = TestClient(app).post(f"/review/{card.id}", json={"rating": 2}, headers={"X-API-Key": "test"})
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 200
+        assert calls[:2] == ["users", "cards FOR UPDATE"]
+        assert {"daily_study_counts", "due_counts"} <= set(calls[2:])
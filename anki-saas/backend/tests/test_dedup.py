@@ -0,0 +1,133 @@
+"""
+Duplicate Card Detection Tests
+"""
+import os
+import subprocess
+import sys
+import uuid
+from unittest.mock import MagicMock
+
+from app.services import dedup
+from app.services.dedup import DedupIndex, candidate_index, card_keys, normalize, split_duplicates
+
+
+class TestNormalize:
+    """Test text normalization"""
+
+    def test_case_and_whitespace(self):
+        """Case and surrounding whitespace should be ignored"""
+        assert normalize("Apple ") == normalize("apple")
+
+    def test_articles(self):
+        """Leading articles should be ignored"""
+        assert normalize("an apple") == "apple"
+        assert normalize("the Apple") == "apple"
+        assert normalize("to run") == "run"
+
+    def test_punctuation_and_width(self):
+        """Punctuation and full-width characters should be folded"""
+        assert normalize("ＡＰＰＬＥ!") == "apple"
+        assert normalize("give up.") == "give up"
+
+
+class TestDedupIndex:
+    """Test per-user duplicate index"""
+
+    def test_exact_match(self):
+        """Normalized duplicates should match with similarity 1.0"""
+        index = DedupIndex()
+        card_id = uuid.uuid4()
+        index.add(card_id, "apple")
+
+        for variant in ["apple", "Apple ", "an apple"]:
+            match = index.find(variant)
+            assert match is not None
+            assert match.card_id == card_id
+            assert match.similarity == 1.0
+
+    def test_near_duplicate(self):
+        """Small spelling differences in longer text should match"""
+        index = DedupIndex()
+        index.add(uuid.uuid4(), "take something into consideration")
+
+        match = index.find("take something into considerations")
+
+        assert match is not None
+        assert 0.8 <= match.similarity < 1.0
+
+    def test_unrelated_text(self):
+        """Different words should not match"""
+        index = DedupIndex()
+        index.add(uuid.uuid4(), "apple")
+
+        assert index.find("banana") is None
+
+    def test_find_scores_only_candidates(self, monkeypatch):
+        """Lookup should compare against the LSH candidates, not every indexed card"""
+        index = DedupIndex()
+        for i in range(5000):
+            index.add(uuid.uuid4(), f"word{i} phrase{i % 97}")
+        scored = []
+        original = dedup.jaccard
+        monkeypatch.setattr(dedup, "jaccard", lambda a, b: scored.append(b) or original(a, b))
+
+        queries = [f"word{i} phrase{i % 97}s" for i in range(0, 5000, 25)]
+        assert all(index.find(q) is not None for q in queries)
+        assert len(scored) < len(queries) * len(index) / 2
+
+
+class TestSplitDuplicates:
+    """Test filtering of candidate batches"""
+
+    def test_filters_existing_and_batch_duplicates(self):
+        """Duplicates of existing cards and within the batch should be removed"""
+        index = DedupIndex()
+        existing_id = uuid.uuid4()
+        index.add(existing_id, "apple")
+
+        items = [{"front": "Apple"}, {"front": "run"}, {"front": "to run"}, {"front": "walk"}]
+        unique, duplicates = split_duplicates(index, items, key=lambda c: c["front"])
+
+        assert [c["front"] for c in unique] == ["run", "walk"]
+        assert duplicates[0][1].card_id == existing_id
+        assert duplicates[1][0]["front"] == "to run"
+        assert duplicates[1][1].card_id is None
+
+
+class TestStoredKeys:
+    """Test the keys stored on cards for duplicate lookups"""
+
+    def test_keys_stable_across_processes(self):
+        """Stored keys must not depend on the interpreter's hash seed"""
+        code = "from app.services.dedup import card_keys; print(card_keys('take into consideration'))"
+        outputs = {
+            subprocess.run(
+                [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                env={**os.environ, "PYTHONHASHSEED": seed},
+            ).stdout
+            for seed in ("1", "2")
+        }
+
+        assert len(outputs) == 1
+        assert str(card_keys("take into consideration")) + "\n" in outputs
+
+    def test_near_duplicates_share_a_band(self):
+        """Near duplicates should be found through at least one stored band key"""
+        a = card_keys("take something into consideration")
+        b = card_keys("take something into considerations")
+
+        assert a["front_fingerprint"] != b["front_fingerprint"]
+        assert set(a["front_bands"]) & set(b["front_bands"])
+        assert all(-2 ** 63 <= key < 2 ** 63 for key in a["front_bands"])
+
+    def test_candidate_index_reads_only_matches(self):
+        """Only rows returned by the key lookup should be indexed, with one query per batch"""
+        existing_id = uuid.uuid4()
+        db = MagicMock()
+        db.execute.return_value = [(existing_id, "apple")]
+
+        index = candidate_index(db, uuid.uuid4(), ["Apple", "banana"])
+
+        assert db.execute.call_count == 1
+        assert index.find("apple").card_id == existing_id
+        assert len(index) == 1
@@ -0,0 +1,128 @@
+"""
+Local Dictionary Tests
+"""
+import math
+
+import pytest
+
+from app.services import word_lookup
+from app.services.dictionary import MmapDictionary, _Keys, lemma_candidates, write_index
+
+
+ENTRIES = [
+    ("apple", "りんご", "ˈæpl", "I ate an apple."),
+    ("box", "箱", None, None),
+    ("city", "都市", None, None),
+    ("knife", "ナイフ", None, None),
+    ("child", "子供", None, None),
+    ("stop", "止まる", None, None),
+    ("run", "走る", None, None),
+    ("make", "作る", None, None),
+    ("study", "勉強する", None, None),
+    ("lie", "横たわる", None, None),
+    ("go", "行く", None, None),
+    ("happy", "幸せな", None, None),
+    ("give up", "あきらめる", None, None),
+    ("Café", "喫茶店", None, None),
+    ("run", "運営する", None, None),
+]
+
+
+@pytest.fixture
+def dictionary(tmp_path):
+    path = str(tmp_path / "dictionary.idx")
+    write_index(ENTRIES, path)
+    return MmapDictionary(path)
+
+
+class TestMmapDictionary:
+    """Test the memory-mapped index"""
+
+    def test_exact_lookup(self, dictionary):
+        """Headwords should be found with all stored fields"""
+        assert dictionary.lookup("apple") == {
+            "word": "apple", "meaning": "りんご", "pronunciation": "ˈæpl", "example": "I ate an apple.",
+        }
+        assert dictionary.lookup("Ｃａｆé ")["meaning"] == "喫茶店"
+
+    def test_duplicate_headwords_merged(self, dictionary):
+        """Repeated headwords should keep every sense"""
+        assert len(dictionary) == len(ENTRIES) - 1
+        assert dictionary.lookup("run")["meaning"] == "走る / 運営する"
+
+    def test_missing_word(self, dictionary):
+        """Unknown words should return None"""
+        assert dictionary.lookup("zyzzyva") is None
+        assert dictionary.lookup("aaa") is None
+        assert dictionary.lookup("zzz") is None
+
+    @pytest.mark.parametrize("word, lemma", [
+        ("apples", "apple"), ("boxes", "box"), ("cities", "city"), ("knives", "knife"),
+        ("children", "child"), ("stopped", "stop"), ("running", "run"), ("making", "make"),
+        ("studied", "study"), ("studies", "study"), ("lying", "lie"), ("went", "go"),
+        ("happier", "happy"), ("gave up", "give up"), ("Makes", "make"),
+    ])
+    def test_inflections(self, dictionary, word, lemma):
+        """Plurals and verb forms should resolve to their headword"""
+        assert dictionary.lookup(word)["word"] == lemma
+
+    def test_exact_match_wins(self):
+        """Words that are headwords themselves should not be reduced"""
+        assert lemma_candidates("bed")[0] == "bed"
+        assert lemma_candidates("news")[0] == "news"
+
+    def test_lookup_reads_few_keys(self, tmp_path, monkeypatch):
+        """A lookup should binary-search the mapped keys instead of scanning them"""
+        path = str(tmp_path / "large.idx")
+        write_index(((f"word{i:06d}", f"意味{i}", None, None) for i in range(100_000)), path)
+        dictionary = MmapDictionary(path)
+        reads = []
+        original = _Keys.__getitem__
+        monkeypatch.setattr(_Keys, "__getitem__", lambda keys, i: reads.append(i) or original(keys, i))
+
+        assert dictionary.get("word054321")["meaning"] == "意味54321"
+        assert len(reads) <= math.ceil(math.log2(100_000)) + 1
+
+    def test_index_not_copied(self, dictionary):
+        """Offsets and keys should stay views of the mapped file rather than Python copies"""
+        assert dictionary._value_offsets.obj is dictionary._mm
+        assert dictionary._keys._offsets.obj is dictionary._mm
+        assert isinstance(dictionary.get("apple")["meaning"], str)
+
+
+class TestLookupWord:
+    """Test dictionary-first lookup"""
+
+    @pytest.fixture
+    def claude_calls(self, monkeypatch, dictionary):
+        calls = []
+
+        def fake_claude(messages):
+            calls.append(messages)
+            return '{"word": "bank", "meaning": "土手", "pronunciation": null, "example": null}'
+
+        monkeypatch.setattr(word_lookup, "chat_with_claude", fake_claude)
+        monkeypatch.setattr(word_lookup, "get_dictionary", lambda: dictionary)
+        return calls
+
+    def test_dictionary_hit_skips_claude(self, claude_calls):
+        """Dictionary words should not call Claude, even with a context sentence"""
+        result = word_lookup.lookup_word("Apples", context="She bought apples.")
+
+        assert result["meaning"] == "りんご"
+        assert result["source"] == "dictionary"
+        assert claude_calls == []
+
+    def test_missing_word_uses_claude(self, claude_calls):
+        """Words not in the dictionary should fall back to Claude"""
+        result = word_lookup.lookup_word("bank")
+
+        assert result["source"] == "claude"
+        assert len(claude_calls) == 1
+
+    def test_contextual_sense_uses_claude(self, claude_calls):
+        """Contextual lookups should go to Claude even for dictionary words"""
+        result = word_lookup.lookup_word("apple", context="Apple released a phone.", contextual=True)
+
+        assert result["source"] == "claude"
+        assert "Apple released a phone." in claude_calls[0][0]["content"]
@@ -0,0 +1,113 @@
+"""
+Due Count Histogram Tests
+"""
+import uuid
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import postgresql
+
+from app.services import due_counts
+
+
+TODAY = date(2026, 10, 19)
+
+
+class TestDeltas:
+    """Test delta helpers"""
+
+    def test_moved(self):
+        """Moving a card should decrement the old day and increment the new day"""
+        tomorrow = TODAY + timedelta(days=1)
+        assert due_counts.moved(TODAY, tomorrow) == {TODAY: -1, tomorrow: 1}
+
+    def test_moved_same_day(self):
+        """Keeping the same day should not write anything"""
+        assert due_counts.moved(TODAY, TODAY) == {}
+
+    def test_count_days(self):
+        """Days should be grouped and signed"""
+        assert due_counts.count_days([TODAY, TODAY, TODAY + timedelta(days=1)], -1) == {
+            TODAY: -2, TODAY + timedelta(days=1): -1
+        }
+
+
+class TestAdjust:
+    """Test histogram upserts"""
+
+    def test_single_upsert(self):
+        """All days should be written in one ON CONFLICT statement"""
+        db = MagicMock()
+        due_counts.adjust(db, uuid.uuid4(), {TODAY: -1, TODAY + timedelta(days=6): 1})
+
+        assert db.execute.call_count == 1
+        sql = str(db.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+        assert "ON CONFLICT (user_id, day) DO UPDATE SET count = (due_counts.count + excluded.count)" in sql
+
+    def test_no_changes(self):
+        """Zero deltas should skip the query"""
+        db = MagicMock()
+        due_counts.adjust(db, uuid.uuid4(), {TODAY: 0})
+        db.execute.assert_not_called()
+
+    def test_rows_in_day_order(self):
+        """Rows should be upserted in day order so concurrent writers lock them in the same order"""
+        db = MagicMock()
+        due_counts.adjust(db, uuid.uuid4(), {TODAY + timedelta(days=3): 1, TODAY: -1, TODAY + timedelta(days=1): 1})
+
+        params = db.execute.call_args[0][0].compile().params
+        days = [params[f"day_m{i}"] for i in range(3)]
+        assert days == sorted(days)
+
+
+class TestForecast:
+    """Test forecast shaping"""
+
+    def test_fills_missing_days(self):
+        """Days without cards should be reported as zero"""
+        db = MagicMock()
+        db.execute.return_value = [
+            SimpleNamespace(day=TODAY, count=12),
+            SimpleNamespace(day=TODAY + timedelta(days=2), count=3),
+        ]
+
+        forecast = due_counts.forecast(db, uuid.uuid4(), TODAY, 4)
+
+        assert [f["count"] for f in forecast] == [12, 0, 3, 0]
+        assert forecast[0]["date"] == TODAY
+
+    def test_overdue_folded_into_today(self):
+        """Overdue days should be grouped into today in SQL"""
+        db = MagicMock()
+        db.execute.return_value = []
+        due_counts.forecast(db, uuid.uuid4(), TODAY, 7)
+
+        sql = str(db.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+        assert "GROUP BY greatest(due_counts.day" in sql
+
+
+class TestRebuild:
+    """Test reconciliation"""
+
+    def test_single_user(self):
+        """Rebuild should lock only the user's row, then clear and re-aggregate only that user"""
+        db = MagicMock()
+        user_id = uuid.uuid4()
+        due_counts.rebuild(db, TODAY, user_id)
+
+        statements = [str(c[0][0]) for c in db.execute.call_args_list]
+        assert statements[0].startswith("UPDATE users SET card_version")
+        assert not any(s.startswith("LOCK TABLE") for s in statements)
+        assert "DELETE FROM due_counts WHERE user_id = :user_id" in statements[1]
+        assert "GROUP BY 1, 2" in statements[2]
+        assert db.execute.call_args_list[2][0][1] == {"today": TODAY, "user_id": user_id}
+
+    def test_all_users(self):
+        """A full rebuild should lock the whole table"""
+        db = MagicMock()
+        due_counts.rebuild(db, TODAY)
+
+        statements = [str(c[0][0]) for c in db.execute.call_args_list]
+        assert statements[0] == "LOCK TABLE due_counts IN EXCLUSIVE MODE"
+        assert statements[1] == "DELETE FROM due_counts"
@@ -0,0 +1,92 @@
+"""
+UUIDv7 Primary Key Tests
+"""
+import time
+import uuid
+from datetime import date, datetime
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from app.database import get_db
+from app.deps import get_current_user
+from app.ids import uuid7, uuid7_timestamp_ms
+from app.main import app
+from app.models import Card, User
+
+
+class TestUuid7:
+    """Test UUIDv7 generation"""
+
+    def test_version_and_variant(self):
+        """Generated ids should be RFC 9562 version 7"""
+        value = uuid7()
+        assert value.version == 7
+        assert value.variant == uuid.RFC_4122
+
+    def test_embeds_current_time(self):
+        """Timestamp bits should hold the current Unix milliseconds"""
+        before = time.time_ns() // 1_000_000
+        value = uuid7()
+        after = time.time_ns() // 1_000_000
+        assert before <= uuid7_timestamp_ms(value) <= after + 1
+
+    def test_monotonic_within_process(self):
+        """Ids generated in a burst should already be sorted and unique"""
+        values = [uuid7() for _ in range(20000)]
+        assert values == sorted(values)
+        assert len(set(values)) == len(values)
+
+    def test_model_default(self):
+        """Models should default to UUIDv7 ids"""
+        assert Card.__table__.c.id.default.arg.__name__ == "uuid7"
+
+
+class TestKeysetPagination:
+    """Test GET /cards?limit=&before="""
+
+    @pytest.fixture
+    def db(self):
+        db = MagicMock()
+        user = User(id=uuid.uuid4(), card_version=1)
+        app.dependency_overrides[get_db] = lambda: db
+        app.dependency_overrides[get_current_user] = lambda: user
+        yield db
+        app.dependency_overrides.clear()
+
+    def _result(self, ids):
+        result = MagicMock()
+        result.keys.return_value = ["id", "card_type", "front", "back", "next_review", "created_at"]
+        result.__iter__.return_value = iter([
+            (card_id, "vocab", "f", "b", date.today(), datetime.utcnow()) for card_id in ids
+        ])
+        return result
+
+    def test_next_link_when_more(self, db):
+        """A full page should link to the next page keyed on the last id"""
+        ids = sorted((uuid7() for _ in range(3)), reverse=True)
+        db.execute.return_value = self._result(ids)
+
+        response = TestClient(app).get("/cards", params={"limit": 2}, headers={"X-API-Key": "test"})
+
+        assert [c["id"] for c in response.json()] == [str(i) for i in ids[:2]]
+        assert f"before={ids[1]}" in response.headers["link"]
+        sql = str(db.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+        assert "ORDER BY cards.id DESC" in sql
+        assert "LIMIT" in sql
+
+    def test_last_page(self, db):
+        """The last page should have no next link and filter on the cursor"""
+        cursor = uuid7()
+        db.execute.return_value = self._result([uuid7()])
+
+        response = TestClient(app).get(
+            "/cards", params={"limit": 2, "before": str(cursor)}, headers={"X-API-Key": "test"}
+        )
+
+        assert len(response.json()) == 1
+        assert "link" not in response.headers
+        sql = str(db.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+        assert "cards.id < " in sql
@@ -0,0 +1,90 @@
+"""
+Request Metrics Tests
+"""
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.database import get_db
+from app.main import app
+from app.metrics import instrument_engine, request_stats, track_external
+
+
+@pytest.fixture
+def client():
+    app.dependency_overrides[get_db] = lambda: MagicMock()
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+class TestInstrumentation:
+    """Test per-request SQL and external call accounting"""
+
+    def test_counts_sql_statements(self):
+        """Statements executed during a request should be counted and timed"""
+        engine = create_engine("sqlite://")
+        instrument_engine(engine)
+
+        with request_stats() as stats, engine.connect() as conn:
+            for _ in range(3):
+                conn.execute(text("SELECT 1"))
+
+        assert stats.sql_count == 3
+        assert stats.sql_time > 0
+
+    def test_failed_statement_does_not_leak(self):
+        """A failing statement should not break later timing"""
+        engine = create_engine("sqlite://")
+        instrument_engine(engine)
+
+        with request_stats() as stats, engine.connect() as conn:
+            with pytest.raises(Exception):
+                conn.execute(text("SELECT * FROM missing_table"))
+            conn.execute(text("SELECT 1"))
+
+        assert stats.sql_count == 1
+
+    def test_outside_request_is_ignored(self):
+        """Statements outside a request should not fail"""
+        engine = create_engine("sqlite://")
+        instrument_engine(engine)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    def test_tracks_external_time(self):
+        """External call time should be summed per service"""
+        with request_stats() as stats:
+            with track_external("claude"):
+                pass
+            with track_external("claude"):
+                pass
+
+        assert set(stats.external) == {"claude"}
+        assert stats.external["claude"] >= 0
+
+
+class TestMetricsEndpoint:
+    """Test Prometheus exposition"""
+
+    def test_records_route_template(self, client):
+        """Metrics should be labelled by route template, not raw path"""
+        client.get("/health")
+
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        body = response.text
+        assert 'http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in body
+        assert 'http_request_sql_statements_count{method="GET",route="/health"}' in body
+        assert 'http_response_size_bytes_count{method="GET",route="/health"}' in body
+
+    def test_unmatched_paths_share_label(self, client):
+        """Unknown paths should not create new label values"""
+        client.get("/no-such-path-123")
+
+        body = client.get("/metrics").text
+        assert 'route="unmatched"' in body
+        assert "no-such-path-123" not in body
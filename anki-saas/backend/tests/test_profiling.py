@@ -0,0 +1,127 @@
+"""
+On-demand Profiling Tests
+"""
+import asyncio
+import time
+import uuid
+from collections import Counter
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import profiling
+from app.config import settings
+from app.deps import get_current_user
+from app.main import app
+from app.models import User
+from app.services import word_lookup
+
+
+@pytest.fixture
+def profile_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", "admin-secret")
+    monkeypatch.setattr(settings, "profile_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "profile_interval_ms", 1.0)
+    return tmp_path
+
+
+@pytest.fixture
+def slow_lookup(monkeypatch):
+    def fake_claude(messages):
+        time.sleep(0.1)
+        return '{"word": "apple", "meaning": "りんご"}'
+
+    monkeypatch.setattr(word_lookup, "chat_with_claude", fake_claude)
+    app.dependency_overrides[get_current_user] = lambda: User(id=uuid.uuid4())
+    yield
+    app.dependency_overrides.clear()
+
+
+class TestProfilingMiddleware:
+    """Test header-triggered profiling"""
+
+    def test_profiles_sync_endpoint(self, profile_settings, slow_lookup):
+        """Admin header should record wall-clock stacks from the threadpool"""
+        client = TestClient(profiling.ProfilingMiddleware(app))
+
+        response = client.post(
+            "/lookup",
+            json={"word": "apple"},
+            headers={"X-API-Key": "test", "X-Profile": "admin-secret"}
+        )
+
+        assert response.status_code == 200
+        files = list(profile_settings.iterdir())
+        assert len(files) == 1
+        assert "-POST-lookup-" in files[0].name
+        assert "lookup_word (word_lookup.py:" in files[0].read_text()
+
+    def test_profile_saved_off_event_loop(self, profile_settings, slow_lookup, monkeypatch):
+        """Stopping the sampler and writing the profile should not run on the event loop"""
+        on_loop = []
+        save_profile = profiling.save_profile
+
+        def record(*args):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(True)
+            except RuntimeError:
+                on_loop.append(False)
+            return save_profile(*args)
+
+        monkeypatch.setattr(profiling, "save_profile", record)
+        client = TestClient(profiling.ProfilingMiddleware(app))
+
+        client.post(
+            "/lookup",
+            json={"word": "apple"},
+            headers={"X-API-Key": "test", "X-Profile": "admin-secret"}
+        )
+
+        assert on_loop == [False]
+        assert len(list(profile_settings.iterdir())) == 1
+
+    def test_wrong_token_is_not_profiled(self, profile_settings, slow_lookup):
+        """Non-admin header should not trigger profiling"""
+        client = TestClient(profiling.ProfilingMiddleware(app))
+
+        client.post(
+            "/lookup",
+            json={"word": "apple"},
+            headers={"X-API-Key": "test", "X-Profile": "guess"}
+        )
+
+        assert list(profile_settings.iterdir()) == []
+
+
+class TestProfileStorage:
+    """Test profile retention and admin listing"""
+
+    def test_retention_limit(self, profile_settings, monkeypatch):
+        """Oldest profiles should be removed beyond the limit"""
+        monkeypatch.setattr(settings, "profile_max_files", 2)
+        for i in range(3):
+            profiling.save_profile(Counter({"main;f": 1}), "GET", f"/r{i}", 0.01)
+
+        names = [p["name"] for p in profiling.list_profiles()]
+        assert len(names) == 2
+        assert all("r0" not in n for n in names)
+
+    def test_rejects_path_traversal(self, profile_settings):
+        """Only plain profile file names should resolve"""
+        assert profiling.profile_path("../app/config.py") is None
+        assert profiling.profile_path("missing.collapsed") is None
+
+    def test_admin_endpoints(self, profile_settings):
+        """Profile listing should require the admin token"""
+        name = profiling.save_profile(Counter({"main;f": 3}), "GET", "/cards", 0.01)
+        client = TestClient(app)
+
+        assert client.get("/admin/profiles").status_code == 403
+
+        headers = {"X-Admin-Token": "admin-secret"}
+        listing = client.get("/admin/profiles", headers=headers).json()
+        assert [p["name"] for p in listing] == [name]
+
+        body = client.get(f"/admin/profiles/{name}", headers=headers).text
+        assert body == "main;f 3\n"
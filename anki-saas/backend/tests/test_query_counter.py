@@ -0,0 +1,80 @@
+"""
+Query Counter / N+1 Detection Tests
+"""
+import logging
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app import metrics
+from app.config import settings
+from app.query_counter import QueryCounter
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    metrics.instrument_engine(engine)
+    return engine
+
+
+class TestQueryCounter:
+    """Test engine-level statement counting"""
+
+    def test_counts_statements(self, engine):
+        """Every executed statement should be counted"""
+        with QueryCounter(engine) as counter, engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+
+        assert counter.count == 2
+
+    def test_detaches_on_exit(self, engine):
+        """Statements after the block should not be counted"""
+        with QueryCounter(engine) as counter:
+            pass
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+        assert counter.count == 0
+
+    def test_repeated_statements(self, engine):
+        """Identical statements with different parameters should be grouped"""
+        with QueryCounter(engine) as counter, engine.connect() as conn:
+            for i in range(4):
+                conn.execute(text("SELECT :x"), {"x": i})
+            conn.execute(text("SELECT 'other'"))
+
+        assert counter.repeated(threshold=3) == [("SELECT ?", 4)]
+
+    def test_budget_fixture_fails_over_budget(self, assert_max_queries):
+        """assert_max_queries should fail when the budget is exceeded"""
+        with pytest.raises(AssertionError, match="budget is 0"):
+            with assert_max_queries(0) as counter:
+                counter.statements["SELECT 1"] += 1
+
+
+class TestNPlusOneWarning:
+    """Test dev-mode N+1 warning"""
+
+    def test_warns_on_repeated_statement(self, engine, monkeypatch, caplog):
+        """Repeated identical statements in one request should be logged"""
+        monkeypatch.setattr(settings, "detect_n_plus_one", True)
+        monkeypatch.setattr(settings, "n_plus_one_threshold", 3)
+
+        with metrics.request_stats() as stats, engine.connect() as conn:
+            for i in range(3):
+                conn.execute(text("SELECT :x"), {"x": i})
+
+        middleware = metrics.MetricsMiddleware(app=None)
+        with caplog.at_level(logging.WARNING, logger="app.metrics"):
+            middleware._observe({"method": "GET"}, 200, 0, 0.01, stats)
+
+        assert "possible N+1 in GET unmatched: 3 x SELECT ?" in caplog.text
+
+    def test_disabled_by_default(self, engine):
+        """Statement texts should not be recorded unless enabled"""
+        with metrics.request_stats() as stats, engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+        assert stats.statements is None
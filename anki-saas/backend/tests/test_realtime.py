@@ -0,0 +1,146 @@
+"""
+Realtime Card Event Tests
+"""
+import json
+import uuid
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app import realtime
+from app.main import app
+from app.realtime import Hub, encode, publish, publish_due
+from app.routers import ws
+
+
+def body(payload):
+    user_id, _, data = payload.partition(":")
+    return user_id, json.loads(data)["events"]
+
+
+class TestEncode:
+    """Test notification payloads"""
+
+    def test_events_merged_per_transaction(self):
+        """Events of one transaction should become one compact payload"""
+        db = MagicMock()
+        db.info = {}
+        user_id, a, b = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        publish(db, user_id, "card.reviewed", [a])
+        publish(db, user_id, "card.reviewed", [b])
+        publish_due(db, user_id, {date(2026, 10, 19): -1, date(2026, 10, 25): 1})
+        publish_due(db, user_id, {date(2026, 10, 19): -1, date(2026, 10, 25): -1})
+
+        target, events = body(encode(user_id, db.info["realtime_events"][user_id]))
+
+        assert target == str(user_id)
+        assert events == [
+            {"type": "card.reviewed", "ids": [str(a), str(b)]},
+            {"type": "due", "deltas": {"2026-10-19": -2}},
+        ]
+
+    def test_large_changes_collapse(self):
+        """Many ids should be sent as a count, and oversized payloads as resync"""
+        ids = [uuid.uuid4() for _ in range(realtime.MAX_EVENT_IDS + 1)]
+        _, events = body(encode(uuid.uuid4(), {"card.created": ids}))
+        assert events == [{"type": "cards.changed", "count": len(ids)}]
+
+        days = {date.fromordinal(739000 + i): 1 for i in range(600)}
+        _, events = body(encode(uuid.uuid4(), {"due": [days]}))
+        assert events == [{"type": "resync"}]
+
+    def test_nothing_to_send(self):
+        """Net-zero due changes should not notify"""
+        assert encode(uuid.uuid4(), {"due": [{date(2026, 10, 19): 0}]}) is None
+
+    def test_notify_once_per_user_before_commit(self):
+        """Pending events should be sent with one pg_notify per user and then cleared"""
+        session = MagicMock()
+        session.info = {}
+        publish(session, uuid.uuid4(), "card.created", [uuid.uuid4()])
+        publish(session, uuid.uuid4(), "card.deleted", [uuid.uuid4()])
+
+        realtime._notify_before_commit(session)
+
+        assert session.execute.call_count == 2
+        assert session.info == {}
+
+
+class TestHub:
+    """Test per-worker fanout"""
+
+    def test_dispatch_to_user_only(self):
+        """Payloads should reach every connection of the target user only"""
+        hub = Hub()
+        user_id, other = uuid.uuid4(), uuid.uuid4()
+        mine = [hub.subscribe(user_id), hub.subscribe(user_id)]
+        theirs = hub.subscribe(other)
+
+        hub.dispatch(f'{user_id}:{{"events":[]}}')
+
+        assert [q.get_nowait() for q in mine] == ['{"events":[]}'] * 2
+        assert theirs.empty()
+
+    def test_slow_consumer_gets_resync(self):
+        """A full queue should be replaced by a single resync event"""
+        hub = Hub()
+        user_id = uuid.uuid4()
+        queue = hub.subscribe(user_id)
+        for i in range(realtime.QUEUE_SIZE + 5):
+            hub.dispatch(f"{user_id}:{i}")
+
+        assert queue.qsize() <= 6
+        assert queue.get_nowait() == realtime.RESYNC
+
+    def test_unsubscribe(self):
+        """Closed connections should be removed"""
+        hub = Hub()
+        user_id = uuid.uuid4()
+        queue = hub.subscribe(user_id)
+        hub.unsubscribe(user_id, queue)
+        assert len(hub) == 0
+
+
+class TestWebSocket:
+    """Test the /ws endpoint"""
+
+    def test_rejects_unknown_key(self, monkeypatch):
+        """Connections without a valid API key should be closed"""
+        monkeypatch.setattr(ws, "authenticate", lambda token, key: None)
+        with pytest.raises(WebSocketDisconnect) as exc:
+            with TestClient(app).websocket_connect("/ws?token=bad") as conn:
+                conn.receive_text()
+        assert exc.value.code == 1008
+
+    def test_pushes_events(self, monkeypatch):
+        """Notifications for the user should be pushed after hello"""
+        user_id = uuid.uuid4()
+        hub = Hub()
+        monkeypatch.setattr(ws, "authenticate", lambda token, key: user_id)
+        monkeypatch.setattr(realtime, "hub", hub)
+
+        with TestClient(app).websocket_connect("/ws?token=test") as conn:
+            assert json.loads(conn.receive_text())["events"] == [{"type": "hello"}]
+            assert len(hub) == 1
+            conn.portal.call(hub.dispatch, f'{user_id}:{{"events":[{{"type":"card.deleted","ids":[]}}]}}')
+            assert json.loads(conn.receive_text())["events"][0]["type"] == "card.deleted"
+
+        assert len(hub) == 0
+
+    def test_api_key_not_accepted_in_query(self, monkeypatch):
+        """The query string should only carry access tokens, never API keys"""
+        monkeypatch.setattr(ws.access_tokens, "verify", lambda value: None)
+        monkeypatch.setattr(ws, "SessionLocal", MagicMock(side_effect=AssertionError("API key lookup")))
+
+        assert ws.authenticate("ak_live_key", None) is None
+
+    def test_token_in_query(self, monkeypatch):
+        """A valid access token in the query string should authenticate without the database"""
+        user_id = uuid.uuid4()
+        monkeypatch.setattr(ws.access_tokens, "verify", lambda value: SimpleNamespace(user_id=user_id))
+
+        assert ws.authenticate("signed-token", None) == user_id
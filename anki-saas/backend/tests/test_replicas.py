@@ -0,0 +1,306 @@
+"""
+Read Replica Routing Tests
+"""
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import replicas
+from app.config import settings
+from app.database import SessionLocal
+from app.deps import get_read_db
+from app.metrics import DB_READ_ROUTING
+from app.models import User
+from app.replicas import Replica, read_session_factory
+
+
+NOW = 1_800_000_000.0
+
+
+def fake_replica(name="replica-a:5432", lag=0.0, replay_lsn=1000):
+    session_factory = sessionmaker(bind=create_engine("sqlite://"), info={"replica": True})
+    return Replica(name, MagicMock(), session_factory, replay_lsn=replay_lsn, lag=lag)
+
+
+def replay_at(replica, lsn):
+    conn = replica.engine.connect.return_value.__enter__.return_value
+    conn.execute.return_value.scalar.return_value = f"{lsn >> 32:X}/{lsn & 0xFFFFFFFF:X}"
+
+
+def routed(target, reason) -> float:
+    return DB_READ_ROUTING.labels(target, reason)._value.get()
+
+
+@pytest.fixture(autouse=True)
+def clean_state(monkeypatch):
+    monkeypatch.setattr(replicas, "_last_writes", {})
+    monkeypatch.setattr(replicas, "_primary_samples", deque())
+    monkeypatch.setattr(replicas, "_checked_at", NOW)  # 各テストで明示的に測るまでは測り直さない
+    monkeypatch.setattr(settings, "shared_cache_path", "")
+    monkeypatch.setattr(settings, "replica_max_lag_s", 5.0)
+    monkeypatch.setattr(settings, "replica_check_interval_s", 1.0)
+    monkeypatch.setattr(replicas.time, "time", lambda: NOW)
+
+
+class TestRouting:
+    """Test choosing a replica for reads"""
+
+    def test_no_replicas_uses_primary(self, monkeypatch):
+        """Without replicas every read should stay on the primary session"""
+        monkeypatch.setattr(replicas, "replicas", [])
+
+        assert read_session_factory(uuid.uuid4()) is None
+
+    def test_healthy_replica(self, monkeypatch):
+        """Users without recent writes should read from a replica"""
+        replica = fake_replica()
+        monkeypatch.setattr(replicas, "replicas", [replica])
+        before = routed(replica.name, "replica")
+
+        assert read_session_factory(uuid.uuid4()) is replica.session_factory
+        assert routed(replica.name, "replica") == before + 1
+
+    def test_lagging_replica_skipped(self, monkeypatch):
+        """Replicas behind REPLICA_MAX_LAG_S or unreachable should not be used"""
+        slow, down = fake_replica("slow:5432", lag=30.0), fake_replica("down:5432", lag=None)
+        monkeypatch.setattr(replicas, "replicas", [slow, down])
+        before = routed("primary", "lagging")
+
+        assert read_session_factory(uuid.uuid4()) is None
+        assert routed("primary", "lagging") == before + 1
+
+    def test_read_your_writes(self, monkeypatch):
+        """A user's reads should stay on the primary until the replica has replayed their commit"""
+        replica = fake_replica(replay_lsn=1000)
+        monkeypatch.setattr(replicas, "replicas", [replica])
+        user_id, other = uuid.uuid4(), uuid.uuid4()
+
+        replicas.mark_write(user_id, 1500)
+
+        assert read_session_factory(user_id) is None
+        assert read_session_factory(other) is replica.session_factory
+
+        replica.replay_lsn = 1500
+        assert read_session_factory(user_id) is replica.session_factory
+
+    def test_write_not_yet_received(self, monkeypatch):
+        """A replica that has replayed all it received but not the commit should not serve the writer"""
+        replica = fake_replica(lag=None, replay_lsn=0)
+        monkeypatch.setattr(replicas, "replicas", [replica])
+        monkeypatch.setattr(replicas, "_checked_at", 0.0)
+        monkeypatch.setattr(replicas, "primary_lsn", lambda: 2000)
+        replicas._primary_samples.append((NOW - 1, 1000))
+        user_id = uuid.uuid4()
+
+        # プライマリは 2000 でコミット済み、レプリカは 1000 まで（受信分はすべて再生済み）
+        replicas.mark_write(user_id, 2000)
+        replay_at(replica, 1000)
+        replicas.check_lag(now=NOW)
+
+        assert replica.lag == 1.0
+        assert read_session_factory(user_id) is None
+        assert read_session_factory(uuid.uuid4()) is replica.session_factory
+
+    def test_writes_shared_between_workers(self, monkeypatch, tmp_path):
+        """Writes recorded by another worker should be seen through the shared cache"""
+        replica = fake_replica(replay_lsn=1000)
+        monkeypatch.setattr(replicas, "replicas", [replica])
+        monkeypatch.setattr(settings, "shared_cache_path", str(tmp_path / "cache.sqlite3"))
+        user_id = uuid.uuid4()
+
+        replicas.mark_write(user_id, 1001)
+        replicas._last_writes.clear()
+
+        assert read_session_factory(user_id) is None
+
+    def test_routing_does_not_measure_lag(self, monkeypatch):
+        """Choosing a session should only read the last measurement, never connect to a replica"""
+        replica = fake_replica()
+        monkeypatch.setattr(replicas, "replicas", [replica])
+        monkeypatch.setattr(replicas, "_checked_at", 0.0)
+
+        assert read_session_factory(uuid.uuid4()) is replica.session_factory
+        replica.engine.connect.assert_not_called()
+
+    def test_commit_records_transaction_lsn(self, monkeypatch):
+        """Committing a request session should record the WAL position its transaction wrote up to"""
+        monkeypatch.setattr(replicas, "replicas", [fake_replica()])
+        monkeypatch.setattr(replicas, "transaction_lsn", lambda session: 4242)
+        monkeypatch.setattr(replicas, "primary_lsn", MagicMock(side_effect=AssertionError("extra round trip")))
+        user_id = uuid.uuid4()
+        db = SessionLocal()
+        db.info["user_id"] = user_id
+
+        db.commit()
+        db.close()
+
+        assert replicas.last_write_lsn(user_id) == 4242
+
+    def test_read_only_commit_not_recorded(self, monkeypatch):
+        """A transaction that wrote nothing should not send the user's reads to the primary"""
+        monkeypatch.setattr(replicas, "replicas", [fake_replica()])
+        monkeypatch.setattr(replicas, "transaction_lsn", lambda session: None)
+        user_id = uuid.uuid4()
+        db = SessionLocal()
+        db.info["user_id"] = user_id
+
+        db.commit()
+        db.close()
+
+        assert replicas.last_write_lsn(user_id) == 0
+
+    def test_transaction_lsn_past_commit_record(self):
+        """The recorded position should require replay beyond the last record written before commit"""
+        session = MagicMock()
+        session.execute.return_value.scalar.return_value = "0/5DC"
+
+        assert replicas.transaction_lsn(session) == 0x5DC + 1
+        session.flush.assert_called_once()
+
+        session.execute.return_value.scalar.return_value = None
+        assert replicas.transaction_lsn(session) is None
+
+    def test_unknown_lsn_stays_on_primary(self, monkeypatch):
+        """If the WAL position cannot be read, the writer should keep reading from the primary"""
+        replica = fake_replica(replay_lsn=10 ** 12)
+        monkeypatch.setattr(replicas, "replicas", [replica])
+
+        def fail(session):
+            raise OSError("primary unreachable")
+
+        monkeypatch.setattr(replicas, "transaction_lsn", fail)
+        user_id = uuid.uuid4()
+        db = SessionLocal()
+        db.info["user_id"] = user_id
+        db.commit()
+        db.close()
+
+        assert read_session_factory(user_id) is None
+
+
+class TestLagCheck:
+    """Test measuring replica lag against the primary's WAL position"""
+
+    @pytest.fixture
+    def replica(self, monkeypatch):
+        replica = fake_replica(lag=None, replay_lsn=0)
+        monkeypatch.setattr(replicas, "replicas", [replica])
+        monkeypatch.setattr(replicas, "_checked_at", 0.0)
+        return replica
+
+    def test_lag_from_primary_history(self, replica, monkeypatch):
+        """Lag should be the age of the newest primary position the replica has reached"""
+        positions = iter([100, 200, 300])
+        monkeypatch.setattr(replicas, "primary_lsn", lambda: next(positions))
+
+        replay_at(replica, 50)
+        replicas.check_lag(now=NOW)
+        assert replica.lag is None  # まだどの記録にも届いていない
+
+        replay_at(replica, 150)
+        replicas.check_lag(now=NOW + 1)
+        assert replica.lag == 1.0
+
+        replay_at(replica, 300)
+        replicas.check_lag(now=NOW + 2)
+        assert replica.lag == 0.0
+        assert replica.replay_lsn == 300
+
+    def test_stuck_replica_exceeds_max_lag(self, replica, monkeypatch):
+        """A replica that stops replaying should become lagging even if it has nothing left to replay"""
+        positions = iter(range(100, 10_000, 100))
+        monkeypatch.setattr(replicas, "primary_lsn", lambda: next(positions))
+        replay_at(replica, 100)
+
+        for second in range(8):
+            replicas.check_lag(now=NOW + second)
+
+        assert replica.lag > settings.replica_max_lag_s
+
+    def test_skips_recent_check(self, replica, monkeypatch):
+        """Lag should not be queried more often than the interval"""
+        monkeypatch.setattr(replicas, "_checked_at", NOW - 0.5)
+
+        replicas.check_lag(now=NOW)
+
+        replica.engine.connect.assert_not_called()
+
+    def test_unreachable_replica(self, replica, monkeypatch):
+        """Connection errors should mark the replica as unusable"""
+        monkeypatch.setattr(replicas, "primary_lsn", lambda: 100)
+        replica.engine.connect.side_effect = OSError("connection refused")
+
+        replicas.check_lag(now=NOW)
+
+        assert replica.lag is None
+
+    def test_monitor_thread(self, replica, monkeypatch):
+        """The background monitor should measure lag until stopped"""
+        measured = threading.Event()
+        monkeypatch.setattr(replicas, "check_lag", measured.set)
+        monkeypatch.setattr(replicas, "_monitor", None)
+
+        replicas.start()
+        try:
+            assert measured.wait(5)
+        finally:
+            replicas.stop()
+        assert replicas._monitor is None
+
+    def test_parse_lsn(self):
+        """LSNs should compare as integers"""
+        assert replicas.parse_lsn("16/B374D848") == (0x16 << 32) | 0xB374D848
+        assert replicas.parse_lsn("0/10") < replicas.parse_lsn("1/0")
+        assert replicas.parse_lsn(None) == 0
+
+
+class TestReadDependency:
+    """Test the get_read_db dependency"""
+
+    def test_replica_session_yielded(self, monkeypatch):
+        """A routed read should get a replica session, not the request's primary one"""
+        replica = fake_replica()
+        monkeypatch.setattr(replicas, "replicas", [replica])
+        primary = MagicMock()
+
+        dependency = get_read_db(primary, User(id=uuid.uuid4()))
+        db = next(dependency)
+
+        assert db is not primary
+        assert db.info["replica"] is True
+        dependency.close()
+
+    def test_primary_session_reused(self, monkeypatch):
+        """Without a usable replica the request's primary session should be reused"""
+        monkeypatch.setattr(replicas, "replicas", [])
+        primary = MagicMock()
+
+        assert next(get_read_db(primary, User(id=uuid.uuid4()))) is primary
+
+
+@pytest.mark.skipif(not os.environ.get("REPLICA_TEST_URL"), reason="set REPLICA_TEST_URL (docker-compose.replica.yml)")
+class TestStreamingReplica:
+    """Test against a real streaming replica"""
+
+    def test_lag_query(self, monkeypatch):
+        """The WAL position queries should run on the primary and a hot standby"""
+        monkeypatch.setattr(replicas.time, "time", time.time)
+        monkeypatch.setattr(replicas, "_checked_at", 0.0)
+        replica = replicas._make_replica(os.environ["REPLICA_TEST_URL"])
+        monkeypatch.setattr(replicas, "replicas", [replica])
+
+        # 1回目でプライマリの位置を記録し、2回目でレプリカがそこまで再生済みかを見る
+        replicas.check_lag()
+        time.sleep(settings.replica_check_interval_s)
+        replicas.check_lag()
+
+        assert replica.lag is not None
+        assert replica.lag < settings.replica_max_lag_s
+        assert replica.replay_lsn > 0
@@ -0,0 +1,118 @@
+"""
+Backlog Rescheduling Tests
+"""
+import random
+import time
+import uuid
+from datetime import date, timedelta
+from unittest.mock import MagicMock
+
+from app.services import rescheduler
+from app.services.rescheduler import ReschedulePlan, plan
+
+
+TODAY = date(2026, 10, 19)
+
+
+def day(offset: int) -> date:
+    return TODAY + timedelta(days=offset)
+
+
+class TestPlan:
+    """Test the pure rescheduling plan"""
+
+    def test_overdue_spread_under_cap(self):
+        """Overdue cards should be spread so no day exceeds the cap"""
+        cards = [(uuid.uuid4(), day(-10), 5) for _ in range(30)]
+
+        result = plan(cards, TODAY, window_days=7, daily_cap=5)
+
+        assert result.before[0] == 30
+        assert max(result.after) == 5
+        assert sum(result.after) == 30
+        assert all(new >= TODAY for _, _, new in result.moves)
+
+    def test_relative_overdueness_first(self):
+        """Cards more overdue relative to their interval should come first"""
+        urgent = uuid.uuid4()
+        relaxed = uuid.uuid4()
+        cards = [(relaxed, day(-5), 100), (urgent, day(-5), 2)]
+
+        result = plan(cards, TODAY, window_days=2, daily_cap=1)
+
+        new_days = {card_id: new for card_id, _, new in result.moves}
+        assert new_days[urgent] == TODAY
+        assert new_days[relaxed] == day(1)
+
+    def test_cap_raised_when_infeasible(self):
+        """Cap should be raised to the smallest value that fits the window"""
+        cards = [(uuid.uuid4(), day(-1), 3) for _ in range(10)]
+
+        result = plan(cards, TODAY, window_days=2, daily_cap=1)
+
+        assert result.daily_cap == 5
+        assert result.after == [5, 5]
+
+    def test_balanced_days_untouched(self):
+        """Cards on days within the cap should not move"""
+        cards = [(uuid.uuid4(), day(i), 10) for i in range(5)]
+
+        assert plan(cards, TODAY, window_days=5, daily_cap=3).moves == []
+
+    def test_clustered_day_moves_within_fuzz(self):
+        """Excess cards on a busy day should not move earlier than the fuzz allows"""
+        cards = [(uuid.uuid4(), day(10), 10) for _ in range(6)]
+
+        result = plan(cards, TODAY, window_days=14, daily_cap=2)
+
+        assert len(result.moves) == 4
+        assert all(day(9) <= new <= day(11) for _, _, new in result.moves)
+        assert max(result.after) == 2
+
+    def test_short_interval_not_pushed_far(self):
+        """A card on a short interval should stay within its fuzz even if later days are free"""
+        cards = [(uuid.uuid4(), day(1), 1) for _ in range(8)]
+
+        result = plan(cards, TODAY, window_days=14, daily_cap=2)
+
+        assert all(new <= day(2) for _, _, new in result.moves)
+        # 今日・明日・明後日に2枚ずつ置き、残りは元の日のまま
+        assert result.after[:4] == [2, 4, 2, 0]
+        assert sum(result.after) == 8
+
+    def test_100k_cards_fast(self):
+        """Planning 100k cards should take well under a second"""
+        rng = random.Random(0)
+        cards = [(uuid.uuid4(), day(rng.randint(-60, 13)), rng.randint(1, 100)) for _ in range(100_000)]
+
+        start = time.perf_counter()
+        result = plan(cards, TODAY, window_days=14)
+        elapsed = time.perf_counter() - start
+
+        assert sum(result.after) == 100_000
+        assert elapsed < 1.0
+
+
+class TestApply:
+    """Test applying a plan"""
+
+    def test_no_moves_skips_query(self):
+        """Empty plan should not touch the database"""
+        db = MagicMock()
+        assert rescheduler.apply(db, uuid.uuid4(), ReschedulePlan(daily_cap=1)) == 0
+        db.execute.assert_not_called()
+
+    def test_deltas_from_updated_rows(self):
+        """Due counts should only reflect rows that were actually updated"""
+        moves = [(uuid.uuid4(), day(-3), day(0)), (uuid.uuid4(), day(-3), day(1))]
+        db = MagicMock()
+        # The second card was reviewed after loading, so it was not updated
+        db.execute.return_value.all.return_value = [(day(-3), day(0))]
+
+        moved = rescheduler.apply(db, uuid.uuid4(), ReschedulePlan(daily_cap=1, moves=moves))
+
+        assert moved == 1
+        upsert = db.execute.call_args_list[2][0][0]
+        assert upsert.table.name == "due_counts"
+        params = upsert.compile().params
+        assert sorted(v for k, v in params.items() if k.startswith("count")) == [-1, 1]
@@ -0,0 +1,112 @@
+"""
+Fast JSON Response Tests
+"""
+import json
+import uuid
+from datetime import date, datetime
+
+from fastapi.responses import Response
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text, select, literal_column
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+
+from app import responses
+from app.deps import get_current_user
+from app.main import app
+from app.models import User
+from app.routers import cards
+from app.responses import FastJSONResponse, rows_as_dicts
+from app.schemas import CardOut
+
+
+class TestFastJSONResponse:
+    """Test orjson serialization path"""
+
+    def test_matches_pydantic_output(self):
+        """Serialized cards should be identical to CardOut JSON"""
+        card = {
+            "id": uuid.uuid4(),
+            "card_type": "vocab",
+            "front": "apple",
+            "back": "りんご",
+            "next_review": date(2026, 10, 19),
+            "created_at": datetime(2026, 10, 19, 12, 30, 5, 123456),
+        }
+
+        body = FastJSONResponse([card]).body
+
+        expected = "[" + CardOut(**card).model_dump_json() + "]"
+        assert json.loads(body) == json.loads(expected)
+        assert body.decode() == expected
+
+    def test_rows_as_dicts(self):
+        """Result rows should become dicts keyed by column label"""
+        engine = create_engine("sqlite://")
+        with engine.connect() as conn:
+            result = conn.execute(text("SELECT 1 AS id, 'apple' AS front UNION ALL SELECT 2, 'run'"))
+            assert rows_as_dicts(result) == [{"id": 1, "front": "apple"}, {"id": 2, "front": "run"}]
+
+
+class TestNdjsonStream:
+    """Test streaming NDJSON export"""
+
+    def test_streams_one_object_per_line(self, monkeypatch):
+        """Rows should be streamed in batches, one JSON object per line"""
+        engine = create_engine("sqlite://")
+        monkeypatch.setattr(responses, "SessionLocal", sessionmaker(bind=engine))
+        numbers = text(
+            "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 25) SELECT x FROM n"
+        ).columns(literal_column("x")).subquery()
+        stmt = select(numbers.c.x.label("id"))
+
+        chunks = list(responses._ndjson_lines(stmt, batch_size=10))
+
+        assert len(chunks) == 3
+        lines = b"".join(chunks).decode().splitlines()
+        assert [json.loads(line) for line in lines] == [{"id": i} for i in range(1, 26)]
+
+    def test_followed_by_statements(self, monkeypatch):
+        """Extra statements should be streamed after the main one with their own columns"""
+        engine = create_engine("sqlite://")
+        monkeypatch.setattr(responses, "SessionLocal", sessionmaker(bind=engine))
+        cards = select(literal_column("1").label("id"), literal_column("'apple'").label("front"))
+        deleted = select(literal_column("2").label("id"), literal_column("1").label("deleted"))
+
+        lines = b"".join(responses._ndjson_lines(cards, 10, followed_by=[deleted])).decode().splitlines()
+
+        assert [json.loads(line) for line in lines] == [{"id": 1, "front": "apple"}, {"id": 2, "deleted": 1}]
+
+
+class TestCardExport:
+    """Test the incremental card export"""
+
+    def _export(self, monkeypatch, params):
+        captured = {}
+
+        def fake_ndjson_response(stmt, filename, **kwargs):
+            captured["followed_by"] = [
+                str(s.compile(dialect=postgresql.dialect())) for s in kwargs.get("followed_by", ())
+            ]
+            return Response()
+
+        monkeypatch.setattr(cards, "ndjson_response", fake_ndjson_response)
+        app.dependency_overrides[get_current_user] = lambda: User(id=uuid.uuid4())
+        try:
+            TestClient(app).get("/cards/export.ndjson", params=params, headers={"X-API-Key": "test"})
+        finally:
+            app.dependency_overrides.clear()
+        return captured["followed_by"]
+
+    def test_since_includes_deletions(self, monkeypatch):
+        """A since export should append tombstones deleted within the window"""
+        followed_by = self._export(monkeypatch, {"since": datetime(2026, 10, 1).isoformat()})
+
+        assert len(followed_by) == 1
+        assert "FROM card_tombstones" in followed_by[0]
+        assert "card_tombstones.deleted_at >= " in followed_by[0]
+        assert "AS deleted" in followed_by[0]
+
+    def test_full_export_has_no_deletions(self, monkeypatch):
+        """A full export lists only existing cards"""
+        assert self._export(monkeypatch, {}) == []
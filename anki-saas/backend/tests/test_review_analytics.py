@@ -0,0 +1,128 @@
+"""
+Review History Parquet Export Tests
+"""
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from app.services import review_analytics  # noqa: E402
+
+
+def review_row(card_id, rating, reviewed_at, ease=2.5):
+    return (uuid.uuid4(), uuid.uuid4(), card_id, rating, reviewed_at, "vocab", ease, 1, 1)
+
+
+class TestWriteBatches:
+    """Test month-partitioned Parquet output"""
+
+    def test_splits_by_month(self, tmp_path):
+        """Rows should be written to one file per month, even within a batch"""
+        card = uuid.uuid4()
+        rows = [
+            review_row(card, 2, datetime(2026, 9, 30, 23)),
+            review_row(card, 2, datetime(2026, 10, 1, 1)),
+            review_row(card, 0, datetime(2026, 10, 2)),
+        ]
+
+        written = review_analytics.write_batches([rows[:2], rows[2:]], str(tmp_path), "t1")
+
+        assert written == {"2026-09": 1, "2026-10": 2}
+        assert (tmp_path / "month=2026-09" / "part-t1.parquet").exists()
+        table = review_analytics.load_reviews(str(tmp_path), since=datetime(2026, 10, 1))
+        assert table.num_rows == 2
+        assert table.column("rating").to_pylist() == [2, 0]
+
+    def test_months_out_of_order(self, tmp_path):
+        """Backdated rows between newer ones should still land in one file per month"""
+        card = uuid.uuid4()
+        rows = [
+            review_row(card, 2, datetime(2026, 10, 1)),
+            review_row(card, 1, datetime(2026, 9, 15)),
+            review_row(card, 3, datetime(2026, 10, 2)),
+        ]
+
+        written = review_analytics.write_batches([rows[:2], rows[2:]], str(tmp_path), "t1")
+
+        assert written == {"2026-09": 1, "2026-10": 2}
+        assert review_analytics.load_reviews(str(tmp_path)).num_rows == 3
+
+
+class TestIncrementalExport:
+    """Test watermark handling"""
+
+    def test_watermark_advances(self, tmp_path, monkeypatch):
+        """Each run should start where the previous one ended"""
+        seen = []
+
+        def fake_batches(db, stmt, batch_size):
+            seen.append(stmt.compile().params)
+            return iter([])
+
+        monkeypatch.setattr(review_analytics, "_row_batches", fake_batches)
+        now = datetime(2026, 10, 19, 12)
+
+        first = review_analytics.export_review_logs(MagicMock(), str(tmp_path), now=now)
+        second = review_analytics.export_review_logs(MagicMock(), str(tmp_path), now=now + timedelta(hours=1))
+
+        assert first["since"] is None
+        assert second["since"] == first["until"] == now - review_analytics.SETTLE_LAG
+        assert seen[1]["logged_at_2"] == first["until"]
+
+    def test_watermark_on_insert_time(self):
+        """Rows backdated by offline sync should be selected by when they were inserted"""
+        sql = str(review_analytics.export_query(datetime(2026, 10, 1), datetime(2026, 10, 2)))
+
+        assert "review_logs.logged_at >=" in sql
+        assert "review_logs.logged_at <" in sql
+        assert "review_logs.reviewed_at <" not in sql
+
+    def test_no_overlap_when_called_again(self, tmp_path):
+        """Running again before time moves on should export nothing"""
+        now = datetime(2026, 10, 19, 12)
+        review_analytics.write_watermark(str(tmp_path), now)
+
+        result = review_analytics.export_review_logs(MagicMock(), str(tmp_path), now=now)
+
+        assert result["rows"] == 0
+
+
+class TestAnalysis:
+    """Test vectorized analysis helpers"""
+
+    def _table(self, tmp_path, rows):
+        review_analytics.write_batches([sorted(rows, key=lambda r: r[4])], str(tmp_path), "t")
+        return review_analytics.load_reviews(str(tmp_path))
+
+    def test_retention_curve(self, tmp_path):
+        """Retention should be grouped by days since the card's previous review"""
+        start = datetime(2026, 10, 1)
+        a, b = uuid.uuid4(), uuid.uuid4()
+        rows = [
+            review_row(a, 2, start), review_row(a, 2, start + timedelta(days=1)),
+            review_row(a, 0, start + timedelta(days=4)),
+            review_row(b, 2, start), review_row(b, 3, start + timedelta(days=1)),
+        ]
+
+        curve = review_analytics.retention_curve(self._table(tmp_path, rows), max_days=10)
+
+        assert curve["reviews"][1] == 2
+        assert curve["retention"][1] == 1.0
+        assert curve["reviews"][3] == 1
+        assert curve["retention"][3] == 0.0
+        assert np.isnan(curve["retention"][2])
+
+    def test_ease_distribution_counts_cards_once(self, tmp_path):
+        """Each card should be counted once regardless of its review count"""
+        start = datetime(2026, 10, 1)
+        a, b = uuid.uuid4(), uuid.uuid4()
+        rows = [review_row(a, 2, start + timedelta(days=i), ease=2.5) for i in range(3)]
+        rows.append(review_row(b, 2, start, ease=1.3))
+
+        dist = review_analytics.ease_distribution(self._table(tmp_path, rows))
+
+        assert dist["counts"].sum() == 2
@@ -0,0 +1,178 @@
+"""
+Write-behind Review Log Buffer Tests
+"""
+import os
+import time
+import uuid
+from datetime import date, datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from fastapi.testclient import TestClient
+
+from app.database import get_db
+from app.deps import get_current_user
+from app.main import app
+from app.models import ReviewLog, User
+from app.services import review_log_buffer
+from app.services.review_log_buffer import ReviewLogBuffer, encode_row, read_spill
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.batches: list[list[dict]] = []
+        self.fail = False
+
+    def __call__(self, rows):
+        if self.fail:
+            raise RuntimeError("database is down")
+        self.batches.append(list(rows))
+
+    @property
+    def rows(self):
+        return [r for batch in self.batches for r in batch]
+
+
+def spill_files(path):
+    return sorted(os.listdir(path))
+
+
+class TestReviewLogBuffer:
+    """Test buffered review log writes"""
+
+    def _buffer(self, tmp_path, writer, **kwargs):
+        kwargs.setdefault("flush_interval", 60)
+        return ReviewLogBuffer(str(tmp_path), writer=writer, **kwargs)
+
+    def test_append_is_spilled_before_flush(self, tmp_path):
+        """Appended rows should be on disk before they reach the database"""
+        writer = RecordingWriter()
+        buffer = self._buffer(tmp_path, writer)
+        buffer.start()
+        card_id = uuid.uuid4()
+        buffer.append(uuid.uuid4(), card_id, 2)
+
+        [name] = spill_files(tmp_path)
+        [row] = read_spill(os.path.join(tmp_path, name))
+        assert row["card_id"] == card_id
+        assert row["rating"] == 2
+        assert writer.batches == []
+        buffer.stop()
+
+    def test_flush_batches_and_removes_spill(self, tmp_path):
+        """Flush should write all rows in order and drop the flushed spill file"""
+        writer = RecordingWriter()
+        buffer = self._buffer(tmp_path, writer, flush_rows=2)
+        buffer.start()
+        card_id = uuid.uuid4()
+        ids = [buffer.append(uuid.uuid4(), card_id, rating) for rating in (0, 2, 3)]
+
+        # 件数に達したのでフラッシュスレッドが起こされる
+        deadline = time.monotonic() + 5
+        while len(writer.rows) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        buffer.flush()
+
+        assert [r["id"] for r in writer.rows] == ids
+        assert all(len(batch) <= 2 for batch in writer.batches)
+        assert ids == sorted(ids)
+        assert len(spill_files(tmp_path)) == 1  # 書き込み中のファイルだけ
+        buffer.stop()
+        assert spill_files(tmp_path) == []
+
+    def test_interval_flush(self, tmp_path):
+        """Rows should be flushed by the background thread after the interval"""
+        writer = RecordingWriter()
+        buffer = self._buffer(tmp_path, writer, flush_interval=0.05)
+        buffer.start()
+        buffer.append(uuid.uuid4(), uuid.uuid4(), 1)
+
+        deadline = time.monotonic() + 5
+        while not writer.rows and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert len(writer.rows) == 1
+        buffer.stop()
+
+    def test_failed_flush_is_retried(self, tmp_path):
+        """Rows should stay queued and spilled until a flush succeeds"""
+        writer = RecordingWriter()
+        buffer = self._buffer(tmp_path, writer)
+        buffer.start()
+        first = buffer.append(uuid.uuid4(), uuid.uuid4(), 2)
+
+        writer.fail = True
+        assert buffer.flush() == 0
+        second = buffer.append(uuid.uuid4(), uuid.uuid4(), 3)
+        assert len(buffer) == 2
+        assert len(spill_files(tmp_path)) == 2
+
+        writer.fail = False
+        assert buffer.flush() == 2
+        assert [r["id"] for r in writer.rows] == [first, second]
+        assert len(spill_files(tmp_path)) == 1
+        buffer.stop()
+
+    def test_replay_after_crash(self, tmp_path):
+        """Rows left by a dead process should be written on the next start"""
+        reviewed_at = datetime(2026, 10, 1, 9, 30)
+        row = {
+            "id": uuid.uuid4(), "user_id": uuid.uuid4(), "card_id": uuid.uuid4(),
+            "rating": 2, "reviewed_at": reviewed_at,
+        }
+        row_id = row["id"]
+        # 落ちたプロセスの spill ファイル。末尾は書きかけの行
+        with open(os.path.join(tmp_path, "review_logs-1234-1.jsonl"), "w") as f:
+            f.write(encode_row(row))
+            f.write('{"id": "truncat')
+
+        writer = RecordingWriter()
+        buffer = self._buffer(tmp_path, writer)
+        buffer.start()
+
+        assert [(r["id"], r["reviewed_at"]) for r in writer.rows] == [(row_id, reviewed_at)]
+        assert len(spill_files(tmp_path)) == 1
+        buffer.stop()
+
+    def test_replay_skips_live_workers(self, tmp_path):
+        """A starting worker should not take over another worker's spill file"""
+        live = self._buffer(tmp_path, RecordingWriter())
+        live.start()
+        live.append(uuid.uuid4(), uuid.uuid4(), 2)
+
+        writer = RecordingWriter()
+        other = self._buffer(tmp_path, writer)
+        other.start()
+
+        assert writer.rows == []
+        assert len(spill_files(tmp_path)) == 2
+        other.stop()
+        live.stop()
+
+
+class TestSubmitReviewBuffered:
+    """Test submit_review with the buffer enabled"""
+
+    def test_log_goes_to_buffer_after_commit(self, monkeypatch):
+        """The card update should commit without a ReviewLog row, then the log is buffered"""
+        card = SimpleNamespace(
+            id=uuid.uuid4(), repetitions=0, ease_factor=2.5, interval=0, next_review=date.today()
+        )
+        db = MagicMock()
+        db.query.return_value.filter.return_value.with_for_update.return_value.first.return_value = card
+        appended = []
+        buffer = SimpleNamespace(append=lambda *args: appended.append((db.commit.call_count, args)))
+        monkeypatch.setattr(review_log_buffer, "get_buffer", lambda: buffer)
+        user = User(id=uuid.uuid4())
+        app.dependency_overrides[get_db] = lambda: db
+        app.dependency_overrides[get_current_user] = lambda: user
+        try:
+            response = TestClient(app).post(
+                f"/review/{card.id}", json={"rating": 2}, headers={"X-API-Key": "test"}
+            )
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 200
+        assert not any(isinstance(c[0][0], ReviewLog) for c in db.add.call_args_list)
+        assert appended == [(1, (user.id, card.id, 2, card.last_reviewed_at))]
@@ -0,0 +1,116 @@
+"""
+Review Log Partitioning Tests
+"""
+import uuid
+from datetime import date, datetime
+from unittest.mock import MagicMock
+
+from fastapi.responses import Response
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from app.deps import get_current_user
+from app.main import app
+from app.models import User
+from app.routers import review
+from app.services import review_log_partitions as partitions
+
+
+def empty_default():
+    result = MagicMock()
+    result.scalar.return_value = False
+    return result
+
+
+class TestMonthHelpers:
+    """Test partition naming and month arithmetic"""
+
+    def test_add_months_across_years(self):
+        """Month arithmetic should roll over year boundaries"""
+        assert partitions.add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+        assert partitions.add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+
+    def test_name_round_trip(self):
+        """Partition names should parse back to their month"""
+        name = partitions.partition_name(date(2026, 3, 1))
+        assert name == "review_logs_2026_03"
+        assert partitions.parse_partition_name(name) == date(2026, 3, 1)
+
+    def test_other_tables_ignored(self):
+        """Default partition and unrelated names should not parse"""
+        assert partitions.parse_partition_name("review_logs_default") is None
+        assert partitions.parse_partition_name("review_logs_2026_03; DROP TABLE cards") is None
+
+
+class TestCreatePartitions:
+    """Test partition creation"""
+
+    def test_skips_existing(self):
+        """Only missing months should be created"""
+        db = MagicMock()
+        db.execute.side_effect = [
+            [("review_logs_2026_10",), ("review_logs_default",)],  # list_partitions
+            empty_default(),
+            None,
+            empty_default(),
+            None,
+        ]
+
+        created = partitions.create_partitions(db, date(2026, 10, 1), date(2026, 12, 1))
+
+        assert created == ["review_logs_2026_11", "review_logs_2026_12"]
+        ddl = str(db.execute.call_args_list[2][0][0])
+        assert ddl == (
+            "CREATE TABLE review_logs_2026_11 PARTITION OF review_logs "
+            "FOR VALUES FROM ('2026-11-01') TO ('2026-12-01')"
+        )
+
+
+    def test_moves_rows_out_of_default(self):
+        """A month whose rows already fell into the default partition should be moved, not fail"""
+        db = MagicMock()
+        has_rows = MagicMock()
+        has_rows.scalar.return_value = True
+        db.execute.side_effect = [[("review_logs_default",)], has_rows, None, None, None, None]
+
+        created = partitions.create_partitions(db, date(2026, 11, 1), date(2026, 11, 1))
+
+        assert created == ["review_logs_2026_11"]
+        statements = [" ".join(str(c[0][0]).split()) for c in db.execute.call_args_list[2:]]
+        assert statements[0] == "LOCK TABLE review_logs_default IN SHARE ROW EXCLUSIVE MODE"
+        assert statements[1].startswith("CREATE TABLE review_logs_2026_11 (LIKE review_logs")
+        assert "DELETE FROM review_logs_default" in statements[2]
+        assert "INSERT INTO review_logs_2026_11 SELECT * FROM moved" in statements[2]
+        assert statements[3] == (
+            "ALTER TABLE review_logs ATTACH PARTITION review_logs_2026_11 "
+            "FOR VALUES FROM ('2026-11-01') TO ('2026-12-01')"
+        )
+        assert not any("PARTITION OF" in s for s in statements)
+
+
+class TestHistoryQueries:
+    """Test that review history reads only the user's partitions"""
+
+    def test_export_filters_by_user_and_time(self, monkeypatch):
+        """Export should filter on review_logs.user_id and reviewed_at without joining cards"""
+        captured = {}
+
+        def fake_ndjson_response(stmt, filename, **kwargs):
+            captured["sql"] = str(stmt.compile(dialect=postgresql.dialect()))
+            return Response()
+
+        monkeypatch.setattr(review, "ndjson_response", fake_ndjson_response)
+        app.dependency_overrides[get_current_user] = lambda: User(id=uuid.uuid4())
+        try:
+            TestClient(app).get(
+                "/review/logs/export.ndjson",
+                params={"since": datetime(2026, 10, 1).isoformat()},
+                headers={"X-API-Key": "test"}
+            )
+        finally:
+            app.dependency_overrides.clear()
+
+        sql = captured["sql"]
+        assert "JOIN" not in sql
+        assert "review_logs.user_id = " in sql
+        assert "review_logs.reviewed_at >= " in sql
@@ -0,0 +1,179 @@
+"""
+Review Session Queue Tests
+"""
+import uuid
+from datetime import date, datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from fastapi.testclient import TestClient
+
+from app.database import get_db
+from app.deps import get_current_user
+from app.main import app
+from app.models import User
+from app.services import review_session
+from app.services.review_session import build_queue, next_cards
+
+
+class _Row(tuple):
+    """Minimal stand-in for a SQLAlchemy Row"""
+
+    def __new__(cls, keys, values):
+        row = super().__new__(cls, values)
+        row._keys = keys
+        return row
+
+    def __getattr__(self, name):
+        return self[self._keys.index(name)]
+
+
+class TestBuildQueue:
+    """Test session queue ordering"""
+
+    def test_learning_first(self):
+        """Learning cards should come before reviews and new cards"""
+        queue = build_queue(["l1", "l2"], ["r1"], ["n1"])
+        assert queue[:2] == ["l1", "l2"]
+
+    def test_new_cards_spread_across_reviews(self):
+        """New cards should be mixed evenly between reviews"""
+        queue = build_queue([], ["r1", "r2", "r3", "r4"], ["n1", "n2"])
+        assert queue == ["r1", "r2", "n1", "r3", "r4", "n2"]
+
+    def test_only_new_cards(self):
+        """New cards alone should keep their order"""
+        assert build_queue([], [], ["n1", "n2"]) == ["n1", "n2"]
+
+    def test_capped(self):
+        """Queue should not exceed the session limit"""
+        reviews = list(range(review_session.MAX_SESSION_CARDS + 10))
+        assert len(build_queue([], reviews, [])) == review_session.MAX_SESSION_CARDS
+
+
+class TestDailyLimits:
+    """Test limits that span sessions within a day"""
+
+    def test_limits_reduced_by_todays_studies(self, monkeypatch):
+        """A new session should only get what is left of today's new and review limits"""
+        limits = []
+
+        def fake_fetch(db, user_id, new_limit, review_limit):
+            limits.append((new_limit, review_limit))
+            return {"learning": [], "review": [], "new": []}
+
+        monkeypatch.setattr(review_session, "fetch_candidates", fake_fetch)
+        monkeypatch.setattr(review_session, "studied_on", lambda db, user_id, day: (15, 250))
+
+        review_session.create_session(MagicMock(), uuid.uuid4(), new_limit=20, review_limit=200)
+
+        assert limits == [(5, 0)]
+
+    def test_old_sessions_pruned_by_utc_bound(self, monkeypatch):
+        """Expired sessions should be pruned against a naive UTC bound, not the server's now()"""
+        monkeypatch.setattr(review_session, "fetch_candidates", lambda *args: {"learning": [], "review": [], "new": []})
+        monkeypatch.setattr(review_session, "studied_on", lambda db, user_id, day: (0, 0))
+        db = MagicMock()
+
+        before = datetime.utcnow()
+        review_session.create_session(db, uuid.uuid4(), new_limit=20, review_limit=200)
+
+        prune = db.execute.call_args_list[0][0][0]
+        assert "now()" not in str(prune)
+        bound = next(v for v in prune.compile().params.values() if isinstance(v, datetime))
+        assert bound.tzinfo is None
+        assert before - review_session.SESSION_TTL <= bound <= datetime.utcnow() - review_session.SESSION_TTL
+
+    def test_study_kind(self):
+        """Cards should be counted by their state before the review"""
+        assert review_session.study_kind(0, 0) == "new"
+        assert review_session.study_kind(6, 2) == "review"
+        assert review_session.study_kind(1, 0) is None  # 学習中
+
+    def test_record_studied(self):
+        """Counts should be added per day in one upsert"""
+        db = MagicMock()
+        today = date(2026, 10, 19)
+
+        review_session.record_studied(db, uuid.uuid4(), review_session.count_kinds(
+            [(today, "new"), (today, "review"), (today, None), (today, "new")]
+        ))
+
+        params = db.execute.call_args[0][0].compile().params
+        assert (params["new_count_m0"], params["review_count_m0"]) == (2, 1)
+        review_session.record_studied(db, uuid.uuid4(), review_session.count_kinds([(today, None)]))
+        assert db.execute.call_count == 1
+
+
+class TestNextCards:
+    """Test reading the next slice of a session"""
+
+    def _card_result(self, card_ids):
+        keys = ["id", "card_type", "front", "back", "next_review", "created_at"]
+        result = MagicMock()
+        result.keys.return_value = keys
+        result.__iter__.return_value = iter([
+            _Row(keys, (cid, "vocab", f"front {cid}", "back", date.today(), datetime.utcnow()))
+            for cid in card_ids
+        ])
+        return result
+
+    def test_preserves_queue_order(self):
+        """Cards should follow the queue order, including re-queued repeats"""
+        a, b, deleted = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        session_row = MagicMock()
+        session_row.first.return_value = SimpleNamespace(card_ids=[b, deleted, a, b], remaining=7)
+        db = MagicMock()
+        db.execute.side_effect = [session_row, self._card_result([a, b])]
+
+        cards, remaining = next_cards(db, uuid.uuid4(), uuid.uuid4(), 4)
+
+        assert [c["id"] for c in cards] == [b, a, b]
+        assert remaining == 7
+
+    def test_missing_session(self):
+        """Unknown session should return None"""
+        session_row = MagicMock()
+        session_row.first.return_value = None
+        db = MagicMock()
+        db.execute.return_value = session_row
+
+        assert next_cards(db, uuid.uuid4(), uuid.uuid4(), 10) is None
+
+    def test_exhausted_session(self):
+        """Finished session should not query cards"""
+        session_row = MagicMock()
+        session_row.first.return_value = SimpleNamespace(card_ids=[], remaining=0)
+        db = MagicMock()
+        db.execute.return_value = session_row
+
+        assert next_cards(db, uuid.uuid4(), uuid.uuid4(), 10) == ([], 0)
+        assert db.execute.call_count == 1
+
+
+class TestSessionEndpoint:
+    """Test session routes"""
+
+    def test_create_is_not_routed_as_card_review(self, monkeypatch):
+        """POST /review/session should not be captured by /review/{card_id}"""
+        session_id = uuid.uuid4()
+        calls = []
+
+        def fake_create(db, user_id, new_limit, review_limit):
+            calls.append((new_limit, review_limit))
+            return {"id": session_id, "total": 3, "learning": 1, "review": 1, "new": 1}
+
+        monkeypatch.setattr(review_session, "create_session", fake_create)
+        app.dependency_overrides[get_db] = lambda: MagicMock()
+        app.dependency_overrides[get_current_user] = lambda: User(id=uuid.uuid4())
+        try:
+            response = TestClient(app).post(
+                "/review/session", json={"new_limit": 5}, headers={"X-API-Key": "test"}
+            )
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 200
+        assert response.json()["id"] == str(session_id)
+        assert calls == [(5, 200)]
+
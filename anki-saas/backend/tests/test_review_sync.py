@@ -0,0 +1,195 @@
+"""
+Offline Review Sync Tests
+"""
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from fastapi.testclient import TestClient
+
+from app.database import get_db
+from app.deps import get_current_user
+from app.main import app
+from app.models import User
+from app.services import card_import, rescheduler, review_sync
+from app.services.review_sync import CardState, SyncOp, apply_ops, replay
+
+
+NOW = datetime(2026, 10, 19, 12, 0)
+
+
+def op(card_id, rating, at, op_id=None):
+    return SyncOp(op_id or uuid.uuid4(), card_id, rating, at)
+
+
+def card_row(card_id, next_review=date(2026, 10, 10), last_reviewed_at=None):
+    return SimpleNamespace(
+        id=card_id, repetitions=1, ease_factor=2.5, interval=1, next_review=next_review,
+        last_reviewed_at=last_reviewed_at,
+    )
+
+
+def execute_results(seen, cards, claimed=()):
+    """card_version, 適用済みの確認, カードの読み込み, claim, 以降の書き込み"""
+    applied = MagicMock()
+    applied.scalars.return_value = seen
+    load = MagicMock()
+    load.all.return_value = cards
+    claim = MagicMock()
+    claim.scalars.return_value = claimed
+    return [MagicMock(), applied, load, claim] + [MagicMock() for _ in range(4)]
+
+
+class TestToken:
+    """Test sync token and client timestamps"""
+
+    def test_round_trip(self):
+        """Tokens should decode to the exact time they were made from"""
+        assert review_sync.decode_token(review_sync.encode_token(NOW)) == NOW
+
+    def test_aware_and_future_times(self):
+        """Client times should be converted to naive UTC and clamped to now"""
+        jst = timezone(timedelta(hours=9))
+        assert review_sync.to_utc(datetime(2026, 10, 19, 18, 0, tzinfo=jst), NOW) == datetime(2026, 10, 19, 9, 0)
+        assert review_sync.to_utc(NOW + timedelta(hours=1), NOW) == NOW
+
+    def test_updated_at_written_at_statement_time(self):
+        """Bulk card writes should stamp updated_at with clock_timestamp(), not the transaction start"""
+        for sql in (str(review_sync.APPLY_SQL), str(rescheduler.APPLY_SQL), card_import.MERGE_SQL):
+            assert "clock_timestamp()" in sql
+            assert "now()" not in sql
+
+
+class TestReplay:
+    """Test folding offline reviews with SM-2"""
+
+    def test_timestamp_order(self):
+        """Reviews of one card should be applied in reviewed_at order, not arrival order"""
+        card_id = uuid.uuid4()
+        states = {card_id: CardState(0, 2.5, 0, date(2026, 10, 1))}
+        ops = [
+            op(card_id, 2, datetime(2026, 10, 3, 8)),
+            op(card_id, 2, datetime(2026, 10, 2, 8)),
+        ]
+
+        final = replay(states, ops)
+
+        # 1回目: 1日後、2回目: 6日後（10/3 から）
+        assert final[card_id] == CardState(2, 2.5, 6, date(2026, 10, 9))
+        assert states[card_id].repetitions == 0
+
+    def test_untouched_cards_not_returned(self):
+        """Only reviewed cards should be in the result"""
+        reviewed, other = uuid.uuid4(), uuid.uuid4()
+        states = {c: CardState(0, 2.5, 0, date(2026, 10, 1)) for c in (reviewed, other)}
+
+        assert list(replay(states, [op(reviewed, 0, datetime(2026, 10, 2))])) == [reviewed]
+
+
+class TestApplyOps:
+    """Test idempotent application"""
+
+    def test_already_applied_ops_are_skipped(self):
+        """Ops whose key was already claimed should not be replayed"""
+        card_id = uuid.uuid4()
+        first, second = op(card_id, 2, NOW - timedelta(hours=2)), op(card_id, 3, NOW - timedelta(hours=1))
+        db = MagicMock()
+        db.execute.side_effect = execute_results([first.op_id], [card_row(card_id)], [second.op_id])
+
+        result = apply_ops(db, uuid.uuid4(), [first, second], NOW)
+
+        assert result.applied == [second.op_id]
+        assert result.duplicate == [first.op_id]
+
+    def test_set_based_writes(self):
+        """All cards and logs should be written with one statement each"""
+        cards = [uuid.uuid4() for _ in range(3)]
+        ops = [op(c, 2, NOW - timedelta(hours=i)) for i, c in enumerate(cards * 2)]
+        db = MagicMock()
+        db.execute.side_effect = execute_results([], [card_row(c) for c in cards], [o.op_id for o in ops])
+
+        result = apply_ops(db, uuid.uuid4(), ops, NOW)
+
+        assert len(result.applied) == 6
+        update_params = db.execute.call_args_list[4][0][1]
+        assert sorted(update_params["ids"]) == sorted(cards)
+        log_params = db.execute.call_args_list[5][0][1]
+        assert log_params["reviewed_at"] == sorted(log_params["reviewed_at"])
+        # card_version, applied_ops, load, claim, update, logs, due_counts, daily_study_counts
+        assert db.execute.call_count == 8
+
+    def test_unknown_and_expired_ops_rejected(self):
+        """Ops for other users' cards or older than retention should be rejected"""
+        known, unknown = uuid.uuid4(), uuid.uuid4()
+        fresh = op(unknown, 2, NOW - timedelta(hours=1))
+        expired = op(known, 2, NOW - timedelta(days=review_sync.RETENTION_DAYS + 1))
+        db = MagicMock()
+        db.execute.side_effect = execute_results([], [])
+
+        result = apply_ops(db, uuid.uuid4(), [fresh, expired], NOW)
+
+        assert result.applied == []
+        assert sorted(result.rejected) == sorted([fresh.op_id, expired.op_id])
+        # 却下した操作は applied_ops に入れない
+        assert db.execute.call_count == 3
+
+    def test_ops_before_online_review_rejected(self):
+        """Offline ops older than a later online review should not be folded onto its state"""
+        card_id = uuid.uuid4()
+        online_at = NOW - timedelta(hours=1)
+        stale, newer = op(card_id, 0, online_at - timedelta(hours=1)), op(card_id, 3, online_at + timedelta(minutes=30))
+        db = MagicMock()
+        db.execute.side_effect = execute_results(
+            [], [card_row(card_id, last_reviewed_at=online_at)], [newer.op_id]
+        )
+
+        result = apply_ops(db, uuid.uuid4(), [stale, newer], NOW)
+
+        assert result.applied == [newer.op_id]
+        assert result.rejected == [stale.op_id]
+        assert db.execute.call_args_list[3][0][1]["op_ids"] == [newer.op_id]
+        update_params = db.execute.call_args_list[4][0][1]
+        assert update_params["repetitions"] == [2]  # 1回だけ畳み込んだ（Again は含まない）
+        assert update_params["last_reviewed_at"] == [newer.reviewed_at]
+        log_params = db.execute.call_args_list[5][0][1]
+        assert log_params["ratings"] == [3]
+
+    def test_rejected_op_stays_rejected_on_retry(self):
+        """A retried op that was rejected should be rejected again, not reported as a duplicate"""
+        card_id = uuid.uuid4()
+        online_at = NOW - timedelta(hours=1)
+        stale = op(card_id, 0, online_at - timedelta(hours=1))
+
+        db = MagicMock()
+        db.execute.side_effect = execute_results([], [card_row(card_id, last_reviewed_at=online_at)])
+
+        result = apply_ops(db, uuid.uuid4(), [stale], NOW)
+
+        assert result.rejected == [stale.op_id]
+        assert result.duplicate == []
+        # applied_ops に入れていないので、再送しても同じ判定になる
+        assert review_sync.CLAIM_SQL not in [c[0][0] for c in db.execute.call_args_list]
+
+    def test_empty_sync_skips_queries(self):
+        """No ops should mean no write queries"""
+        db = MagicMock()
+        apply_ops(db, uuid.uuid4(), [], NOW)
+        db.execute.assert_not_called()
+
+
+class TestSyncEndpoint:
+    """Test the sync route"""
+
+    def test_invalid_token(self):
+        """Malformed sync tokens should be rejected, not routed as a card review"""
+        app.dependency_overrides[get_db] = lambda: MagicMock()
+        app.dependency_overrides[get_current_user] = lambda: User(id=uuid.uuid4())
+        try:
+            response = TestClient(app).post(
+                "/review/sync", json={"ops": [], "since": "yesterday"}, headers={"X-API-Key": "test"}
+            )
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 400
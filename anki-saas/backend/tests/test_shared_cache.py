@@ -0,0 +1,134 @@
+"""
+Worker-Shared Cache Tests
+"""
+import multiprocessing
+import time
+import uuid
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+from app import shared_cache
+from app.config import settings
+from app.deps import hash_api_key, user_for_api_key
+from app.models import User
+from app.services import word_lookup
+from app.shared_cache import SharedCache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "shared_cache_path", str(tmp_path / "cache.sqlite3"))
+    return shared_cache.get_cache()
+
+
+def _write_from_child(path: str) -> None:
+    SharedCache(path).set("from-child", {"pid": "child"}, 60)
+
+
+class TestSharedCache:
+    """Test the SQLite-backed store"""
+
+    def test_round_trip(self, cache):
+        """Values should come back as the same JSON"""
+        cache.set("k", {"meaning": "りんご", "n": 1}, 60)
+
+        assert cache.get("k") == {"meaning": "りんご", "n": 1}
+        assert cache.get("missing") is None
+
+    def test_expiry(self, cache):
+        """Expired entries should be misses"""
+        cache.set("k", "v", 0.01)
+        time.sleep(0.02)
+
+        assert cache.get("k") is None
+
+    def test_visible_across_processes(self, cache):
+        """Writes from another worker process should be readable here"""
+        process = multiprocessing.get_context("fork").Process(target=_write_from_child, args=(cache.path,))
+        process.start()
+        process.join()
+
+        assert cache.get("from-child") == {"pid": "child"}
+
+    def test_disabled_without_path(self, monkeypatch):
+        """An empty path should disable the cache"""
+        monkeypatch.setattr(settings, "shared_cache_path", "")
+
+        assert shared_cache.get_cache() is None
+
+    def test_errors_are_misses(self, cache):
+        """A broken store should not fail requests"""
+        cache._conn().execute("DROP TABLE cache")
+
+        cache.set("k", "v", 60)
+        assert cache.get("k") is None
+
+
+class TestAuthCache:
+    """Test API key lookups through the shared cache"""
+
+    def test_second_lookup_skips_db(self, cache):
+        """A cached API key should resolve without querying"""
+        user_id = uuid.uuid4()
+        db = MagicMock()
+        db.query.return_value.join.return_value.filter.return_value.first.return_value = User(id=user_id)
+
+        assert user_for_api_key(db, "ak_test").id == user_id
+        assert user_for_api_key(db, "ak_test").id == user_id
+        assert db.query.call_count == 1
+        assert cache.get(f"auth:{hash_api_key('ak_test')}") == str(user_id)
+
+    def test_invalid_keys_not_cached(self, cache):
+        """Unknown keys should always be checked against the database"""
+        db = MagicMock()
+        db.query.return_value.join.return_value.filter.return_value.first.return_value = None
+
+        for _ in range(2):
+            with pytest.raises(HTTPException):
+                user_for_api_key(db, "ak_bad")
+        assert db.query.call_count == 2
+
+
+class TestLookupCache:
+    """Test sharing Claude lookups between workers"""
+
+    def test_claude_result_reused(self, cache, monkeypatch):
+        """A word looked up once should not call Claude again in any worker"""
+        calls = []
+
+        def fake_claude(messages):
+            calls.append(messages)
+            return '{"word": "serendipity", "meaning": "思わぬ発見", "pronunciation": null, "example": null}'
+
+        monkeypatch.setattr(word_lookup, "chat_with_claude", fake_claude)
+        monkeypatch.setattr(word_lookup, "get_dictionary", lambda: None)
+
+        first = word_lookup.lookup_word("serendipity")
+        second = word_lookup.lookup_word("Serendipity ")
+
+        assert second == first
+        assert len(calls) == 1
+
+        word_lookup.lookup_word("serendipity", context="It was serendipity.", contextual=True)
+        assert len(calls) == 2
+
+    def test_context_in_key(self, cache, monkeypatch):
+        """A Claude answer given for one context should not be served for another"""
+        calls = []
+
+        def fake_claude(messages):
+            calls.append(messages)
+            return '{"word": "bank", "meaning": "土手", "pronunciation": null, "example": null}'
+
+        monkeypatch.setattr(word_lookup, "chat_with_claude", fake_claude)
+        monkeypatch.setattr(word_lookup, "get_dictionary", lambda: None)
+
+        word_lookup.lookup_word("bank", context="We sat on the river bank.")
+        word_lookup.lookup_word("bank", context="We  sat on the River bank. ")
+        assert len(calls) == 1
+
+        word_lookup.lookup_word("bank", context="I deposited money at the bank.")
+        word_lookup.lookup_word("bank")
+        assert len(calls) == 3
@@ -0,0 +1,75 @@
+"""
+Workload Simulator Tests
+"""
+import time
+
+import numpy as np
+
+from app.services.simulator import simulate, sm2_step
+from app.services.sm2 import calculate_sm2
+
+
+class TestSm2Step:
+    """Test vectorized SM-2 against the scalar implementation"""
+
+    def test_matches_calculate_sm2(self):
+        """Every state transition should match calculate_sm2"""
+        rng = np.random.default_rng(0)
+        n = 2000
+        repetitions = np.zeros(n, dtype=np.int64)
+        ease = np.full(n, 2.5)
+        interval = np.zeros(n, dtype=np.int64)
+
+        for _ in range(10):
+            rating = rng.integers(0, 4, n)
+            new_reps, new_ease, new_interval = sm2_step(rating, repetitions, ease, interval)
+            for i in range(n):
+                expected = calculate_sm2(int(rating[i]), int(repetitions[i]), float(ease[i]), int(interval[i]))
+                assert (new_reps[i], new_ease[i], new_interval[i]) == (
+                    expected.repetitions, expected.ease_factor, expected.interval
+                )
+            repetitions, ease, interval = new_reps, new_ease, new_interval
+
+
+class TestSimulate:
+    """Test workload simulation"""
+
+    def test_new_cards_introduced_per_day(self):
+        """Each user should start new_per_day cards per day until the deck runs out"""
+        result = simulate(users=3, cards_per_user=10, days=5, new_per_day=4)
+
+        assert result.daily_new.tolist() == [12, 12, 6, 0, 0]
+        assert result.interval_histogram["new"] == 0
+
+    def test_always_easy_reduces_load(self):
+        """Easier ratings should lead to fewer reviews"""
+        easy = simulate(users=10, cards_per_user=100, days=60, rating_probs=(0, 0, 0, 1))
+        hard = simulate(users=10, cards_per_user=100, days=60, rating_probs=(1, 0, 0, 0))
+
+        assert easy.total_reviews < hard.total_reviews
+        # Always Again means every started card comes back the next day
+        assert hard.daily_reviews[-1] == 1000
+
+    def test_log_rows_cumulative(self):
+        """review_logs growth should be the running total of reviews"""
+        result = simulate(users=5, cards_per_user=50, days=30, seed=1)
+
+        assert result.log_rows()[-1] == result.total_reviews
+        assert result.to_dict(bytes_per_log=100)["review_log_bytes"] == result.total_reviews * 100
+
+    def test_skipped_days_create_backlog(self):
+        """Users who skip days should do fewer reviews with a different interval mix"""
+        regular = simulate(users=50, cards_per_user=100, days=60, seed=2)
+        skipping = simulate(users=50, cards_per_user=100, days=60, skip_prob=0.5, seed=2)
+
+        assert skipping.total_reviews < regular.total_reviews
+        assert skipping.interval_histogram != regular.interval_histogram
+
+    def test_million_cards_in_seconds(self):
+        """1M cards over a year should finish in seconds"""
+        start = time.perf_counter()
+        result = simulate(users=1000, cards_per_user=1000, days=365)
+        elapsed = time.perf_counter() - start
+
+        assert result.cards == 1_000_000
+        assert elapsed < 30
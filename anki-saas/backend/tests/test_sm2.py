@@ -108,6 +108,17 @@ class TestSM2Algorithm:
         expected_date = date.today() + timedelta(days=6)
         assert result.next_review == expected_date
 
+    def test_next_review_from_review_date(self):
+        """Replayed offline reviews should be scheduled from the day they happened"""
+        result = calculate_sm2(
+            rating=2,
+            repetitions=1,
+            ease_factor=2.5,
+            interval=1,
+            review_date=date(2026, 10, 1)
+        )
+        assert result.next_review == date(2026, 10, 7)
+
     def test_returns_sm2_result(self):
         """Function should return SM2Result dataclass"""
         result = calculate_sm2(
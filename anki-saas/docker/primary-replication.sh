@@ -0,0 +1,9 @@
+#!/bin/bash
+# docker-compose.replica.yml のプライマリ初期化時に1回だけ実行される（ストリーミングレプリケーション用のロール）
+set -e
+
+psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" <<-EOSQL
+    CREATE ROLE replicator WITH REPLICATION LOGIN PASSWORD 'replicator_secret';
+EOSQL
+
+echo "host replication replicator all scram-sha-256" >> "$PGDATA/pg_hba.conf"